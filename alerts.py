@@ -0,0 +1,306 @@
+import argparse
+import json
+import logging
+import os
+import smtplib
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from email.message import EmailMessage
+
+import balances
+import limits
+import summary
+
+RULE_KINDS = ('achievement_below', 'depletion_earlier', 'limit_near')
+PLAN_ACCOUNTS = {'pension': 'pension_savings', 'isa': 'isa_account', 'general': 'general_account'}
+DISPATCH_INTERVAL = 5  # seconds between dispatcher passes
+MAX_ATTEMPTS = 5
+STALE_SENDING = 300  # seconds a claimed message may stay 'sending' before it is requeued
+ALERT_FILE = 'alerts.jsonl'
+
+logger = logging.getLogger('alerts')
+
+
+# Rules
+
+def create_rule(conn, kind, scenario_id, account=None, threshold=None, sink='log'):
+    if kind not in RULE_KINDS:
+        raise ValueError(f"Unknown rule kind: {kind}")
+    if sink not in SINKS:
+        raise ValueError(f"Unknown sink: {sink}")
+    if kind in ('achievement_below', 'limit_near') and threshold is None:
+        raise ValueError("This rule needs a threshold (%).")
+    if kind == 'limit_near' and account not in limits.DEFAULT_LIMITS:
+        raise ValueError("Limit rules apply to the pension or ISA account.")
+    if kind == 'depletion_earlier' and account not in PLAN_ACCOUNTS:
+        raise ValueError("Depletion rules need an account.")
+    cur = conn.execute('INSERT INTO alert_rules (kind, scenario_id, account, threshold, sink) VALUES (?, ?, ?, ?, ?)',
+                       (kind, scenario_id, account, threshold, sink))
+    # Seed the new rule's state from existing data on the next pass
+    conn.execute('''
+        INSERT OR IGNORE INTO alert_dirty (source, scenario_id, year)
+        SELECT 'txn', 0, year FROM contribution_totals
+        UNION SELECT 'plan', scenario_id, year FROM plan WHERE scenario_id = ?
+    ''', (scenario_id,))
+    return cur.lastrowid
+
+
+def describe(rule):
+    if rule['kind'] == 'achievement_below':
+        return f"Achievement below {rule['threshold']:g}%"
+    if rule['kind'] == 'limit_near':
+        return f"{rule['account'].upper()} contributions reach {rule['threshold']:g}% of the annual limit"
+    return f"{rule['account'].capitalize()} depletion year moves earlier"
+
+
+def list_rules(conn):
+    return conn.execute('SELECT * FROM alert_rules ORDER BY id').fetchall()
+
+
+def toggle_rule(conn, rule_id):
+    conn.execute('UPDATE alert_rules SET enabled = 1 - enabled WHERE id = ?', (rule_id,))
+
+
+def delete_rule(conn, rule_id):
+    conn.execute('DELETE FROM alert_state WHERE rule_id = ?', (rule_id,))
+    conn.execute('DELETE FROM alert_rules WHERE id = ?', (rule_id,))
+
+
+def recent_outbox(conn, limit=50):
+    return conn.execute('SELECT * FROM alert_outbox ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+
+
+def _transition(conn, rule, year, active, value):
+    # True when the condition starts to hold (was absent or inactive before)
+    row = conn.execute('SELECT active FROM alert_state WHERE rule_id = ? AND year = ?', (rule['id'], year)).fetchone()
+    conn.execute('INSERT OR REPLACE INTO alert_state (rule_id, year, active, value) VALUES (?, ?, ?, ?)',
+                 (rule['id'], year, int(active), value))
+    return active and not (row and row['active'])
+
+
+def _enqueue(conn, rule, subject, body):
+    conn.execute('INSERT INTO alert_outbox (rule_id, sink, subject, body) VALUES (?, ?, ?, ?)',
+                 (rule['id'], rule['sink'], subject, body))
+
+
+def _achievement(conn, rule, years, starts, this_year):
+    columns = summary.scenario_summary(conn, rule['scenario_id'], starts)
+    first = int(columns['year'][0])
+    fired = 0
+    for year in years:
+        i = year - first
+        if year > this_year or not 0 <= i < len(columns['year']) or columns['goal_total'][i] <= 0:
+            continue
+        pct = float(columns['gap_pct'][i])
+        if _transition(conn, rule, year, pct < rule['threshold'], pct):
+            _enqueue(conn, rule, f"{year} achievement {pct}% is below {rule['threshold']:g}%",
+                     f"Actual {int(columns['total'][i]):,} vs. goal {int(columns['goal_total'][i]):,} "
+                     f"(gap {int(columns['gap_total'][i]):+,}) in scenario {rule['scenario_id']}.")
+            fired += 1
+    return fired
+
+
+def _limit_near(conn, rule, years):
+    fired = 0
+    for year in years:
+        annual_limit, _ = limits.get_limits(conn, rule['account'], year)
+        if not annual_limit:
+            continue
+        used = limits.contributed(conn, rule['account'], year)
+        pct = round(used / annual_limit * 100, 1)
+        if _transition(conn, rule, year, pct >= rule['threshold'], pct):
+            _enqueue(conn, rule, f"{rule['account'].upper()} {year} contributions at {pct}% of the limit",
+                     f"{used:,} of {annual_limit:,} contributed; {max(annual_limit - used, 0):,} remaining.")
+            fired += 1
+    return fired
+
+
+def depletion_year(conn, scenario_id, account):
+    # First plan year the account's balance reaches 0 after having been positive
+    column = PLAN_ACCOUNTS[account]
+    row = conn.execute(f'''
+        SELECT MIN(year) FROM plan WHERE scenario_id = ? AND {column} <= 0
+          AND year > (SELECT MIN(year) FROM plan WHERE scenario_id = ? AND {column} > 0)
+    ''', (scenario_id, scenario_id)).fetchone()
+    return row[0]
+
+
+def _depletion(conn, rule):
+    # Stored under year 0: one projected depletion year per rule
+    year = depletion_year(conn, rule['scenario_id'], rule['account'])
+    row = conn.execute('SELECT value FROM alert_state WHERE rule_id = ? AND year = 0', (rule['id'],)).fetchone()
+    conn.execute('INSERT OR REPLACE INTO alert_state (rule_id, year, active, value) VALUES (?, 0, ?, ?)',
+                 (rule['id'], int(year is not None), year))
+    previous = row['value'] if row else None
+    if year is not None and previous is not None and year < previous:
+        _enqueue(conn, rule, f"{rule['account'].capitalize()} depletion moved earlier: {int(previous)} -> {year}",
+                 f"Scenario {rule['scenario_id']} now projects the {rule['account']} account empty in {year}.")
+        return 1
+    return 0
+
+
+def evaluate(conn, starts, today=None):
+    # Claim the dirty years and check each rule only against the years it depends on.
+    # Transaction changes move running balances from their year onward, so achievement
+    # is re-checked from the earliest changed year up to the current one.
+    this_year = (today or date.today()).year
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        marks = conn.execute('DELETE FROM alert_dirty RETURNING source, scenario_id, year').fetchall()
+        txn_years = sorted({m['year'] for m in marks if m['source'] == 'txn'})
+        plan_years = {}
+        for m in marks:
+            if m['source'] == 'plan':
+                plan_years.setdefault(m['scenario_id'], set()).add(m['year'])
+
+        fired = 0
+        for rule in conn.execute('SELECT * FROM alert_rules WHERE enabled = 1').fetchall():
+            if rule['kind'] == 'achievement_below':
+                years = set(plan_years.get(rule['scenario_id'], ()))
+                if txn_years:
+                    years.update(range(txn_years[0], this_year + 1))
+                if years:
+                    fired += _achievement(conn, rule, sorted(years), starts, this_year)
+            elif rule['kind'] == 'limit_near':
+                fired += _limit_near(conn, rule, txn_years)
+            elif rule['scenario_id'] in plan_years:
+                fired += _depletion(conn, rule)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return fired
+
+
+# Sinks: callables taking one outbox row; raise to retry later
+
+def log_sink(message):
+    logger.warning('%s - %s', message['subject'], message['body'])
+
+
+def file_sink(message):
+    with open(os.getenv('ALERT_FILE', ALERT_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'id': message['id'], 'created_at': message['created_at'],
+                            'subject': message['subject'], 'body': message['body']}, ensure_ascii=False) + '\n')
+
+
+def smtp_sink(message):
+    # Defaults to a local stand-in server, e.g. `python -m aiosmtpd -n -l localhost:1025`
+    email = EmailMessage()
+    email['Subject'] = f"[400ForMonth] {message['subject']}"
+    email['From'] = os.getenv('ALERT_EMAIL_FROM', 'alerts@localhost')
+    email['To'] = os.getenv('ALERT_EMAIL_TO', 'admin@localhost')
+    email.set_content(message['body'])
+    with smtplib.SMTP(os.getenv('ALERT_SMTP_HOST', 'localhost'), int(os.getenv('ALERT_SMTP_PORT', 1025)), timeout=10) as smtp:
+        smtp.send_message(email)
+
+
+SINKS = {
+    'log': log_sink,
+    'file': file_sink,
+    'smtp': smtp_sink,
+}
+
+
+def register_sink(name, fn):
+    SINKS[name] = fn
+
+
+def drain(conn, batch=100):
+    # Claim pending messages atomically, so several dispatchers never send one twice
+    conn.execute('BEGIN IMMEDIATE')
+    messages = conn.execute('''
+        UPDATE alert_outbox SET status = 'sending', attempts = attempts + 1, claimed_at = ?
+        WHERE id IN (SELECT id FROM alert_outbox WHERE status = 'pending' ORDER BY id LIMIT ?)
+        RETURNING *
+    ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), batch)).fetchall()
+    conn.execute('COMMIT')
+
+    sent = 0
+    for message in messages:
+        try:
+            SINKS[message['sink']](message)
+        except Exception as e:
+            status = 'failed' if message['attempts'] >= MAX_ATTEMPTS else 'pending'
+            conn.execute('UPDATE alert_outbox SET status = ?, last_error = ? WHERE id = ?',
+                         (status, f"{type(e).__name__}: {e}", message['id']))
+        else:
+            conn.execute("UPDATE alert_outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                         (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), message['id']))
+            sent += 1
+        conn.commit()
+    return sent
+
+
+def requeue_stale(conn, older_than=STALE_SENDING):
+    # Messages left 'sending' by a dispatcher that died mid-pass go back to the queue. Only old
+    # claims: another worker's dispatcher may be sending its own right now
+    cutoff = (datetime.now() - timedelta(seconds=older_than)).strftime('%Y-%m-%d %H:%M:%S')
+    count = conn.execute('''
+        UPDATE alert_outbox SET status = 'pending'
+        WHERE status = 'sending' AND (claimed_at IS NULL OR claimed_at < ?)
+    ''', (cutoff,)).rowcount
+    if count:
+        logger.warning('Requeued %d alert message(s) stuck in sending', count)
+    return count
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def run_once(db_path, starts):
+    conn = connect(db_path)
+    try:
+        return evaluate(conn, starts), drain(conn)
+    finally:
+        conn.close()
+
+
+def run(db_path, starts, interval=DISPATCH_INTERVAL, stop=None):
+    stop = stop or threading.Event()
+    conn = connect(db_path)
+    try:
+        requeue_stale(conn)
+    except sqlite3.Error as e:
+        logger.error('Requeueing stale alert messages failed: %s', e)
+    finally:
+        conn.close()
+    while not stop.is_set():
+        try:
+            run_once(db_path, starts)
+        except sqlite3.Error as e:
+            logger.error('Alert dispatcher pass failed: %s', e)
+        except Exception:
+            # The one dispatcher thread of this process: log the pass and keep going
+            logger.exception('Alert dispatcher pass failed')
+        stop.wait(interval)
+
+
+def start_dispatcher(db_path, starts, interval=DISPATCH_INTERVAL):
+    stop = threading.Event()
+    thread = threading.Thread(target=run, args=(db_path, starts, interval, stop), name='alert-dispatcher', daemon=True)
+    thread.start()
+    return thread, stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate alert rules and deliver the outbox.")
+    parser.add_argument('--db', default='financial_plan.db')
+    parser.add_argument('--interval', type=int, default=0, help='repeat every N seconds (default: run once)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    starts = balances.start_balances()
+    if args.interval:
+        run(args.db, starts, args.interval)
+    else:
+        fired, sent = run_once(args.db, starts)
+        print(f"{fired} alert(s) fired, {sent} message(s) sent")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,59 +1,113 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
+from flask import Blueprint, Flask, Response, current_app, render_template, request, redirect, url_for, jsonify, session, flash, has_request_context
 from werkzeug.security import generate_password_hash, check_password_hash
 import functools
+import json
+import math
 import sqlite3
 import os
+import time
 from dotenv import load_dotenv
+from jinja2 import FileSystemBytecodeCache
+import io
+import zlib
+import scenarios
+import plan_history
+import data_cache
+import returns
+import summary
+import inflation
+import limits
+import ledger
+import mutations
+import jobs
+import migrations
+import holdings
+import goal_curve
+import search
+import alerts
+import archive
+import live
+import compress
+import downsample
+import replication
+import repository
+import plan_import
+import goal_seek
+import whatif
+from balances import START_PENSION, START_ISA, START_GENERAL, start_balances
 
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.getenv('FLASK_SECRET_KEY')
-if not app.secret_key:
-    raise RuntimeError("FLASK_SECRET_KEY not set in .env file")
 DB_NAME = "financial_plan.db"
+DEFAULT_SCENARIO_ID = scenarios.DEFAULT_SCENARIO_ID
+JINJA_CACHE_DIR = '.jinja_cache'
+
+# Routes live on a blueprint so every create_app() builds an independent app
+bp = Blueprint('main', __name__)
+
+def create_app(db_path=None):
+    # Used by `python app.py` and WSGI servers alike: gunicorn 'app:create_app()' (or 'app:app')
+    app = Flask(__name__)
+    app.secret_key = os.getenv('FLASK_SECRET_KEY')
+    if not app.secret_key:
+        raise RuntimeError("FLASK_SECRET_KEY not set in .env file")
+    app.config['DATABASE'] = db_path or os.getenv('DATABASE', DB_NAME)
+
+    # Compiled templates persist across restarts, so new workers skip Jinja parsing
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(JINJA_CACHE_DIR)}
+    app.register_blueprint(bp)
+
+    # Read replicas (REPLICAS=dir1,dir2, nearest first). The node holding the primary
+    # ships to them; nodes that only read run with REPLICA_SHIPPER=off
+    app.config['REPLICAS'] = replication.replica_dirs()
+    app.config['REPLICA_MAX_STALENESS'] = float(os.getenv('REPLICA_MAX_STALENESS', replication.MAX_STALENESS))
+
+    with app.app_context():
+        init_db()
+    # Alert rules are evaluated and delivered off the request path; with
+    # ALERT_DISPATCHER=off run `python alerts.py --interval N` instead
+    if os.getenv('ALERT_DISPATCHER', 'on') != 'off':
+        app.extensions['alerts'] = alerts.start_dispatcher(app.config['DATABASE'], start_balances())
+    # Shared by every dashboard stream in this process; its watcher thread starts with the first subscriber
+    app.extensions['live'] = live.Broadcaster(app.config['DATABASE'], start_balances())
+    if app.config['REPLICAS'] and os.getenv('REPLICA_SHIPPER', 'on') != 'off':
+        app.extensions['replication'] = replication.start_shipper(app.config['DATABASE'], app.config['REPLICAS'])
+    return app
+
+def __getattr__(name):
+    # `gunicorn app:app` gets one app built on first access, configured like create_app()
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+    replica = read_replica()
+    if replica:
+        conn = replication.connect_replica(replica)
+    else:
+        conn = sqlite3.connect(current_app.config['DATABASE'])
     conn.row_factory = sqlite3.Row
     return conn
 
+def get_store(conn):
+    return repository.SqliteStore(conn)
+
+def read_replica():
+    # GET requests read from the nearest replica within the staleness bound, unless
+    # this session wrote recently and must see its own change
+    if not current_app.config.get('REPLICAS') or not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return None
+    if session.get('primary_until', 0) > time.time():
+        return None
+    return replication.nearest(current_app.config['REPLICAS'], current_app.config['REPLICA_MAX_STALENESS'])
+
 def init_db():
+    # Apply pending schema migrations (a no-op version check once up to date)
+    migrations.migrate(current_app.config['DATABASE'])
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS plan (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            year INTEGER NOT NULL UNIQUE,
-            age INTEGER NOT NULL,
-            pension_savings INTEGER DEFAULT 0,
-            isa_account INTEGER DEFAULT 0,
-            general_account INTEGER DEFAULT 0,
-            total INTEGER DEFAULT 0,
-            health_insurance TEXT,
-            tax TEXT,
-            withdrawal_strategy TEXT
-        )
-    ''')
-    # New table for tracking actual inputs/transactions
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT NOT NULL,
-            pension INTEGER DEFAULT 0,
-            isa INTEGER DEFAULT 0,
-            general INTEGER DEFAULT 0
-        )
-    ''')
-    
-    # User Table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-    ''')
+    jobs.recover(conn)
     
     # Create Default Admin if not exists
     admin_username = os.getenv('ADMIN_USERNAME')
@@ -63,32 +117,55 @@ def init_db():
         # Fallback if .env is missing or variables are not defined
         # This prevents errors during startup but reminds the user
         print("Warning: ADMIN_USERNAME or ADMIN_PASSWORD not set in .env")
+        conn.close()
         return 
     
-    admin = cursor.execute('SELECT * FROM users WHERE username = ?', (admin_username,)).fetchone()
-    if not admin:
+    users = get_store(conn).users
+    if not users.by_username(admin_username):
         hashed_pw = generate_password_hash(admin_password)
-        cursor.execute('INSERT INTO users (username, password) VALUES (?, ?)', (admin_username, hashed_pw))
+        users.add(admin_username, hashed_pw)
         
     conn.commit()
     conn.close()
 
+def active_scenario_id():
+    return session.get('scenario_id', DEFAULT_SCENARIO_ID)
+
+@bp.after_app_request
+def notify_live(response):
+    # Any successful write may have moved the data version; the broadcaster checks once
+    if request.method != 'GET' and response.status_code < 400 and 'live' in current_app.extensions:
+        current_app.extensions['live'].notify()
+    return response
+
+@bp.after_app_request
+def pin_primary(response):
+    # Read-your-writes: a session that just wrote reads the primary until any replica
+    # serving it must have caught up
+    if request.method not in ('GET', 'HEAD') and response.status_code < 400 and current_app.config.get('REPLICAS'):
+        session['primary_until'] = time.time() + current_app.config['REPLICA_MAX_STALENESS']
+    return response
+
+@bp.after_app_request
+def compress_response(response):
+    return compress.compress_response(response, request.accept_encodings)
+
 # Login Required Decorator
 def login_required(view):
     @functools.wraps(view)
     def wrapped_view(**kwargs):
         if session.get('user_id') is None:
-            return redirect(url_for('login'))
+            return redirect(url_for('.login'))
         return view(**kwargs)
     return wrapped_view
 
-@app.route('/login', methods=('GET', 'POST'))
+@bp.route('/login', methods=('GET', 'POST'))
 def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        user = get_store(conn).users.by_username(username)
         conn.close()
         
         if user is None:
@@ -99,393 +176,1132 @@ def login():
             session.clear()
             session['user_id'] = user['id']
             session['username'] = user['username']
-            return redirect(url_for('index'))
+            return redirect(url_for('.index'))
             
         flash(error)
         
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
 # Admin Management Routes
-@app.route('/admin/users')
+@bp.route('/admin/users')
 @login_required
 def admin_users():
     conn = get_db_connection()
-    users = conn.execute('SELECT * FROM users').fetchall()
+    users = get_store(conn).users.list()
     conn.close()
     return render_template('admin_users.html', users=users)
 
-@app.route('/admin/add_user', methods=['POST'])
+@bp.route('/admin/add_user', methods=['POST'])
 @login_required
 def add_user():
     username = request.form['username']
     password = request.form['password']
     hashed_pw = generate_password_hash(password)
     
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
-        conn.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, hashed_pw))
+        get_store(conn).users.add(username, hashed_pw)
         conn.commit()
-        conn.close()
-    except sqlite3.IntegrityError:
-        flash(f"User {username} already exists.")
+    except repository.DuplicateKey as e:
+        flash(str(e))
+    conn.close()
         
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('.admin_users'))
 
-@app.route('/admin/delete_user/<int:id>', methods=['POST'])
+@bp.route('/admin/delete_user/<int:id>', methods=['POST'])
 @login_required
 def delete_user(id):
     conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (id,)).fetchone()
+    users = get_store(conn).users
+    user = users.get(id)
     if user['username'] == 'admin':
         flash("Cannot delete admin user.")
     else:
-        conn.execute('DELETE FROM users WHERE id = ?', (id,))
+        users.delete(id)
         conn.commit()
     conn.close()
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('.admin_users'))
 
-@app.route('/')
+@bp.route('/')
 @login_required
 def index():
     conn = get_db_connection()
-    plans = conn.execute('SELECT * FROM plan ORDER BY year ASC').fetchall()
-    transactions = conn.execute('SELECT * FROM transactions').fetchall()
-    
-    # Calculate Summary (Same logic as input_data/manage_data)
-    import collections
-    yearly_inputs = collections.defaultdict(lambda: {'pension': 0, 'isa': 0, 'general': 0})
-    for t in transactions:
-        y = t['date'][:4]
-        yearly_inputs[y]['pension'] += t['pension']
-        yearly_inputs[y]['isa'] += t['isa']
-        yearly_inputs[y]['general'] += t['general']
-
-    summary = []
-    plans_map = {str(row['year']): row for row in plans}
-    
-    running_p = START_PENSION
-    running_i = START_ISA
-    running_g = START_GENERAL
-    
-    # Determine years range
-    min_year = 2026
-    max_year = 2026
-    if plans:
-        max_year = max(max_year, plans[-1]['year'])
-    if yearly_inputs:
-        max_year = max(max_year, int(max(yearly_inputs.keys())))
-
-    for year_num in range(min_year, max_year + 1):
-        y = str(year_num)
-        inputs = yearly_inputs.get(y, {'pension': 0, 'isa': 0, 'general': 0})
-        
-        running_p += inputs['pension']
-        running_i += inputs['isa']
-        running_g += inputs['general']
-        total = running_p + running_i + running_g
-        
-        goal = plans_map.get(y)
-        goal_total = goal['total'] if goal else 0
-        
-        gap_pct = 0
-        if goal_total > 0:
-            gap_pct = round((1 + (total - goal_total) / goal_total) * 100, 1)
-            
-        summary.append({
-            'year': int(y),
-            'total': total,
-            'goal_total': goal_total,
-            'gap_pct': gap_pct,
-            'gap_total': total - goal_total,
-            'pension': running_p,
-            'isa': running_i,
-            'general': running_g
-        })
+    plans = load_plans(conn)
+    summary_rows = summary.rows(load_summary(conn))
 
     # Get Current Year Data (2026)
-    current_year_stat = next((s for s in summary if s['year'] == 2026), None)
+    current_year_stat = next((s for s in summary_rows if s['year'] == 2026), None)
     
     # Projection Logic: Selected Year + 3
     selected_year = request.args.get('proj_year', 2026, type=int)
-    projection_data = [s for s in summary if selected_year <= s['year'] <= selected_year + 3]
+    projection_data = [s for s in summary_rows if selected_year <= s['year'] <= selected_year + 3]
+
+    # Mid-year tracking against the interpolated goal curve
+    today = datetime.now().date()
+    to_date = goal_to_date(conn, today)
+    monthly = [m for m in goal_curve.rows(load_goal_gap(conn)) if m['month'].startswith(str(today.year))]
+    live_version = data_cache.current_version(conn)
 
     conn.close()
     return render_template('dashboard.html', 
                            plans=plans, 
-                           summary=summary, 
+                           summary=summary_rows, 
                            current_stat=current_year_stat,
                            projection=projection_data,
-                           selected_year=selected_year)
+                           selected_year=selected_year,
+                           to_date=to_date,
+                           monthly=monthly,
+                           curve_mode=curve_mode(),
+                           live_version=live_version,
+                           what_if=what_if_entries())
 
 from datetime import datetime
 
 # Start values defined by user
-START_PENSION = 7000
-START_ISA = 0
-START_GENERAL = 20000
+def real_terms():
+    # ?mode=real|nominal overrides the per-session toggle
+    mode = request.args.get('mode')
+    if mode in ('real', 'nominal'):
+        return mode == 'real'
+    return session.get('real_terms', False)
+
+def load_plans(conn):
+    plans = get_store(conn).plans.list(active_scenario_id())
+    if real_terms():
+        return inflation.deflate_plans(conn, plans)
+    return plans
+
+def return_assumptions():
+    # ?ret_pension=4&ret_isa=5&ret_general=6 (% a year) for the goal-seek solver.
+    # Unusable rates (nan, inf, a loss of 100% or more, or past 1000%) fall back to the default;
+    # returns (rates, accounts whose rate was rejected)
+    rates, rejected = {}, []
+    for account, default in goal_seek.RETURN_ASSUMPTIONS.items():
+        rate = request.args.get(f'ret_{account}', default, type=float)
+        if not -100 < rate <= 1000:
+            rejected.append(account)
+            rate = default
+        rates[account] = rate
+    return rates, rejected
+
+def curve_mode():
+    mode = request.args.get('curve', 'linear')
+    return mode if mode in goal_curve.MODES else 'linear'
+
+def load_goal_gap(conn, until=None):
+    # Monthly target vs. actual for the active scenario, deflated in real mode
+    series = goal_curve.monthly_gap(conn, active_scenario_id(), sum(start_balances().values()), curve_mode(), until)
+    if real_terms():
+        series = goal_curve.deflate(series, inflation.deflators(conn, series['month'] // 12 + goal_curve.FIRST_YEAR))
+    return series
 
-@app.route('/input', methods=['GET', 'POST'])
+def goal_to_date(conn, day):
+    start_total = sum(start_balances().values())
+    target = goal_curve.target_at(conn, active_scenario_id(), day, start_total, curve_mode())
+    if target is None:
+        return None
+    actual = goal_curve.actual_at(conn, day, start_total)
+    if real_terms():
+        deflator = float(inflation.deflators(conn, [day.year])[0])
+        target, actual = target / deflator, actual / deflator
+    return {'date': day.isoformat(), 'target': round(target), 'actual': round(actual),
+            'gap': round(actual - target),
+            'gap_pct': round(actual / target * 100, 1) if target > 0 else 0.0}
+
+def what_if_entries():
+    return session.get('what_if', [])
+
+def load_summary(conn):
+    # Cached yearly summary columns; the real-terms variant is cached alongside
+    entries = what_if_entries()
+    if entries:
+        # Hypothetical entries go over the cached nominal columns, then the result is deflated
+        columns = whatif.apply(summary.scenario_summary(conn, active_scenario_id(), start_balances()), entries)
+        if real_terms():
+            columns = summary.deflate(columns, inflation.deflators(conn, columns['year']))
+        return columns
+    if real_terms():
+        return summary.real_summary(conn, active_scenario_id(), start_balances())
+    return summary.scenario_summary(conn, active_scenario_id(), start_balances())
+
+@bp.route('/input', methods=['GET', 'POST'])
 @login_required
 def input_data():
     conn = get_db_connection()
     if request.method == 'POST':
         # If adding a new transaction
         date = request.form.get('date', datetime.now().strftime('%Y-%m-%d'))
-        
-        def clean_currency(val):
-            if not val: return 0
-            return int(float(str(val).replace(',', '').strip() or 0))
-
-        pension = clean_currency(request.form.get('pension'))
-        isa = clean_currency(request.form.get('isa'))
-        general = clean_currency(request.form.get('general'))
+        memo = mutations.clean_memo(request.form.get('memo'))
 
-        conn.execute('INSERT INTO transactions (date, pension, isa, general) VALUES (?, ?, ?, ?)',
-                     (date, pension, isa, general))
-        conn.commit()
-        return redirect(url_for('input_data'))
+        try:
+            pension, isa, general = (mutations.clean_currency(request.form.get(a)) for a in limits.ACCOUNTS)
+            date = mutations.parse_date(date)
+        except ValueError as e:
+            flash(str(e))
+            conn.close()
+            return redirect(url_for('.input_data'))
+        year = int(date[:4])
+        errors = archive.check_open(conn, year) or \
+            limits.check_contribution(conn, year, {'pension': pension, 'isa': isa})
+        if errors:
+            for error in errors:
+                flash(error)
+        else:
+            get_store(conn).transactions.add(date, pension, isa, general, memo)
+            conn.commit()
+        conn.close()
+        return redirect(url_for('.input_data'))
     
     # Fetch transactions
-    transactions = conn.execute('SELECT * FROM transactions ORDER BY date DESC').fetchall()
-    
-    # Calculate yearly totals (Cumulative)
-    import collections
-    yearly_inputs = collections.defaultdict(lambda: {'pension': 0, 'isa': 0, 'general': 0})
-    
-    for t in transactions:
-        y = t['date'][:4] # YYYY-MM-DD -> YYYY
-        yearly_inputs[y]['pension'] += t['pension']
-        yearly_inputs[y]['isa'] += t['isa']
-        yearly_inputs[y]['general'] += t['general']
+    transactions = get_store(conn).transactions.list()
     
-    summary = []
-    
-    # Pre-fetch plans for comparison (Goal)
-    plans_rows = conn.execute('SELECT * FROM plan ORDER BY year ASC').fetchall()
-    plans_map = {str(row['year']): row for row in plans_rows}
-    
-    # Determine range of years to display
-    min_year = 2026
-    max_year = 2026
-    if plans_rows:
-        max_year = max(max_year, plans_rows[-1]['year'])
-    if yearly_inputs:
-        max_year = max(max_year, int(max(yearly_inputs.keys())))
-        
-    # Running totals
-    running_p = START_PENSION
-    running_i = START_ISA
-    running_g = START_GENERAL
-    
-    for year_num in range(min_year, max_year + 1):
-        y = str(year_num)
-        
-        inputs = yearly_inputs.get(y, {'pension': 0, 'isa': 0, 'general': 0})
-        
-        # Add this year's inputs to the running total
-        running_p += inputs['pension']
-        running_i += inputs['isa']
-        running_g += inputs['general']
-        
-        total = running_p + running_i + running_g
-        
-        # Get Goal
-        goal = plans_map.get(y)
-        goal_total = goal['total'] if goal else 0
-        
-        # Achievement (Gap %: (Goal - Actual) / Goal * 100)
-        # GAP Calculation: 1 + (Actual - Target) / Target (Achievement Rate)
-        gap_pct = 0
-        if goal_total > 0:
-            gap_pct = round((1 + (total - goal_total) / goal_total) * 100, 1)
-        
-        summary.append({
-            'year': y,
-            'pension': running_p,
-            'isa': running_i,
-            'general': running_g,
-            'total': total,
-            'input_p': inputs['pension'],
-            'input_i': inputs['isa'],
-            'input_g': inputs['general'],
-            'goal_total': goal_total,
-            'gap_pct': gap_pct
-        })
+    # Yearly totals (Cumulative) against the active plan
+    summary_rows = summary.rows(load_summary(conn))
+
+    # Remaining contribution room for this year, read from the running counters
+    limit_year = datetime.now().year
+    headroom = limits.headroom(conn, limit_year)
 
     conn.close()
-    return render_template('input.html', transactions=transactions, summary=summary)
+    return render_template('input.html', transactions=transactions, summary=summary_rows,
+                           headroom=headroom, limit_year=limit_year)
 
-@app.route('/delete_transaction/<int:id>', methods=['POST'])
+@bp.route('/delete_transaction/<int:id>', methods=['POST'])
 @login_required
 def delete_transaction(id):
     conn = get_db_connection()
-    conn.execute('DELETE FROM transactions WHERE id = ?', (id,))
+    get_store(conn).transactions.delete(id)
     conn.commit()
     conn.close()
-    return redirect(url_for('input_data'))
+    return redirect(url_for('.input_data'))
 
-@app.route('/update_transaction/<int:id>', methods=['POST'])
+@bp.route('/update_transaction/<int:id>', methods=['POST'])
 @login_required
 def update_transaction(id):
     conn = get_db_connection()
-    date = request.form['date']
-    
-    def clean_currency(val):
-        if not val: return 0
-        return int(float(str(val).replace(',', '').strip() or 0))
+    date = request.form.get('date')
 
-    pension = clean_currency(request.form.get('pension'))
-    isa = clean_currency(request.form.get('isa'))
-    general = clean_currency(request.form.get('general'))
-    
-    conn.execute('''
-        UPDATE transactions 
-        SET date = ?, pension = ?, isa = ?, general = ?
-        WHERE id = ?
-    ''', (date, pension, isa, general, id))
-    conn.commit()
+    transactions = get_store(conn).transactions
+    current = transactions.get(id)
+    if current is None:
+        flash(f"Transaction {id} does not exist.")
+        conn.close()
+        return redirect(url_for('.input_data'))
+    memo = mutations.clean_memo(request.form['memo']) if 'memo' in request.form else current['memo']
+    try:
+        pension, isa, general = (mutations.clean_currency(request.form.get(a)) for a in limits.ACCOUNTS)
+        date = mutations.parse_date(date)
+    except ValueError as e:
+        flash(str(e))
+        conn.close()
+        return redirect(url_for('.input_data'))
+    year = int(date[:4])
+    errors = archive.check_open(conn, year) or \
+        limits.check_contribution(conn, year, {'pension': pension, 'isa': isa}, replacing=current)
+    if errors:
+        for error in errors:
+            flash(error)
+    else:
+        transactions.update(id, date, pension, isa, general, memo)
+        conn.commit()
     conn.close()
-    return redirect(url_for('input_data'))
+    return redirect(url_for('.input_data'))
+
+@bp.route('/limits', methods=['POST'])
+@login_required
+def update_limits():
+    account = request.form['account']
+    year = request.form.get('year', type=int)
+    annual_limit = request.form.get('annual_limit', type=int)
+    tax_credit_limit = request.form.get('tax_credit_limit', type=int)
+
+    if account not in limits.DEFAULT_LIMITS or year is None:
+        flash("Choose a limited account and a year.")
+    else:
+        conn = get_db_connection()
+        limits.set_limits(conn, account, year, annual_limit, tax_credit_limit)
+        conn.commit()
+        conn.close()
+    return redirect(url_for('.input_data'))
 
-@app.route('/manage')
+@bp.route('/manage')
 @login_required
 def manage_data():
     conn = get_db_connection()
-    import collections
     
-    # 1. Goal Data
-    plans = conn.execute('SELECT * FROM plan ORDER BY year ASC').fetchall()
-    
-    # 2. Actual Data (Cumulative)
-    transactions = conn.execute('SELECT * FROM transactions').fetchall()
+    # 1. Goal Data (optionally the plan that was in force at a past date)
+    as_of = request.args.get('as_of', '').strip()
+    if as_of:
+        try:
+            plan_history.normalize_as_of(as_of)
+        except ValueError as e:
+            flash(f"{e}; use YYYY-MM-DD or YYYY-MM-DD HH:MM[:SS].")
+            as_of = ''
+    if as_of:
+        plans = plan_history.plan_as_of(conn, active_scenario_id(), as_of)
+        columns = summary.compute_columns(conn, plans, start_balances())
+        if real_terms():
+            columns = summary.deflate(columns, inflation.deflators(conn, columns['year']))
+            plans = inflation.deflate_plans(conn, plans)
+    else:
+        plans = load_plans(conn)
+        columns = load_summary(conn)
+    versions = plan_history.list_versions(conn, active_scenario_id(), limit=20)
+    cpi_rates = inflation.list_rates(conn)
     
-    yearly_inputs = collections.defaultdict(lambda: {'pension': 0, 'isa': 0, 'general': 0})
-    for t in transactions:
-        y = t['date'][:4]
-        yearly_inputs[y]['pension'] += t['pension']
-        yearly_inputs[y]['isa'] += t['isa']
-        yearly_inputs[y]['general'] += t['general']
-
+    # 2. Actual Data (Cumulative) and Achievement per year
+    plans_map = {row['year']: row for row in plans}
     actuals = []
-    
-    # Determine range
-    min_year = 2026
-    max_year = 2026
-    if plans:
-        max_year = max(max_year, plans[-1]['year'])
-    if yearly_inputs:
-        max_year = max(max_year, int(max(yearly_inputs.keys())))
-
-    running_p = START_PENSION
-    running_i = START_ISA
-    running_g = START_GENERAL
-    
     achievements = []
 
-    for year_num in range(min_year, max_year + 1):
-        y = str(year_num)
-        inputs = yearly_inputs.get(y, {'pension': 0, 'isa': 0, 'general': 0})
-        
-        running_p += inputs['pension']
-        running_i += inputs['isa']
-        running_g += inputs['general']
-        total = running_p + running_i + running_g
-        
-        # Find plan for this year
-        plan_row = next((p for p in plans if p['year'] == int(y)), None)
-        goal_total = plan_row['total'] if plan_row else 0
+    for row in summary.rows(columns):
+        plan_row = plans_map.get(row['year'])
         
         # Prepare Actuals Row (Include Plan details for Goal Actions)
         actuals.append({
-            'year': int(y),
-            'pension': running_p,
-            'isa': running_i,
-            'general': running_g,
-            'total': total,
+            'year': row['year'],
+            'pension': row['pension'],
+            'isa': row['isa'],
+            'general': row['general'],
+            'total': row['total'],
             'plan': plan_row  # Attach plan for Edit/Delete actions
         })
         
         # Prepare Achievement Row
-        gap_pct = 0.0
-        # GAP Calculation: 1 + (Actual - Target) / Target
-        gap_pct = 0.0
-        if goal_total > 0:
-            gap_pct = (1 + (total - goal_total) / goal_total) * 100
-            
         achievements.append({
-            'year': int(y),
-            'goal': goal_total,
-            'actual': total,
-            'gap_pct': gap_pct,
+            'year': row['year'],
+            'goal': row['goal_total'],
+            'actual': row['total'],
+            'gap_pct': row['gap_pct'],
             'plan': plan_row  # Attach plan for Edit/Delete actions
         })
-        
+
+    # Monthly contribution needed to be back on plan, for the current nominal plan only
+    read_only = bool(as_of) or real_terms()
+    rates, rejected = return_assumptions()
+    if rejected:
+        flash(f"Invalid return assumption for {', '.join(rejected)}; using the default.")
+    required = {} if read_only else {r['year']: r for r in goal_seek.required_contributions(
+        conn, active_scenario_id(), start_balances(), rates)}
     conn.close()
     
-    # 3. Render
-    return render_template('manage.html', plans=plans, actuals=actuals, achievements=achievements)
+    # 3. Render (past or deflated figures must not be posted back as edits)
+    return render_template('manage.html', plans=plans, actuals=actuals, achievements=achievements,
+                           as_of=as_of, versions=versions, cpi_rates=cpi_rates,
+                           default_inflation=inflation.DEFAULT_RATE, required=required, rates=rates,
+                           read_only=read_only)
 
-@app.route('/delete/<int:id>', methods=['POST'])
+@bp.route('/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_data(id):
     conn = get_db_connection()
-    conn.execute('DELETE FROM plan WHERE id = ?', (id,))
+    plans = get_store(conn).plans
+    plan = plans.get(id)
+    if plan is not None:
+        plans.delete(id)
+        goal_curve.build(conn, plan['scenario_id'])
     conn.commit()
     conn.close()
-    return redirect(url_for('manage_data'))
+    return redirect(url_for('.manage_data'))
 
-@app.route('/update/<int:id>', methods=['POST'])
+@bp.route('/update/<int:id>', methods=['POST'])
 @login_required
 def update_data(id):
-    year = request.form.get('year')
-    age = request.form.get('age')
+    conn = get_db_connection()
+    try:
+        values = mutations.plan_values({f: request.form.get(f) for f in mutations.PLAN_FIELDS})
+        plans = get_store(conn).plans
+        plans.update(id, values)
+        plan = plans.get(id)
+        if plan is not None:
+            goal_curve.build(conn, plan['scenario_id'])
+        conn.commit()
+    except ValueError as e:  # repository.DuplicateKey included
+        flash(str(e))
+    conn.close()
+    return redirect(url_for('.manage_data'))
 
-    def clean_currency(val):
-        if not val: return 0
-        return int(float(str(val).replace(',', '').strip() or 0))
+@bp.route('/plans/import', methods=['POST'])
+@login_required
+def import_plans():
+    file = request.files.get('file')
+    if not file or not file.filename:
+        flash("Choose a CSV or XLSX plan file.")
+        return redirect(url_for('.manage_data'))
+    conn = get_db_connection()
+    try:
+        result = plan_import.import_plan(conn, file.read(), file.filename, active_scenario_id())
+        flash(f"Imported {result['rows']} plan years: {result['changed']} added or changed, {result['deleted']} removed.")
+    except plan_import.InvalidPlan as e:
+        for error in e.errors:
+            flash(error)
+    conn.close()
+    return redirect(url_for('.manage_data'))
 
-    pension_savings = clean_currency(request.form.get('pension_savings'))
-    isa_account = clean_currency(request.form.get('isa_account'))
-    general_account = clean_currency(request.form.get('general_account'))
-    
-    total = pension_savings + isa_account + general_account
-    
-    health_insurance = request.form.get('health_insurance')
-    tax = request.form.get('tax')
-    withdrawal_strategy = request.form.get('withdrawal_strategy')
+# Scenario Routes
+@bp.route('/scenarios')
+@login_required
+def scenario_list():
+    conn = get_db_connection()
+    rows = scenarios.list_scenarios(conn)
+    selected = request.args.getlist('ids', type=int) or [row['id'] for row in rows]
+    comparison = scenarios.compare_scenarios(conn, selected, START_PENSION + START_ISA + START_GENERAL)
+    conn.close()
+    return render_template('scenarios.html',
+                           scenarios=rows,
+                           selected=selected,
+                           comparison=comparison,
+                           active_id=active_scenario_id())
+
+@bp.route('/scenarios/clone', methods=['POST'])
+@login_required
+def clone_scenario():
+    source_id = request.form.get('source_id', active_scenario_id(), type=int)
+    name = request.form.get('name', '').strip()
+    if not name:
+        flash("Enter a name for the new scenario.")
+        return redirect(url_for('.scenario_list'))
+
+    conn = get_db_connection()
+    try:
+        scenarios.clone_scenario(conn, source_id, name)
+        conn.commit()
+    except sqlite3.IntegrityError:
+        flash(f"Scenario {name} already exists.")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    return redirect(url_for('.scenario_list'))
+
+@bp.route('/scenarios/select/<int:id>', methods=['POST'])
+@login_required
+def select_scenario(id):
+    conn = get_db_connection()
+    exists = scenarios.scenario_exists(conn, id)
+    conn.close()
+    if exists:
+        session['scenario_id'] = id
+    else:
+        flash(f"Scenario {id} does not exist.")
+    return redirect(request.referrer or url_for('.index'))
+
+@bp.route('/scenarios/delete/<int:id>', methods=['POST'])
+@login_required
+def delete_scenario(id):
+    if id == DEFAULT_SCENARIO_ID:
+        flash("Cannot delete the base scenario.")
+    else:
+        conn = get_db_connection()
+        scenarios.delete_scenario(conn, id)
+        conn.commit()
+        conn.close()
+        if active_scenario_id() == id:
+            session.pop('scenario_id')
+    return redirect(url_for('.scenario_list'))
+
+@bp.route('/api/scenarios/compare')
+@login_required
+def compare_scenarios_api():
+    conn = get_db_connection()
+    ids = request.args.getlist('ids', type=int)
+    if not ids:
+        ids = [row['id'] for row in scenarios.list_scenarios(conn)]
+    data = scenarios.compare_scenarios(conn, ids, START_PENSION + START_ISA + START_GENERAL)
+    conn.close()
+    return jsonify(data)
+
+# Background Jobs: heavy computations run in the worker pool, clients poll for progress
+MAX_PROJECTION_PATHS = 200000
+
+def job_number(params, field, default, minimum=None, maximum=None, whole=False):
+    # A finite (optionally whole) number within bounds, or ValueError naming the field
+    value = params.get(field, default)
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        number = float(value)
+    except (TypeError, ValueError):
+        number = math.nan
+    if not math.isfinite(number) or (whole and not number.is_integer()):
+        raise ValueError(f"{field} must be a finite {'whole ' if whole else ''}number.")
+    if whole:
+        number = value if isinstance(value, int) else int(number)
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        bounds = f"at least {minimum}" if maximum is None else f"between {minimum} and {maximum:,}"
+        raise ValueError(f"{field} must be {bounds}.")
+    return number
+
+def job_params(kind, params):
+    # Server-side inputs are filled in here, never taken from the client
+    if kind == 'scenario_compare':
+        ids = params.get('ids', [])
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            raise ValueError("ids must be a list of scenario ids.")
+        return {'ids': ids,
+                'start_total': START_PENSION + START_ISA + START_GENERAL}
+    if kind == 'returns':
+        return {'starts': start_balances()}
+    if kind == 'projection':
+        return {'scenario_id': active_scenario_id(), 'starts': start_balances(),
+                'from_year': datetime.now().year,
+                'paths': job_number(params, 'paths', 20000, 1, MAX_PROJECTION_PATHS, whole=True),
+                'mean_return': job_number(params, 'mean_return', 5.0),
+                'volatility': job_number(params, 'volatility', 10.0, minimum=0),
+                'annual_contribution': job_number(params, 'annual_contribution', 0),
+                'seed': None if params.get('seed') is None else job_number(params, 'seed', None, minimum=0, whole=True)}
+    raise ValueError(f"Unknown job kind: {kind}")
+
+@bp.route('/api/jobs', methods=['GET', 'POST'])
+@login_required
+def jobs_api():
+    conn = get_db_connection()
+    if request.method == 'GET':
+        data = [dict(row) for row in jobs.list_jobs(conn)]
+        conn.close()
+        return jsonify(data)
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('params') or {}, dict):
+        conn.close()
+        return jsonify({'error': 'expected a JSON object with a kind and a params object'}), 400
+    try:
+        kind = body.get('kind')
+        job_id, cached = jobs.submit(conn, current_app.config['DATABASE'], kind, job_params(kind, body.get('params') or {}))
+    except ValueError as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    conn.close()
+    return jsonify({'id': job_id, 'cached': cached,
+                    'url': url_for('.job_status', job_id=job_id)}), 202
+
+@bp.route('/api/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    conn = get_db_connection()
+    data = jobs.get(conn, job_id)
+    conn.close()
+    if data is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(data)
+
+@bp.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_job(job_id):
+    conn = get_db_connection()
+    cancelled = jobs.cancel(conn, job_id)
+    conn.close()
+    if not cancelled:
+        return jsonify({'error': 'Job is not running'}), 400
+    return jsonify({'id': job_id, 'cancel_requested': True})
+
+# Batch Mutation API: many creates/updates/deletes in one request and one commit
+def summary_for_years(conn, keep):
+    return [row for row in summary.rows(load_summary(conn)) if keep(row['year'])]
+
+@bp.route('/api/transactions/batch', methods=['POST'])
+@login_required
+def transactions_batch():
+    batch = request.get_json(silent=True)
+    if not isinstance(batch, dict):
+        return jsonify({'error': 'expected a JSON object with create/update/delete lists'}), 400
+    conn = get_db_connection()
+    try:
+        rows, deleted, from_year = mutations.apply_transaction_batch(conn, batch)
+        conn.commit()
+    except (ValueError, sqlite3.Error) as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+
+    changed_summary = [] if from_year is None else summary_for_years(conn, lambda year: year >= from_year)
+    conn.close()
+    return jsonify({'rows': rows, 'deleted': deleted, 'summary': changed_summary})
 
+@bp.route('/api/plans/batch', methods=['POST'])
+@login_required
+def plans_batch():
+    batch = request.get_json(silent=True)
+    if not isinstance(batch, dict):
+        return jsonify({'error': 'expected a JSON object with create/update/delete lists'}), 400
     conn = get_db_connection()
-    conn.execute('''
-        UPDATE plan SET 
-        year = ?, age = ?, pension_savings = ?, isa_account = ?, general_account = ?, 
-        total = ?, health_insurance = ?, tax = ?, withdrawal_strategy = ?
-        WHERE id = ?
-    ''', (year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy, id))
+    try:
+        rows, deleted, years = mutations.apply_plan_batch(conn, batch, active_scenario_id())
+        conn.commit()
+    except (ValueError, sqlite3.Error) as e:
+        conn.rollback()
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+
+    changed_summary = summary_for_years(conn, lambda year: year in years)
+    conn.close()
+    return jsonify({'rows': rows, 'deleted': deleted, 'summary': changed_summary})
+
+# Transaction Ledger (event log, historical balances, undo)
+def requested_event_id(conn):
+    # ?event=<id> or ?at=<timestamp>; defaults to the latest event and is clamped to the log
+    latest = ledger.latest_event_id(conn)
+    event_id = request.args.get('event', type=int)
+    if event_id is None and request.args.get('at'):
+        event_id = ledger.event_at(conn, request.args['at'])
+    return latest if event_id is None else max(0, min(event_id, latest))
+
+def ledger_balances(conn, event_id):
+    deposits = ledger.balances(conn, event_id)
+    starts = start_balances()
+    result = {account: starts[account] + deposits[account] for account in starts}
+    result['total'] = sum(result.values())
+    result['event_id'] = deposits['event_id']
+    result['snapshot_id'] = deposits['snapshot_id']
+    return result
+
+@bp.route('/ledger')
+@login_required
+def ledger_view():
+    conn = get_db_connection()
+    event_id = requested_event_id(conn)
+    balance = ledger_balances(conn, event_id)
+    state = ledger.state_at(conn, event_id) if event_id != ledger.latest_event_id(conn) else None
+    events = ledger.list_events(conn, limit=100, before=request.args.get('before', type=int))
+    closings = archive.closing_rows(conn)
+    archive_year = request.args.get('archived', type=int)
+    archived = archive.archived(conn, archive_year) if archive_year else None
+    conn.close()
+    return render_template('ledger.html', balance=balance, state=state, events=events,
+                           closings=closings, archive_year=archive_year, archived=archived,
+                           close_default=datetime.now().year - 1)
+
+@bp.route('/ledger/undo/<int:event_id>', methods=['POST'])
+@login_required
+def undo_event(event_id):
+    conn = get_db_connection()
+    try:
+        ledger.undo(conn, event_id)
+        conn.commit()
+    except (ValueError, sqlite3.IntegrityError) as e:
+        conn.rollback()
+        flash(str(e))
+    conn.close()
+    return redirect(url_for('.ledger_view'))
+
+# Year close (archive finished years, reopen for corrections)
+@bp.route('/ledger/close', methods=['POST'])
+@login_required
+def close_year():
+    conn = get_db_connection()
+    try:
+        years = archive.close(conn, request.form.get('year', type=int) or datetime.now().year - 1)
+        conn.commit()
+        flash(f"Closed {', '.join(map(str, years))}.")
+    except ValueError as e:
+        flash(str(e))
+    conn.close()
+    return redirect(url_for('.ledger_view'))
+
+@bp.route('/ledger/reopen/<int:year>', methods=['POST'])
+@login_required
+def reopen_year(year):
+    conn = get_db_connection()
+    try:
+        years = archive.reopen(conn, year)
+        conn.commit()
+        flash(f"Reopened {', '.join(map(str, years))}.")
+    except ValueError as e:
+        flash(str(e))
+    conn.close()
+    return redirect(url_for('.ledger_view'))
+
+@bp.route('/api/archive/<int:year>')
+@login_required
+def archive_api(year):
+    conn = get_db_connection()
+    rows = archive.archived(conn, year)
+    closing = archive.closing_rows(conn, year)
+    conn.close()
+    if not closing:
+        return jsonify({'error': f'{year} is not closed'}), 404
+    return jsonify({'year': year, 'closing': [dict(row) for row in closing],
+                    'transactions': [dict(row) for row in rows]})
+
+@bp.route('/api/ledger/balances')
+@login_required
+def ledger_balances_api():
+    conn = get_db_connection()
+    balance = ledger_balances(conn, requested_event_id(conn))
+    conn.close()
+    return jsonify(balance)
+
+@bp.route('/api/ledger/state')
+@login_required
+def ledger_state_api():
+    conn = get_db_connection()
+    event_id = requested_event_id(conn)
+    rows = ledger.state_at(conn, event_id)
+    conn.close()
+    return jsonify({'event_id': event_id, 'transactions': [dict(row) for row in rows]})
+
+# What-if overlay (hypothetical entries kept in the session, never written to the ledger)
+@bp.route('/what-if', methods=['POST'])
+@login_required
+def add_what_if():
+    data = request.get_json(silent=True) if request.is_json else request.form
+    if not isinstance(data, dict):
+        return jsonify({'error': 'expected a JSON object with date/pension/isa/general/memo'}), 400
+    conn = get_db_connection()
+    years = summary.scenario_summary(conn, active_scenario_id(), start_balances())['year']
+    conn.close()
+    try:
+        session['what_if'] = whatif.add(what_if_entries(), whatif.make_entry(data), years)
+    except ValueError as e:
+        if request.is_json:
+            return jsonify({'error': str(e)}), 400
+        flash(str(e))
+    if request.is_json:
+        return what_if_api()
+    return redirect(request.referrer or url_for('.index'))
+
+@bp.route('/what-if/remove/<int:index>', methods=['POST'])
+@login_required
+def remove_what_if(index):
+    entries = what_if_entries()
+    session['what_if'] = entries[:index] + entries[index + 1:]
+    return redirect(request.referrer or url_for('.index'))
+
+@bp.route('/what-if/clear', methods=['POST'])
+@login_required
+def clear_what_if():
+    session.pop('what_if', None)
+    return redirect(request.referrer or url_for('.index'))
+
+@bp.route('/api/what-if')
+@login_required
+def what_if_api():
+    # The entries and the summary rows they change (the earliest entry's year onward)
+    entries = what_if_entries()
+    first = whatif.first_year(entries)
+    conn = get_db_connection()
+    changed = [] if first is None else summary_for_years(conn, lambda year: year >= first)
+    conn.close()
+    return jsonify({'entries': entries, 'summary': changed})
+
+# Nominal / Real-terms toggle and inflation assumptions
+@bp.route('/toggle_real_terms', methods=['POST'])
+@login_required
+def toggle_real_terms():
+    session['real_terms'] = not session.get('real_terms', False)
+    return redirect(request.referrer or url_for('.index'))
+
+@bp.route('/inflation', methods=['POST'])
+@login_required
+def update_inflation():
+    year = request.form.get('year', type=int)
+    rate = request.form.get('inflation_rate', type=float)
+    if year is None or rate is None:
+        flash("Year and inflation rate are required.")
+    elif not -100 < rate < float('inf'):
+        # The price level is a running product of (1 + rate): it must stay positive and finite
+        flash(f"Invalid inflation rate: {rate}")
+    else:
+        conn = get_db_connection()
+        inflation.set_rate(conn, year, rate)
+        conn.commit()
+        conn.close()
+    return redirect(url_for('.manage_data'))
+
+@bp.route('/delete_inflation/<int:year>', methods=['POST'])
+@login_required
+def delete_inflation(year):
+    conn = get_db_connection()
+    inflation.delete_rate(conn, year)
+    conn.commit()
+    conn.close()
+    return redirect(url_for('.manage_data'))
+
+# Investment Returns
+@bp.route('/returns', methods=['GET', 'POST'])
+@login_required
+def returns_view():
+    conn = get_db_connection()
+    if request.method == 'POST':
+        account = request.form['account']
+        date = request.form.get('date') or datetime.now().strftime('%Y-%m-%d')
+
+        if account not in returns.ACCOUNTS:
+            flash(f"Unknown account {account}.")
+        else:
+            try:
+                market_value = mutations.clean_currency(request.form.get('market_value'))
+            except ValueError:
+                flash(f"Invalid market value: {request.form.get('market_value')!r}")
+            else:
+                try:
+                    returns.set_valuation(conn, account, date, market_value)
+                    conn.commit()
+                except ValueError:
+                    flash(f"Invalid date: {date!r}")
+        conn.close()
+        return redirect(url_for('.returns_view'))
+
+    valuations = returns.list_valuations(conn)
+    results = returns.account_returns(conn, start_balances())
+    conn.close()
+    return render_template('returns.html', valuations=valuations, results=results, accounts=returns.ACCOUNTS)
+
+@bp.route('/delete_valuation/<int:id>', methods=['POST'])
+@login_required
+def delete_valuation(id):
+    conn = get_db_connection()
+    returns.delete_valuation(conn, id)
+    conn.commit()
+    conn.close()
+    return redirect(url_for('.returns_view'))
+
+@bp.route('/api/returns')
+@login_required
+def returns_api():
+    conn = get_db_connection()
+    results = returns.account_returns(conn, start_balances())
+    conn.close()
+    account = request.args.get('account')
+    if account:
+        results = [r for r in results if r['account'] == account]
+    return jsonify(results)
+
+# Holdings & Prices
+@bp.route('/holdings', methods=['GET', 'POST'])
+@login_required
+def holdings_view():
+    conn = get_db_connection()
+    if request.method == 'POST':
+        account = request.form['account']
+        ticker = request.form.get('ticker', '').strip()
+        date = request.form.get('date') or datetime.now().strftime('%Y-%m-%d')
+        try:
+            quantity = float(str(request.form.get('quantity') or 0).replace(',', '').strip() or 0)
+        except ValueError:
+            quantity = None
+
+        if account not in holdings.ACCOUNTS:
+            flash(f"Unknown account {account}.")
+        elif not ticker or quantity is None or not 0 <= quantity < float('inf'):
+            flash("Ticker and a non-negative quantity are required.")
+        else:
+            try:
+                holdings.set_holding(conn, account, ticker, date, quantity)
+                conn.commit()
+            except ValueError:
+                flash(f"Invalid date: {date!r}")
+        conn.close()
+        return redirect(url_for('.holdings_view'))
+
+    positions = holdings.list_holdings(conn)
+    today = datetime.now().strftime('%Y-%m-%d')
+    market = holdings.market_on(conn, today)
+    price_count = holdings.price_count(conn)
+    conn.close()
+    return render_template('holdings.html', positions=positions, market=market, today=today,
+                           price_count=price_count, accounts=holdings.ACCOUNTS)
+
+@bp.route('/holdings/prices', methods=['POST'])
+@login_required
+def upload_prices():
+    file = request.files.get('file')
+    if not file or not file.filename:
+        flash("Choose a CSV file with ticker,date,close rows.")
+        return redirect(url_for('.holdings_view'))
+    conn = get_db_connection()
+    stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+    try:
+        count = holdings.ingest_prices(conn, holdings.read_price_csv(stream))
+        flash(f"Loaded {count:,} prices.")
+    except UnicodeDecodeError:
+        # Batches before the bad bytes are already saved; re-uploading a fixed file overwrites them
+        flash("The price file is not UTF-8 text; save it as UTF-8 CSV and upload it again.")
+    conn.close()
+    return redirect(url_for('.holdings_view'))
+
+@bp.route('/delete_holding/<int:id>', methods=['POST'])
+@login_required
+def delete_holding(id):
+    conn = get_db_connection()
+    holdings.delete_holding(conn, id)
+    conn.commit()
+    conn.close()
+    return redirect(url_for('.holdings_view'))
+
+@bp.route('/api/market-values')
+@login_required
+def market_values_api():
+    try:
+        end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if request.args.get('to') else datetime.now().date()
+        start = datetime.strptime(request.args['from'], '%Y-%m-%d').date() if request.args.get('from') else end.replace(month=1, day=1)
+    except ValueError:
+        return jsonify({'error': 'from and to must be YYYY-MM-DD'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if (end - start).days > 100 * 366:
+        return jsonify({'error': 'Choose a range of at most 100 years'}), 400
+    conn = get_db_connection()
+    series = holdings.daily_values(conn, start.isoformat(), end.isoformat())
+    conn.close()
+    data = {'dates': [str(d) for d in series['dates']]}
+    for account in holdings.ACCOUNTS:
+        data[account] = [round(v, 1) if h else None
+                         for v, h in zip(series['values'][account].tolist(), series['held'][account].tolist())]
+    return jsonify(data)
+
+# Goal Curve API
+@bp.route('/api/goal-curve')
+@login_required
+def goal_curve_api():
+    until = request.args.get('to')
+    conn = get_db_connection()
+    try:
+        series = load_goal_gap(conn, datetime.strptime(until, '%Y-%m-%d').date() if until else None)
+    except ValueError as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    conn.close()
+    return jsonify({'mode': curve_mode(), 'months': goal_curve.rows(series)})
+
+@bp.route('/api/achievement')
+@login_required
+def achievement_api():
+    conn = get_db_connection()
+    try:
+        day = datetime.strptime(request.args['date'], '%Y-%m-%d').date() if 'date' in request.args else datetime.now().date()
+    except ValueError:
+        conn.close()
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    data = goal_to_date(conn, day)
+    conn.close()
+    if data is None:
+        return jsonify({'error': 'No plan covers this date'}), 404
+    data['mode'] = curve_mode()
+    return jsonify(data)
+
+# Search
+def run_search(conn):
+    kind = request.args.get('kind')
+    scenario_id = None if request.args.get('all_scenarios') else active_scenario_id()
+    return search.search(conn, request.args.get('q', ''), kind if kind in ('plan', 'transaction') else None,
+                         scenario_id, limit=max(1, min(request.args.get('limit', 50, type=int), 200)))
+
+@bp.route('/search')
+@login_required
+def search_view():
+    conn = get_db_connection()
+    results = run_search(conn)
+    conn.close()
+    return render_template('search.html', results=results, query=request.args.get('q', ''))
+
+@bp.route('/api/search')
+@login_required
+def search_api():
+    conn = get_db_connection()
+    results = run_search(conn)
+    conn.close()
+    return jsonify(results)
+
+# Alerts
+@bp.route('/alerts', methods=['GET', 'POST'])
+@login_required
+def alerts_view():
+    conn = get_db_connection()
+    if request.method == 'POST':
+        threshold = request.form.get('threshold', '').strip()
+        try:
+            alerts.create_rule(conn, request.form['kind'], active_scenario_id(),
+                               account=request.form.get('account') or None,
+                               threshold=float(threshold) if threshold else None,
+                               sink=request.form.get('sink', 'log'))
+            conn.commit()
+        except ValueError as e:
+            flash(str(e))
+        conn.close()
+        return redirect(url_for('.alerts_view'))
+
+    rules = [dict(rule, description=alerts.describe(rule)) for rule in alerts.list_rules(conn)]
+    outbox = alerts.recent_outbox(conn)
+    conn.close()
+    return render_template('alerts.html', rules=rules, outbox=outbox, sinks=list(alerts.SINKS),
+                           accounts=list(alerts.PLAN_ACCOUNTS))
+
+@bp.route('/alerts/toggle/<int:id>', methods=['POST'])
+@login_required
+def toggle_alert(id):
+    conn = get_db_connection()
+    alerts.toggle_rule(conn, id)
+    conn.commit()
+    conn.close()
+    return redirect(url_for('.alerts_view'))
+
+@bp.route('/alerts/delete/<int:id>', methods=['POST'])
+@login_required
+def delete_alert(id):
+    conn = get_db_connection()
+    alerts.delete_rule(conn, id)
     conn.commit()
     conn.close()
-    return redirect(url_for('manage_data'))
+    return redirect(url_for('.alerts_view'))
+
+@bp.route('/api/alerts')
+@login_required
+def alerts_api():
+    conn = get_db_connection()
+    outbox = [dict(row) for row in alerts.recent_outbox(conn, request.args.get('limit', 50, type=int))]
+    conn.close()
+    return jsonify(outbox)
+
+# Goal Seek API
+@bp.route('/api/goal-seek')
+@login_required
+def goal_seek_api():
+    rates, rejected = return_assumptions()
+    if rejected:
+        return jsonify({'error': f"invalid return assumption for {', '.join(rejected)}"}), 400
+    conn = get_db_connection()
+    rows = goal_seek.required_contributions(conn, active_scenario_id(), start_balances(), rates)
+    conn.close()
+    return jsonify({'returns': rates, 'rows': rows})
+
+# Plan History API
+@bp.route('/api/plan/as-of')
+@login_required
+def plan_as_of_api():
+    scenario_id = request.args.get('scenario', active_scenario_id(), type=int)
+    as_of = request.args.get('date')
+    if not as_of:
+        return jsonify({'error': 'date is required'}), 400
+    try:
+        plan_history.normalize_as_of(as_of)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = get_db_connection()
+    rows = plan_history.plan_as_of(conn, scenario_id, as_of)
+    conn.close()
+    return jsonify([dict(row) for row in rows])
+
+@bp.route('/api/plan/versions')
+@login_required
+def plan_versions_api():
+    scenario_id = request.args.get('scenario', active_scenario_id(), type=int)
+    conn = get_db_connection()
+    rows = plan_history.list_versions(conn, scenario_id, limit=request.args.get('limit', 100, type=int))
+    conn.close()
+    return jsonify([dict(row) for row in rows])
+
+@bp.route('/api/plan/diff')
+@login_required
+def plan_diff_api():
+    scenario_id = request.args.get('scenario', active_scenario_id(), type=int)
+    from_ts = request.args.get('from')
+    to_ts = request.args.get('to', datetime.now().isoformat(sep=' ', timespec='milliseconds'))
+    if not from_ts:
+        return jsonify({'error': 'from is required'}), 400
+    try:
+        plan_history.normalize_as_of(from_ts)
+        plan_history.normalize_as_of(to_ts)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    conn = get_db_connection()
+    changes = plan_history.diff_plans(conn, scenario_id, from_ts, to_ts)
+    conn.close()
+    return jsonify({'from': from_ts, 'to': to_ts, 'changes': changes})
+
+@bp.route('/api/series/<name>')
+@login_required
+def series_api(name):
+    # Long daily/monthly series reduced on the server to at most ?width= points
+    today = datetime.now().date()
+    try:
+        start = datetime.strptime(request.args.get('start', f'{goal_curve.FIRST_YEAR}-01-01'), '%Y-%m-%d').date()
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else today
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD'}), 400
+    if start > end or (end - start).days > 100 * 366:
+        return jsonify({'error': 'Choose a range of at most 100 years'}), 400
 
+    params = {'start_total': sum(start_balances().values())}
+    if name == 'goal':
+        params['scenario_id'] = active_scenario_id()
+    conn = get_db_connection()
+    try:
+        data = downsample.series(conn, name, start.isoformat(), end.isoformat(),
+                                 request.args.get('width', 800, type=int), request.args.get('method', 'lttb'), **params)
+    except ValueError as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 400
+    if real_terms():
+        deflators = inflation.deflators(conn, [int(d[:4]) for d in data['dates']])
+        data = dict(data, values=[round(v / f) for v, f in zip(data['values'], deflators.tolist())])
+    conn.close()
+    return jsonify(data)
 
-@app.route('/api/chart-data')
+@bp.route('/api/replication')
+@login_required
+def replication_api():
+    # Replica lag: seconds since each replica was last confirmed current, and data versions behind
+    conn = sqlite3.connect(current_app.config['DATABASE'])
+    try:
+        data = replication.status(conn, current_app.config.get('REPLICAS', []), current_app.config.get('REPLICA_MAX_STALENESS', replication.MAX_STALENESS),
+                                  current_app.extensions.get('replication'))
+    finally:
+        conn.close()
+    return jsonify(data)
+
+@bp.route('/api/live')
+@login_required
+def live_updates():
+    # Server-Sent Events: changed years of the active scenario's dashboard after each write.
+    # A reconnecting browser sends Last-Event-ID (the data version it last saw).
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', type=int)
+    events = live.stream(current_app.extensions['live'], active_scenario_id(), real_terms(), since)
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/api/chart-data')
+@login_required
 def chart_data():
+    scenario_id = request.args.get('scenario', active_scenario_id(), type=int)
     conn = get_db_connection()
-    plans = conn.execute('SELECT year, pension_savings, isa_account, general_account, total FROM plan ORDER BY year ASC').fetchall()
+    plans = get_store(conn).plans.list(scenario_id)
+    if real_terms():
+        plans = inflation.deflate_plans(conn, plans)
+    if scenario_id == active_scenario_id():
+        columns = load_summary(conn)  # includes any what-if entries
+    elif real_terms():
+        columns = summary.real_summary(conn, scenario_id, start_balances())
+    else:
+        columns = summary.scenario_summary(conn, scenario_id, start_balances())
+    version = data_cache.current_version(conn)
     conn.close()
+    # Marked-to-market actual totals for the plan years that have already started
+    this_year = datetime.now().year
+    market = {year: value for year, value in zip(columns['year'].tolist(), columns['market_total'].tolist())
+              if year <= this_year}
     
     data = {
+        'mode': 'real' if real_terms() else 'nominal',
         'labels': [row['year'] for row in plans],
+        'market': [market.get(row['year']) for row in plans],
         'pension': [row['pension_savings'] for row in plans],
         'isa': [row['isa_account'] for row in plans],
         'general': [row['general_account'] for row in plans],
         'total': [row['total'] for row in plans]
     }
-    return jsonify(data)
+    # Unchanged until the data (or the year) moves: browsers revalidate with a 304
+    response = jsonify(data)
+    what_if = zlib.crc32(json.dumps(what_if_entries()).encode()) if scenario_id == active_scenario_id() else 0
+    response.set_etag(f"chart-{scenario_id}-{data['mode']}-{this_year}-{version}-{what_if:x}")
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
@@ -0,0 +1,144 @@
+# Year close: transactions of finished years move to transactions_archive and
+# each closed year keeps one closing row per account (that year's net deposits
+# and the cumulative balance, START_* balances excluded). Live reads combine the
+# closing rows with the transactions table, which then only holds open years;
+# archived rows stay readable through the transactions_all view.
+import argparse
+import sqlite3
+from datetime import date
+
+ACCOUNTS = ('pension', 'isa', 'general')
+
+
+def closed_through(conn):
+    return conn.execute('SELECT MAX(year) FROM closing_balances').fetchone()[0]
+
+
+def check_open(conn, year):
+    last = closed_through(conn)
+    if last is not None and year <= last:
+        return [f"{year} is closed (books closed through {last}). Reopen it to make changes."]
+    return []
+
+
+def closing_rows(conn, year=None):
+    if year is not None:
+        return conn.execute('SELECT * FROM closing_balances WHERE year = ? ORDER BY account', (year,)).fetchall()
+    return conn.execute('SELECT * FROM closing_balances ORDER BY year DESC, account').fetchall()
+
+
+def archived(conn, year):
+    return conn.execute('SELECT * FROM transactions_archive WHERE year = ? ORDER BY date DESC, id DESC',
+                        (year,)).fetchall()
+
+
+def _move(conn, sql, params):
+    conn.execute('INSERT INTO archive_guard (id) VALUES (1)')
+    for statement in sql:
+        conn.execute(statement, params)
+    conn.execute('DELETE FROM archive_guard')
+
+
+def close(conn, year, today=None):
+    # Closes every open year up to `year`, oldest first; runs in the caller's transaction
+    today = today or date.today()
+    if year >= today.year:
+        raise ValueError(f"{year} is not finished yet.")
+    last = closed_through(conn)
+    if last is None:
+        first = conn.execute('SELECT MIN(CAST(substr(date, 1, 4) AS INTEGER)) FROM transactions').fetchone()[0]
+        if first is None or first > year:
+            raise ValueError(f"No transactions on or before {year}.")
+        last = first - 1
+    elif year <= last:
+        raise ValueError(f"Books are already closed through {last}.")
+
+    yearly = {row[0]: row[1:] for row in conn.execute('''
+        SELECT CAST(substr(date, 1, 4) AS INTEGER) AS y, SUM(pension), SUM(isa), SUM(general), COUNT(*)
+        FROM transactions WHERE date < ? GROUP BY y
+    ''', (f'{year + 1}-01-01',))}
+    balance = dict(conn.execute('SELECT account, balance FROM closing_balances WHERE year = ?', (last,)).fetchall())
+    rows = []
+    for y in range(last + 1, year + 1):
+        amounts = yearly.get(y, (0, 0, 0, 0))
+        for account, amount in zip(ACCOUNTS, amounts):
+            balance[account] = balance.get(account, 0) + amount
+            rows.append((y, account, amount, balance[account], amounts[3]))
+    conn.executemany('''
+        INSERT INTO closing_balances (year, account, amount, balance, txn_count) VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+
+    _move(conn, [
+        '''INSERT INTO transactions_archive (id, date, pension, isa, general, memo, year)
+           SELECT id, date, pension, isa, general, memo, CAST(substr(date, 1, 4) AS INTEGER)
+           FROM transactions WHERE date < :end''',
+        'DELETE FROM transactions WHERE date < :end',
+    ], {'end': f'{year + 1}-01-01'})
+    return list(range(last + 1, year + 1))
+
+
+def reopen(conn, year):
+    # Reopens `year` and every later closed year (their balances carry it forward)
+    last = closed_through(conn)
+    if last is None or year > last:
+        raise ValueError(f"{year} is not closed.")
+    first = conn.execute('SELECT MIN(year) FROM closing_balances').fetchone()[0]
+    year = max(year, first)
+    _move(conn, [
+        '''INSERT INTO transactions (id, date, pension, isa, general, memo)
+           SELECT id, date, pension, isa, general, memo FROM transactions_archive WHERE year >= :year''',
+        'DELETE FROM transactions_archive WHERE year >= :year',
+        'DELETE FROM closing_balances WHERE year >= :year',
+    ], {'year': year})
+    return list(range(year, last + 1))
+
+
+def yearly_deposits(conn, first_year):
+    # (year, pension, isa, general) net deposits per year from first_year on:
+    # closed years from their closing rows, open years from transactions
+    return conn.execute('''
+        SELECT year AS y,
+               SUM(CASE WHEN account = 'pension' THEN amount ELSE 0 END),
+               SUM(CASE WHEN account = 'isa' THEN amount ELSE 0 END),
+               SUM(CASE WHEN account = 'general' THEN amount ELSE 0 END)
+        FROM closing_balances WHERE year >= :first GROUP BY year
+        UNION ALL
+        SELECT CAST(substr(date, 1, 4) AS INTEGER) AS y, SUM(pension), SUM(isa), SUM(general)
+        FROM transactions WHERE date >= :start GROUP BY y
+        ORDER BY y
+    ''', {'first': first_year, 'start': f'{first_year}-01-01'}).fetchall()
+
+
+def deposits_through(conn, day, first_year):
+    # Net deposits from the start of first_year to `day`: closing rows for whole closed
+    # years, then open transactions, then archived rows only when `day` is in a closed year
+    row = conn.execute('''
+        SELECT (SELECT COALESCE(SUM(amount), 0) FROM closing_balances WHERE year >= :first AND year < :year)
+             + (SELECT COALESCE(SUM(pension + isa + general), 0) FROM transactions WHERE date >= :start AND date <= :day)
+             + (SELECT COALESCE(SUM(pension + isa + general), 0) FROM transactions_archive
+                WHERE year = :year AND date >= :start AND date <= :day)
+    ''', {'first': first_year, 'year': day.year, 'start': f'{first_year}-01-01', 'day': day.isoformat()}).fetchone()
+    return row[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Close finished years into the archive, or reopen them.")
+    parser.add_argument('--db', default='financial_plan.db')
+    parser.add_argument('action', choices=('close', 'reopen'))
+    parser.add_argument('year', type=int)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        years = close(conn, args.year) if args.action == 'close' else reopen(conn, args.year)
+        conn.commit()
+        print(f"{args.action}: {', '.join(map(str, years))}")
+    except ValueError as e:
+        conn.rollback()
+        raise SystemExit(str(e))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
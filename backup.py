@@ -0,0 +1,220 @@
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+DB_NAME = "financial_plan.db"
+BACKUP_DIR = "backups"
+PREFIX = "financial_plan-"
+SUFFIX = ".db.gz"
+
+# Pages copied per backup step, and the pause between steps that lets writers in
+STEP_PAGES = 256
+STEP_SLEEP = 0.01
+
+
+def hot_backup(db_path, dest_path, pages=STEP_PAGES, sleep=STEP_SLEEP):
+    # sqlite3 online backup API: copies `pages` pages at a time and releases the
+    # source lock between steps, so the app keeps writing during the copy
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(dest_path)
+    try:
+        src.backup(dst, pages=pages, sleep=sleep)
+    finally:
+        dst.close()
+        src.close()
+
+
+def integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        conn.close()
+    return result == 'ok', result
+
+
+def create_backup(db_path=DB_NAME, backup_dir=BACKUP_DIR, pages=STEP_PAGES, sleep=STEP_SLEEP):
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    target = os.path.join(backup_dir, f'{PREFIX}{stamp}{SUFFIX}')
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=backup_dir)
+    os.close(fd)
+    try:
+        hot_backup(db_path, tmp_path, pages=pages, sleep=sleep)
+        ok, detail = integrity_check(tmp_path)
+        if not ok:
+            raise RuntimeError(f"Backup failed integrity check: {detail}")
+        # Write under a temporary name so a half-written archive is never picked up
+        with open(tmp_path, 'rb') as raw, gzip.open(target + '.part', 'wb', compresslevel=6) as packed:
+            shutil.copyfileobj(raw, packed)
+        os.replace(target + '.part', target)
+    finally:
+        os.remove(tmp_path)
+    return target
+
+
+def list_backups(backup_dir=BACKUP_DIR):
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(n for n in os.listdir(backup_dir) if n.startswith(PREFIX) and n.endswith(SUFFIX))
+    return [os.path.join(backup_dir, n) for n in names]
+
+
+def rotate(backup_dir=BACKUP_DIR, keep=14):
+    # Timestamped names sort chronologically; drop everything but the newest `keep`
+    if keep < 1:
+        raise ValueError(f"keep must be at least 1, not {keep}")
+    backups = list_backups(backup_dir)
+    removed = backups[:-keep]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def data_version(path):
+    # None for a missing database or one from before data_version existed
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+
+def bump_version(path, floor):
+    # data_version in `path` becomes max(its own, floor) + 1
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+        conn.execute('UPDATE data_version SET version = MAX(version, ?) + 1 WHERE id = 1', (floor or 0,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def restore(archive, db_path=DB_NAME):
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(os.path.abspath(db_path)))
+    os.close(fd)
+    try:
+        with gzip.open(archive, 'rb') as packed, open(tmp_path, 'wb') as raw:
+            shutil.copyfileobj(packed, raw)
+        ok, detail = integrity_check(tmp_path)
+        if not ok:
+            raise RuntimeError(f"{archive} failed integrity check: {detail}")
+        # Caches, ETags, snapshots and job hashes are keyed on data_version alone: the restored
+        # database must move past every version the live one has handed out, never back to one
+        bump_version(tmp_path, data_version(db_path))
+        # Copy back through the backup API so open connections see a consistent swap
+        hot_backup(tmp_path, db_path, pages=-1, sleep=0)
+    finally:
+        os.remove(tmp_path)
+
+
+def run_schedule(db_path=DB_NAME, backup_dir=BACKUP_DIR, interval=3600, keep=24):
+    if keep < 1:
+        raise ValueError(f"keep must be at least 1, not {keep}")
+    while True:
+        started = time.time()
+        try:
+            path = create_backup(db_path, backup_dir)
+            removed = rotate(backup_dir, keep)
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {path} ({len(removed)} rotated out)")
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Backup failed: {e}")
+        time.sleep(max(interval - (time.time() - started), 0))
+
+
+def bench_writes(db_path=DB_NAME, backup_dir=BACKUP_DIR, writes=200):
+    # Insert latency (ms) of a transactions write while idle vs. while a backup runs.
+    # Rows are written inside a transaction that is rolled back, so the ledger is untouched
+    # (dated far ahead so closed years never reject them).
+    def measure():
+        conn = sqlite3.connect(db_path, timeout=30)
+        samples = []
+        for _ in range(writes):
+            t0 = time.perf_counter()
+            conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('9999-12-31', 0, 0, 0)")
+            conn.rollback()
+            samples.append((time.perf_counter() - t0) * 1000)
+        conn.close()
+        return samples
+
+    def describe(samples):
+        samples = sorted(samples)
+        return {'p50': round(statistics.median(samples), 3),
+                'p99': round(samples[int(len(samples) * 0.99) - 1], 3),
+                'max': round(samples[-1], 3)}
+
+    idle = measure()
+    worker = threading.Thread(target=create_backup, args=(db_path, backup_dir))
+    worker.start()
+    during = measure()
+    worker.join()
+    return {'idle': describe(idle), 'during_backup': describe(during)}
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup and restore for the financial plan database.")
+    parser.add_argument('--db', default=DB_NAME)
+    parser.add_argument('--dir', default=BACKUP_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('backup', help='take one compressed hot backup')
+    cmd.add_argument('--keep', type=positive_int, help='rotate to the newest N backups afterwards')
+    cmd = commands.add_parser('schedule', help='take backups every --interval seconds')
+    cmd.add_argument('--interval', type=int, default=3600)
+    cmd.add_argument('--keep', type=positive_int, default=24)
+    commands.add_parser('list', help='list available backups')
+    cmd = commands.add_parser('restore', help='verify an archive and restore it over --db')
+    cmd.add_argument('archive', nargs='?', help='defaults to the newest backup')
+    cmd = commands.add_parser('bench', help='write latency idle vs. during a backup')
+    cmd.add_argument('--writes', type=int, default=200)
+
+    args = parser.parse_args()
+    if args.command == 'backup':
+        print(create_backup(args.db, args.dir))
+        if args.keep:
+            for path in rotate(args.dir, args.keep):
+                print(f"Removed {path}")
+    elif args.command == 'schedule':
+        run_schedule(args.db, args.dir, args.interval, args.keep)
+    elif args.command == 'list':
+        for path in list_backups(args.dir):
+            print(f"{path}\t{os.path.getsize(path):,} bytes")
+    elif args.command == 'restore':
+        archive = args.archive or (list_backups(args.dir) or [None])[-1]
+        if archive is None:
+            parser.error("No backups found.")
+        restore(archive, args.db)
+        print(f"Restored {archive} -> {args.db}")
+    elif args.command == 'bench':
+        print(bench_writes(args.db, args.dir, args.writes))
+
+
+if __name__ == '__main__':
+    main()
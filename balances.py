@@ -0,0 +1,9 @@
+# Opening balances every projection starts from. Kept apart from app.py so the
+# command-line workers (reports, alerts, replication) never import Flask.
+START_PENSION = 7000
+START_ISA = 0
+START_GENERAL = 20000
+
+
+def start_balances():
+    return {'pension': START_PENSION, 'isa': START_ISA, 'general': START_GENERAL}
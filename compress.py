@@ -0,0 +1,111 @@
+# Response compression negotiated from Accept-Encoding (brotli when installed, else gzip).
+# Small bodies go out as-is, generator responses are compressed chunk by chunk with a
+# flush after each so streams (SSE) stay live, and bodies that carry an ETag are
+# compressed once per encoding and served from an in-memory cache afterwards.
+import collections
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install Brotli`
+    brotli = None
+
+MIN_SIZE = 1024  # bytes; below this the headers cost more than compression saves
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # dynamic responses: close to gzip -9 size at gzip -6 speed
+CACHE_BYTES = 16 * 1024 * 1024
+
+COMPRESSIBLE = {'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'text/event-stream',
+                'application/javascript', 'application/json', 'image/svg+xml'}
+
+_lock = threading.Lock()
+_cache = collections.OrderedDict()  # (etag, encoding) -> compressed body
+_cache_size = 0
+
+
+def encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encodings):
+    # werkzeug Accept object from request.accept_encodings; honours q=0 and client preference
+    return accept_encodings.best_match(encodings())
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _stream(chunks, encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            yield process(chunk) + flush()
+        yield finish()
+    finally:
+        # Closing the wrapper closes the view's generator, so its cleanup runs on disconnect
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _cached(etag, encoding, data):
+    global _cache_size
+    key = (etag, encoding)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    body = compress(data, encoding)
+    with _lock:
+        if key not in _cache:
+            _cache[key] = body
+            _cache_size += len(body)
+        while _cache_size > CACHE_BYTES and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_size -= len(evicted)
+    return body
+
+
+def compress_response(response, accept_encodings):
+    # Flask after_request hook body: returns the response, compressed when it pays off
+    if response.mimetype not in COMPRESSIBLE:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    encoding = negotiate(accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed and not response.direct_passthrough:
+        response.response = _stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+        response.content_encoding = encoding
+        return response
+
+    response.direct_passthrough = False  # files from send_file are read and compressed whole
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        body = _cached(etag, encoding, data)
+        # Weak, so If-None-Match still matches the original tag and 304s keep working
+        response.set_etag(etag, weak=True)
+    else:
+        body = compress(data, encoding)
+    response.set_data(body)
+    response.content_encoding = encoding
+    return response
@@ -0,0 +1,62 @@
+import argparse
+import os
+import statistics
+import time
+
+import compress
+
+ROUTES = ('/', '/manage', '/input', '/api/chart-data', '/static/css/style.css')
+
+
+def cpu_ms(data, encoding, repeat):
+    # CPU time of compressing one body, median over `repeat` runs
+    samples = []
+    for _ in range(repeat):
+        t0 = time.process_time()
+        compress.compress(data, encoding)
+        samples.append((time.process_time() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def request_ms(client, route, encoding, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        response = client.get(route, headers={'Accept-Encoding': encoding})
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), len(response.data), response.headers.get('Content-Encoding', 'identity')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes on the wire and compression CPU cost per route.")
+    parser.add_argument('--db', default='financial_plan.db')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('FLASK_SECRET_KEY', 'bench')
+    os.environ['ALERT_DISPATCHER'] = 'off'
+    import app
+    client = app.create_app(args.db).test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 0
+        session['username'] = 'bench'
+
+    encodings = ('identity',) + compress.encodings()
+    print(f"{'route':<24}" + ''.join(f"{e + ' bytes':>16}" for e in encodings)
+          + ''.join(f"{e + ' cpu ms':>16}" for e in encodings[1:])
+          + ''.join(f"{e + ' req ms':>16}" for e in encodings))
+    for route in ROUTES:
+        sizes, requests = [], []
+        for encoding in encodings:
+            ms, size, applied = request_ms(client, route, encoding, args.repeat)
+            sizes.append(f"{size:,}" + ('' if applied == encoding or encoding == 'identity' else '*'))
+            requests.append(ms)
+        raw = client.get(route, headers={'Accept-Encoding': 'identity'}).data
+        cpu = [cpu_ms(raw, encoding, args.repeat) for encoding in encodings[1:]]
+        print(f"{route:<24}" + ''.join(f"{s:>16}" for s in sizes)
+              + ''.join(f"{c:>16.2f}" for c in cpu) + ''.join(f"{r:>16.2f}" for r in requests))
+    print(f"* sent uncompressed (under {compress.MIN_SIZE} bytes or not compressible)")
+
+
+if __name__ == '__main__':
+    main()
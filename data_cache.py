@@ -0,0 +1,33 @@
+import collections
+import threading
+
+_lock = threading.Lock()
+_entries = collections.OrderedDict()
+MAX_ENTRIES = 256
+
+
+def current_version(conn):
+    row = conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+def cached(conn, key, compute):
+    # Results are keyed on the data version, so stale entries are simply never hit again
+    cache_key = (key, current_version(conn))
+    with _lock:
+        if cache_key in _entries:
+            _entries.move_to_end(cache_key)
+            return _entries[cache_key]
+
+    value = compute()
+    with _lock:
+        _entries[cache_key] = value
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return value
+
+
+def clear():
+    # Entries carry no database identity: a process that switches databases must start clean
+    with _lock:
+        _entries.clear()
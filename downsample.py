@@ -0,0 +1,127 @@
+# Server-side downsampling for long chart series (daily balances over decades).
+# A chart never needs more points than it has pixels, so each series is reduced to
+# at most `width` points with LTTB (keeps the visual shape) or min/max bucketing
+# (keeps every spike), and cached per (series, range, width) until the data changes.
+from datetime import date
+
+import data_cache
+import goal_curve
+import holdings
+import lazy
+
+np = lazy.module('numpy')
+
+METHODS = ('lttb', 'minmax')
+WIDTH_STEP = 100  # requested widths are rounded down to this, so resizes reuse cached results
+MIN_WIDTH, MAX_WIDTH = 100, 4000
+
+
+def quantize_width(width):
+    width = int(width) // WIDTH_STEP * WIDTH_STEP
+    return min(max(width, MIN_WIDTH), MAX_WIDTH)
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: first and last points kept, then per bucket the
+    # point forming the largest triangle with the previous pick and the next bucket's mean
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(float)
+    y = y.astype(float)
+    # Bucket b spans edges[b]:edges[b + 1]; the last edge is n - 1, the fixed last point
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    prev = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nxt_lo, nxt_hi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        mean_x, mean_y = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[prev] - mean_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (mean_y - y[prev]))
+        prev = lo + int(area.argmax())
+        picked[b + 1] = prev
+    return picked
+
+
+def minmax(y, buckets):
+    # Lowest and highest point of each bucket, in original order: no spike is lost
+    n = len(y)
+    if 2 * buckets >= n:
+        return np.arange(n)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def reduce(x, y, width, method='lttb'):
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if method == 'minmax':
+        return minmax(y, width // 2)
+    return lttb(x, y, width)
+
+
+# Series builders: (days as datetime64[D], values) over [start, end]
+
+def market_series(conn, start, end, **_):
+    daily = holdings.daily_values(conn, start, end)
+    return daily['dates'], sum(daily['values'][a] for a in holdings.ACCOUNTS)
+
+
+def balance_series(conn, start, end, start_total=0, **_):
+    # Book balance each day: start total plus net deposits to date (archived years included)
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    rows = conn.execute('''
+        SELECT substr(date, 1, 10) AS day, SUM(pension + isa + general) FROM transactions_all
+        WHERE date >= ? AND date <= ? GROUP BY day
+    ''', (f'{goal_curve.FIRST_YEAR}-01-01', f'{end} 23:59:59')).fetchall()
+    values = np.full(len(days), float(start_total))
+    if rows:
+        flow_days = np.array([r[0] for r in rows], dtype='datetime64[D]')
+        cumulative = np.cumsum([r[1] for r in rows], dtype=float)
+        idx = np.searchsorted(flow_days, days, side='right') - 1
+        values += np.where(idx >= 0, cumulative[idx.clip(0)], 0.0)
+    return days, values
+
+
+def goal_series(conn, start, end, scenario_id=None, start_total=0, **_):
+    # Month-end targets of the interpolated goal curve
+    first, last = goal_curve.month_index(date.fromisoformat(start)), goal_curve.month_index(date.fromisoformat(end))
+    rows = goal_curve.targets(conn, scenario_id, start_total, 'linear', max(first, 0), last)
+    months = np.array([r[0] for r in rows], dtype=np.int64)
+    month_starts = np.datetime64(f'{goal_curve.FIRST_YEAR}-01', 'M') + months
+    days = (month_starts + 1).astype('datetime64[D]') - 1
+    return days, np.array([r[1] for r in rows], dtype=float)
+
+
+SERIES = {
+    'market': market_series,
+    'balance': balance_series,
+    'goal': goal_series,
+}
+
+
+def series(conn, name, start, end, width, method='lttb', **params):
+    # {'dates': [...], 'values': [...], 'points': raw length} with at most `width` points
+    if name not in SERIES:
+        raise ValueError(f"Unknown series: {name}")
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    width = quantize_width(width)
+
+    def compute():
+        days, values = SERIES[name](conn, start, end, **params)
+        keep = reduce(days.astype(np.int64), values, width, method) if len(days) else np.arange(0)
+        return {
+            'dates': days[keep].astype(str).tolist(),
+            'values': np.round(values[keep]).tolist(),
+            'points': int(len(days)),
+            'width': width,
+            'method': method,
+        }
+
+    key = ('series', name, start, end, width, method, tuple(sorted(params.items())))
+    return data_cache.cached(conn, key, compute)
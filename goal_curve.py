@@ -0,0 +1,141 @@
+import calendar
+from datetime import date
+
+import archive
+import balances
+import data_cache
+import lazy
+
+np = lazy.module('numpy')
+
+FIRST_YEAR = 2026
+MODES = ('linear', 'compound')
+
+
+def month_index(day):
+    return (day.year - FIRST_YEAR) * 12 + day.month - 1
+
+
+def month_label(index):
+    year, month = divmod(index, 12)
+    return f"{FIRST_YEAR + year}-{month + 1:02d}"
+
+
+def compute(conn, scenario_id, start_total):
+    # Year-end plan totals become anchors at December; months in between are
+    # interpolated linearly, or geometrically (constant monthly growth) for 'compound'.
+    # Returns {'month', 'linear', 'compound'} arrays, empty without plan years
+    plans = conn.execute('SELECT year, total FROM plan WHERE scenario_id = ? AND year >= ? ORDER BY year',
+                         (scenario_id, FIRST_YEAR)).fetchall()
+    if not plans:
+        return {'month': np.array([], dtype=np.int64), 'linear': np.array([]), 'compound': np.array([])}
+    anchor_months = np.array([-1] + [(p[0] - FIRST_YEAR) * 12 + 11 for p in plans], dtype=float)
+    anchor_totals = np.array([start_total] + [p[1] for p in plans], dtype=float)
+    months = np.arange(-1, int(anchor_months[-1]) + 1)
+    linear = np.interp(months, anchor_months, anchor_totals)
+
+    compound = linear.copy()
+    # Geometric only across segments whose both ends are positive
+    seg = np.searchsorted(anchor_months, months, side='left').clip(1, len(anchor_months) - 1)
+    lo, hi = anchor_totals[seg - 1], anchor_totals[seg]
+    positive = (lo > 0) & (hi > 0)
+    frac = (months - anchor_months[seg - 1]) / (anchor_months[seg] - anchor_months[seg - 1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        compound[positive] = lo[positive] * (hi[positive] / lo[positive]) ** frac[positive]
+    return {'month': months, 'linear': linear, 'compound': compound}
+
+
+def build(conn, scenario_id, start_total=None):
+    # Stores the curve in the caller's transaction (no commit). Plan writers call this after
+    # changing a scenario's plan, so readers find it current; start_total defaults to the
+    # configured opening balances
+    if start_total is None:
+        start_total = sum(balances.start_balances().values())
+    curve = compute(conn, scenario_id, start_total)
+    conn.execute('DELETE FROM goal_curve WHERE scenario_id = ?', (scenario_id,))
+    conn.executemany('INSERT INTO goal_curve (scenario_id, month, linear, compound) VALUES (?, ?, ?, ?)',
+                     [(scenario_id, m, lin, comp) for m, lin, comp in
+                      zip(curve['month'].tolist(), curve['linear'].tolist(), curve['compound'].tolist())])
+    conn.execute('INSERT OR REPLACE INTO goal_curve_meta (scenario_id, start_total) VALUES (?, ?)',
+                 (scenario_id, start_total))
+
+
+def targets(conn, scenario_id, start_total, mode, first, last):
+    # (month, target) pairs for months first..last. Reads only: a curve the plan triggers
+    # marked stale (or one stored for other opening balances) is computed in memory instead
+    if mode not in MODES:
+        raise ValueError(f"Unknown curve mode: {mode}")
+    row = conn.execute('SELECT start_total FROM goal_curve_meta WHERE scenario_id = ?', (scenario_id,)).fetchone()
+    if row is not None and row[0] == start_total:
+        return conn.execute(f'SELECT month, {mode} FROM goal_curve WHERE scenario_id = ? AND month BETWEEN ? AND ? ORDER BY month',
+                            (scenario_id, first, last)).fetchall()
+    curve = compute(conn, scenario_id, start_total)
+    keep = (curve['month'] >= first) & (curve['month'] <= last)
+    return list(zip(curve['month'][keep].tolist(), curve[mode][keep].tolist()))
+
+
+def target_at(conn, scenario_id, day, start_total, mode='linear'):
+    # Target on a given day: two primary-key rows (previous and current month end),
+    # interpolated by the fraction of the month elapsed
+    month = month_index(day)
+    rows = dict(targets(conn, scenario_id, start_total, mode, month - 1, month))
+    if month not in rows or month - 1 not in rows:
+        return None
+    prev, cur = rows[month - 1], rows[month]
+    frac = day.day / calendar.monthrange(day.year, day.month)[1]
+    if mode == 'compound' and prev > 0 and cur > 0:
+        return prev * (cur / prev) ** frac
+    return prev + (cur - prev) * frac
+
+
+def actual_at(conn, day, start_total):
+    return start_total + archive.deposits_through(conn, day, FIRST_YEAR)
+
+
+def monthly_gap(conn, scenario_id, start_total, mode='linear', until=None):
+    # Month-end target vs. cumulative actual from January of FIRST_YEAR to `until`
+    if mode not in MODES:
+        raise ValueError(f"Unknown curve mode: {mode}")
+    last = month_index(until or date.today())
+
+    def compute():
+        rows = targets(conn, scenario_id, start_total, mode, 0, last)
+        months = np.array([r[0] for r in rows], dtype=np.int64)
+        target = np.array([r[1] for r in rows], dtype=float)
+
+        # Month by month, so closed years are read back from the archive through the view
+        deposits = np.zeros(max(last + 1, 0))
+        for ym, amount in conn.execute('''
+            SELECT substr(date, 1, 7) AS ym, SUM(pension + isa + general) FROM transactions_all
+            WHERE date >= ? GROUP BY ym
+        ''', (f'{FIRST_YEAR}-01-01',)):
+            index = (int(ym[:4]) - FIRST_YEAR) * 12 + int(ym[5:7]) - 1
+            if index <= last:
+                deposits[index] += amount
+        actual = (start_total + np.cumsum(deposits))[months]
+
+        gap = actual - target
+        ratio = np.divide(gap, target, out=np.zeros(len(months)), where=target > 0)
+        return {
+            'month': months,
+            'target': np.round(target),
+            'actual': actual,
+            'gap': np.round(gap),
+            'gap_pct': np.where(target > 0, np.round((1 + ratio) * 100, 1), 0.0),
+        }
+
+    return data_cache.cached(conn, ('goal-curve', scenario_id, start_total, mode, last), compute)
+
+
+def deflate(series, deflators):
+    # deflators: one price level per month of the series
+    real = dict(series)
+    for key in ('target', 'actual', 'gap'):
+        real[key] = series[key] / deflators
+    return real
+
+
+def rows(series):
+    return [{'month': month_label(m), 'target': t, 'actual': a, 'gap': g, 'gap_pct': p}
+            for m, t, a, g, p in zip(series['month'].tolist(), series['target'].tolist(), series['actual'].tolist(),
+                                     series['gap'].tolist(), series['gap_pct'].tolist())]
@@ -0,0 +1,130 @@
+# Monthly contribution needed to reach the plan by each remaining plan year, from the
+# current ledger balances and an assumed annual return per account. Contributions are
+# made at the end of every month from the current one through December of the target year.
+#
+# Per account the answer is closed form (future value of the balance plus an annuity).
+# For the total, money goes to pension up to its annual limit, then ISA up to its limit,
+# then general; that makes the future value piecewise linear in the monthly amount, and
+# all remaining years are solved at once by a vectorized bisection.
+from datetime import date
+
+import data_cache
+import lazy
+import limits
+import summary
+
+np = lazy.module('numpy')
+
+ACCOUNTS = ('pension', 'isa', 'general')
+PLAN_COLUMNS = {'pension': 'pension_savings', 'isa': 'isa_account', 'general': 'general_account'}
+RETURN_ASSUMPTIONS = {'pension': 4.0, 'isa': 5.0, 'general': 6.0}  # % a year
+FILL_ORDER = ('pension', 'isa', 'general')  # tax-advantaged accounts first
+BISECTION_STEPS = 60
+
+
+def growth_factors(rates, months):
+    # (1 + i)^n and the annuity factor ((1 + i)^n - 1) / i for monthly rate i, per (year, account)
+    monthly = (1 + np.asarray(rates, dtype=float) / 100) ** (1 / 12) - 1
+    growth = (1 + monthly) ** months[:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(monthly == 0, months[:, np.newaxis], (growth - 1) / monthly)
+    return growth, annuity
+
+
+def allocate(amount, caps):
+    # Monthly amount(s) split over FILL_ORDER, each account capped (None = no cap)
+    amount = np.asarray(amount, dtype=float)
+    parts, rest = [], amount
+    for cap in caps:
+        part = rest if cap is None else np.minimum(rest, cap)
+        parts.append(part)
+        rest = rest - part
+    return np.stack(parts, axis=-1)
+
+
+def solve_total(targets, base, annuity, caps):
+    # Smallest monthly amount c >= 0 with base + allocate(c) . annuity >= target, per row
+    needed = targets - base.sum(axis=1)
+    lo = np.zeros(len(targets))
+    # Every unit buys at least the smallest annuity factor, so hi always reaches the target
+    hi = np.maximum(needed, 0) / annuity.min(axis=1)
+    for _ in range(BISECTION_STEPS):
+        mid = (lo + hi) / 2
+        short = (allocate(mid, caps) * annuity).sum(axis=1) < needed
+        lo = np.where(short, mid, lo)
+        hi = np.where(short, hi, mid)
+    return hi
+
+
+def solve(plans, balances, caps, rates=RETURN_ASSUMPTIONS, today=None):
+    # plans: rows with year, total and the account columns; balances: {account: current balance};
+    # caps: monthly contribution cap per account (None = unlimited). Money in 만원.
+    today = today or date.today()
+    plans = [p for p in plans if p['year'] >= today.year and (p['total'] or 0) > 0]
+    if not plans:
+        return []
+
+    years = np.array([p['year'] for p in plans])
+    months = (years - today.year) * 12 + 13 - today.month
+    targets = np.array([[p[PLAN_COLUMNS[a]] or 0 for a in ACCOUNTS] for p in plans], dtype=float)
+    totals = np.array([p['total'] for p in plans], dtype=float)
+    growth, annuity = growth_factors([rates[a] for a in ACCOUNTS], months)
+
+    # What the current balances grow into with no further contributions
+    base = np.array([balances[a] for a in ACCOUNTS], dtype=float) * growth
+    # Closed form per account: (target - base) / annuity factor
+    per_account = np.maximum((targets - base) / annuity, 0)
+
+    order = [ACCOUNTS.index(a) for a in FILL_ORDER]
+    total = solve_total(totals, base[:, order], annuity[:, order], [caps.get(a) for a in FILL_ORDER])
+    split = np.empty((len(plans), len(ACCOUNTS)))
+    split[:, order] = allocate(total, [caps.get(a) for a in FILL_ORDER])
+    # Only possible to miss when every account is capped
+    reachable = (base + split * annuity).sum(axis=1) >= totals - 0.5
+
+    projected = base.sum(axis=1).tolist()
+    total, split, per_account = total.tolist(), split.tolist(), per_account.tolist()
+    result = []
+    for i, year in enumerate(years.tolist()):
+        result.append({
+            'year': year,
+            'months': int(months[i]),
+            'target': int(totals[i]),
+            'projected': round(projected[i]),
+            'projected_pct': round(projected[i] / totals[i] * 100, 1),
+            'monthly': round(total[i], 1) if reachable[i] else None,
+            'split': {a: round(split[i][j], 1) for j, a in enumerate(ACCOUNTS)},
+            'per_account': {a: round(per_account[i][j], 1) for j, a in enumerate(ACCOUNTS)},
+        })
+    return result
+
+
+def current_balances(columns, year, starts):
+    # Book balances at the end of `year` from the summary columns (everything deposited so far)
+    index = np.searchsorted(columns['year'], year)
+    if index >= len(columns['year']) or columns['year'][index] != year:
+        return dict(starts) if year < summary.FIRST_YEAR else {a: int(columns[a][-1]) for a in ACCOUNTS}
+    return {a: int(columns[a][index]) for a in ACCOUNTS}
+
+
+def monthly_caps(conn, year):
+    caps = {}
+    for account in ACCOUNTS:
+        annual_limit, _ = limits.get_limits(conn, account, year)
+        caps[account] = annual_limit / 12 if annual_limit is not None else None
+    return caps
+
+
+def required_contributions(conn, scenario_id, starts, rates=RETURN_ASSUMPTIONS, today=None):
+    today = today or date.today()
+    # Limits are not versioned with the data, so they are part of the cache key
+    caps = monthly_caps(conn, today.year)
+
+    def compute():
+        plans = conn.execute('SELECT * FROM plan WHERE scenario_id = ? ORDER BY year ASC', (scenario_id,)).fetchall()
+        columns = summary.scenario_summary(conn, scenario_id, starts)
+        return solve(plans, current_balances(columns, today.year, starts), caps, rates, today)
+
+    key = ('goal-seek', scenario_id, tuple(sorted(starts.items())), tuple(sorted(rates.items())),
+           tuple(sorted(caps.items())), today.year, today.month)
+    return data_cache.cached(conn, key, compute)
@@ -0,0 +1,196 @@
+import argparse
+import csv
+import sqlite3
+from datetime import date
+
+import data_cache
+import lazy
+
+np = lazy.module('numpy')
+
+ACCOUNTS = ('pension', 'isa', 'general')
+PRICE_UNIT = 10000  # prices are in won, balances in 만원
+INGEST_BATCH = 5000
+
+
+def set_holding(conn, account, ticker, day, quantity):
+    # Raises ValueError for a date that is not YYYY-MM-DD; every as-of read parses the stored dates
+    day = date.fromisoformat(str(day).strip()).isoformat()
+    conn.execute('''
+        INSERT INTO holdings (account, ticker, date, quantity) VALUES (?, ?, ?, ?)
+        ON CONFLICT (account, ticker, date) DO UPDATE SET quantity = excluded.quantity
+    ''', (account, ticker.upper(), day, quantity))
+
+
+def list_holdings(conn):
+    return conn.execute('''
+        SELECT h.*, p.close, p.date AS price_date
+        FROM holdings h
+        LEFT JOIN prices p ON p.ticker = h.ticker AND p.date = (
+            SELECT MAX(date) FROM prices WHERE ticker = h.ticker)
+        ORDER BY h.account, h.ticker, h.date DESC
+    ''').fetchall()
+
+
+def delete_holding(conn, holding_id):
+    conn.execute('DELETE FROM holdings WHERE id = ?', (holding_id,))
+
+
+def price_count(conn):
+    return conn.execute('SELECT COUNT(*) FROM prices').fetchone()[0]
+
+
+def ingest_prices(conn, rows, batch=INGEST_BATCH):
+    # rows: iterable of (ticker, date, close); one executemany per batch keeps
+    # memory flat and lets other writers in between batches
+    count = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= batch:
+            count += _write_prices(conn, chunk)
+            chunk = []
+    if chunk:
+        count += _write_prices(conn, chunk)
+    return count
+
+
+def _write_prices(conn, chunk):
+    conn.executemany('''
+        INSERT INTO prices (ticker, date, close) VALUES (?, ?, ?)
+        ON CONFLICT (ticker, date) DO UPDATE SET close = excluded.close
+    ''', chunk)
+    conn.commit()
+    return len(chunk)
+
+
+def read_price_csv(stream):
+    # ticker,date,close with an optional header row
+    for parts in csv.reader(stream):
+        if len(parts) < 3 or not parts[0].strip():
+            continue
+        try:
+            close = float(parts[2].replace(',', ''))
+            day = date.fromisoformat(parts[1].strip()).isoformat()
+        except ValueError:
+            continue  # header or malformed line
+        yield parts[0].strip().upper(), day, close
+
+
+def _days(values):
+    return np.array(values, dtype='datetime64[D]').astype(np.int64)
+
+
+def _as_of(groups, days, query_groups, query_days):
+    # Index of the last row with the same group and day <= query day, else -1.
+    # Rows must be sorted by (group, day); one searchsorted covers every query, on a
+    # composite group * span + day key whose span covers every day on both sides
+    if not len(days) or not len(query_days):
+        return np.full(len(query_days), -1)
+    first = min(days.min(), query_days.min())
+    span = max(days.max(), query_days.max()) - first + 1
+    keys = groups * span + (days - first)
+    idx = np.searchsorted(keys, query_groups * span + (query_days - first), side='right') - 1
+    hit = idx >= 0
+    hit[hit] = groups[idx[hit]] == query_groups[hit]
+    return np.where(hit, idx, -1)
+
+
+def values_at(conn, days):
+    # Market value per account on each day (int64 days since epoch), plus whether
+    # the account held anything that day: ({account: values}, {account: held})
+    days = np.asarray(days, dtype=np.int64)
+    rows = conn.execute('SELECT account, ticker, date, quantity FROM holdings ORDER BY account, ticker, date').fetchall()
+    values = {a: np.zeros(len(days)) for a in ACCOUNTS}
+    held = {a: np.zeros(len(days), dtype=bool) for a in ACCOUNTS}
+    if not rows or not len(days):
+        return values, held
+
+    accounts = np.array([r[0] for r in rows])
+    tickers = np.array([r[1] for r in rows])
+    h_days = _days([r[2] for r in rows])
+    quantity = np.array([r[3] for r in rows], dtype=float)
+
+    # One group per (account, ticker) position
+    new_pair = np.ones(len(rows), dtype=bool)
+    new_pair[1:] = (accounts[1:] != accounts[:-1]) | (tickers[1:] != tickers[:-1])
+    pair = np.cumsum(new_pair) - 1
+    pair_account = accounts[new_pair]
+    pair_ticker = tickers[new_pair]
+
+    universe = np.unique(pair_ticker)
+    placeholders = ','.join('?' * len(universe))
+    prices = conn.execute(f'SELECT ticker, date, close FROM prices WHERE ticker IN ({placeholders}) ORDER BY ticker, date',
+                          universe.tolist()).fetchall()
+    p_ticker = np.searchsorted(universe, np.array([r[0] for r in prices], dtype=universe.dtype))
+    p_days = _days([r[1] for r in prices])
+    close = np.array([r[2] for r in prices], dtype=float)
+
+    # (position x day) grid of quantities and closes, each from one vectorized as-of search
+    grid_pair = np.repeat(np.arange(len(pair_ticker)), len(days))
+    grid_days = np.tile(days, len(pair_ticker))
+    q_idx = _as_of(pair, h_days, grid_pair, grid_days)
+    qty = np.where(q_idx >= 0, quantity[q_idx], 0.0).reshape(len(pair_ticker), len(days))
+
+    px = np.zeros_like(qty)
+    if prices:
+        grid_ticker = np.searchsorted(universe, pair_ticker)[grid_pair]
+        p_idx = _as_of(p_ticker, p_days, grid_ticker, grid_days)
+        px = np.where(p_idx >= 0, close[p_idx], 0.0).reshape(qty.shape)
+
+    position_value = qty * px / PRICE_UNIT
+    for account in ACCOUNTS:
+        mine = pair_account == account
+        values[account] = position_value[mine].sum(axis=0)
+        held[account] = (qty[mine] > 0).any(axis=0)
+    return values, held
+
+
+def market_on(conn, day):
+    # {account: market value} for the accounts holding anything on `day`
+    values, held = values_at(conn, _days([day]))
+    return {a: float(values[a][0]) for a in ACCOUNTS if held[a][0]}
+
+
+def daily_values(conn, start, end):
+    # Daily market value series for [start, end], cached until holdings or prices change
+    def compute():
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+        values, held = values_at(conn, days.astype(np.int64))
+        return {'dates': days, 'values': values, 'held': held}
+
+    return data_cache.cached(conn, ('market-daily', start, end), compute)
+
+
+def year_end_totals(conn, years, book, today=None):
+    # Total per year with held accounts marked to market at year end (or today for
+    # the current year); accounts without holdings and future years keep book value
+    today = today or date.today()
+    years = np.asarray(years)
+    ends = np.minimum(_days([f'{y}-12-31' for y in years]), _days([today.isoformat()])[0])
+    past = years <= today.year
+    values, held = values_at(conn, ends[past])
+
+    total = np.zeros(len(years))
+    for account in ACCOUNTS:
+        market = np.asarray(book[account], dtype=float).copy()
+        market[past] = np.where(held[account], values[account], market[past])
+        total += market
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load daily closes (ticker,date,close CSV) into the price table.")
+    parser.add_argument('--db', default='financial_plan.db')
+    parser.add_argument('csv', nargs='+')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    for path in args.csv:
+        with open(path, newline='', encoding='utf-8') as f:
+            print(f"{path}: {ingest_prices(conn, read_price_csv(f)):,} prices")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import data_cache
+import lazy
+
+np = lazy.module('numpy')
+
+# Real figures are expressed in BASE_YEAR won
+BASE_YEAR = 2026
+DEFAULT_RATE = 2.0
+
+PLAN_MONEY_COLUMNS = ('pension_savings', 'isa_account', 'general_account', 'total')
+
+
+def list_rates(conn):
+    return conn.execute('SELECT year, inflation_rate FROM cpi ORDER BY year').fetchall()
+
+
+def set_rate(conn, year, rate):
+    conn.execute('INSERT OR REPLACE INTO cpi (year, inflation_rate) VALUES (?, ?)', (year, rate))
+
+
+def delete_rate(conn, year):
+    conn.execute('DELETE FROM cpi WHERE year = ?', (year,))
+
+
+def deflator_series(conn, last_year):
+    # Price level of each year relative to BASE_YEAR; years without a row use DEFAULT_RATE
+    def compute():
+        years = np.arange(BASE_YEAR, max(last_year, BASE_YEAR) + 1)
+        rates = np.full(len(years), DEFAULT_RATE)
+        table = np.array(conn.execute('SELECT year, inflation_rate FROM cpi WHERE year > ? AND year <= ?',
+                                      (BASE_YEAR, years[-1])).fetchall()).reshape(-1, 2)
+        rates[table[:, 0].astype(np.int64) - BASE_YEAR] = table[:, 1]
+        rates[0] = 0.0
+        return np.cumprod(1 + rates / 100)
+
+    return data_cache.cached(conn, ('deflators', int(last_year)), compute)
+
+
+def deflators(conn, years):
+    years = np.asarray(years, dtype=np.int64)
+    if not len(years):
+        return np.ones(0)
+    series = deflator_series(conn, int(years.max()))
+    return series[np.clip(years - BASE_YEAR, 0, len(series) - 1)]
+
+
+def deflate_plans(conn, plans):
+    # Plan rows as dicts with their money columns in real terms
+    if not plans:
+        return []
+    money = np.array([[p[c] or 0 for c in PLAN_MONEY_COLUMNS] for p in plans], dtype=float)
+    money /= deflators(conn, [p['year'] for p in plans])[:, np.newaxis]
+    real = []
+    for plan, values in zip(plans, money.tolist()):
+        row = dict(plan)
+        row.update(zip(PLAN_MONEY_COLUMNS, values))
+        real.append(row)
+    return real
@@ -0,0 +1,245 @@
+# Local background jobs: a persisted job table plus a process pool, no broker.
+# Web threads only insert a row and hand the job to the pool; workers open
+# their own connection, report progress into the row and poll it for cancellation.
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+import data_cache
+
+MAX_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes
+
+JOB_KINDS = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def job(kind):
+    def register(fn):
+        JOB_KINDS[kind] = fn
+        return fn
+    return register
+
+
+def _alive(pid):
+    if pid == os.getpid():
+        return True
+    if os.name != 'posix':
+        return False  # single-process dev server: any other owner is gone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover(conn):
+    # Jobs whose owning web process died (with its pool) will never finish
+    rows = conn.execute("SELECT id, owner_pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+    orphaned = [(row[0],) for row in rows if row[1] is None or not _alive(row[1])]
+    conn.executemany('''
+        UPDATE jobs SET status = 'failed', error = 'Interrupted by server restart',
+                        finished_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+        WHERE id = ?
+    ''', orphaned)
+    conn.commit()
+    return len(orphaned)
+
+
+def _executor_instance():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: workers start clean instead of forking a threaded web server
+            _executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def input_hash(conn, kind, params):
+    # Same kind + params over the same data version -> same result
+    payload = json.dumps([kind, params, data_cache.current_version(conn)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def submit(conn, db_path, kind, params):
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    digest = input_hash(conn, kind, params)
+    cached = conn.execute('''
+        SELECT id FROM jobs WHERE input_hash = ? AND status IN ('done', 'queued', 'running')
+        ORDER BY created_at DESC LIMIT 1
+    ''', (digest,)).fetchone()
+    if cached:
+        return cached['id'], True
+
+    job_id = uuid.uuid4().hex
+    conn.execute('INSERT INTO jobs (id, kind, params, input_hash, owner_pid) VALUES (?, ?, ?, ?, ?)',
+                 (job_id, kind, json.dumps(params), digest, os.getpid()))
+    conn.commit()
+    _executor_instance().submit(run_job, os.path.abspath(db_path), job_id)
+    return job_id, False
+
+
+def get(conn, job_id):
+    row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    if row is None:
+        return None
+    result = dict(row)
+    result['params'] = json.loads(row['params'])
+    result['result'] = json.loads(row['result']) if row['result'] else None
+    return result
+
+
+def list_jobs(conn, limit=50):
+    return conn.execute('''
+        SELECT id, kind, status, progress, message, created_at, finished_at
+        FROM jobs ORDER BY created_at DESC LIMIT ?
+    ''', (limit,)).fetchall()
+
+
+def cancel(conn, job_id):
+    cur = conn.execute('''
+        UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')
+    ''', (job_id,))
+    conn.commit()
+    return cur.rowcount > 0
+
+
+class JobContext:
+    def __init__(self, conn, job_id, db_path):
+        self.conn = conn
+        self.job_id = job_id
+        self.db_path = db_path
+        self._last_write = 0.0
+
+    def progress(self, fraction, message=None):
+        # Throttled write of progress; also the cancellation checkpoint
+        now = time.monotonic()
+        if now - self._last_write < PROGRESS_INTERVAL and fraction < 1:
+            return
+        self._last_write = now
+        if self.conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (self.job_id,)).fetchone()[0]:
+            raise JobCancelled()
+        self.conn.execute('UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ?',
+                          (round(fraction, 4), message, self.job_id))
+        self.conn.commit()
+
+
+def run_job(db_path, job_id):
+    # Runs inside a worker process
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row['cancel_requested']:
+            raise JobCancelled()
+        conn.execute('''
+            UPDATE jobs SET status = 'running', started_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE id = ?
+        ''', (job_id,))
+        conn.commit()
+
+        result = JOB_KINDS[row['kind']](conn, json.loads(row['params']), JobContext(conn, job_id, db_path))
+        conn.execute('''
+            UPDATE jobs SET status = 'done', progress = 1, result = ?,
+                            finished_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE id = ?
+        ''', (json.dumps(result), job_id))
+    except JobCancelled:
+        conn.rollback()
+        conn.execute('''
+            UPDATE jobs SET status = 'cancelled', finished_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE id = ?
+        ''', (job_id,))
+    except Exception as e:
+        conn.rollback()
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', error = ?,
+                            finished_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE id = ?
+        ''', (f"{e}\n{traceback.format_exc()}", job_id))
+    finally:
+        conn.commit()
+        conn.close()
+
+
+# Built-in job kinds. Heavy modules are imported inside the worker only.
+
+@job('scenario_compare')
+def run_scenario_compare(conn, params, ctx):
+    import scenarios
+    ids = params.get('ids') or [row['id'] for row in scenarios.list_scenarios(conn)]
+    ctx.progress(0.1, 'Comparing scenarios')
+    data = scenarios.compare_scenarios(conn, ids, params['start_total'])
+    return data
+
+
+@job('returns')
+def run_returns(conn, params, ctx):
+    import returns
+    ctx.progress(0.1, 'Computing returns')
+    return returns.compute_returns(conn, params['starts'])
+
+
+@job('projection')
+def run_projection(conn, params, ctx):
+    # Monte Carlo of the total balance from the last actual year to the end of the plan
+    import numpy as np
+    import snapshot
+    import summary
+
+    # Ledger and plan come from the shared memory-mapped snapshot, not from row objects
+    snap = snapshot.current(ctx.db_path)
+    columns = summary.build_columns(snap.yearly_deposits(summary.FIRST_YEAR), snap.plans(params['scenario_id']),
+                                    params['starts'])
+    paths = int(params.get('paths', 20000))
+    mean = float(params.get('mean_return', 5.0)) / 100
+    volatility = float(params.get('volatility', 10.0)) / 100
+    contribution = float(params.get('annual_contribution', 0))
+    this_year = int(params.get('from_year', columns['year'][0]))
+
+    future = columns['year'] > this_year
+    years = columns['year'][future]
+    goals = columns['goal_total'][future]
+    start = float(columns['total'][columns['year'] <= this_year][-1])
+
+    rng = np.random.default_rng(params.get('seed'))
+    chunk = 2000
+    totals = np.empty((paths, len(years)))
+    for offset in range(0, paths, chunk):
+        n = min(chunk, paths - offset)
+        growth = 1 + rng.normal(mean, volatility, size=(n, len(years)))
+        balance = np.full(n, start)
+        for i in range(len(years)):
+            balance = balance * growth[:, i] + contribution
+            totals[offset:offset + n, i] = balance
+        ctx.progress((offset + n) / paths, f"Simulated {offset + n:,} of {paths:,} paths")
+
+    p10, p50, p90 = np.percentile(totals, [10, 50, 90], axis=0)
+    hit = np.where(goals > 0, (totals >= goals).mean(axis=0) * 100, 0.0)
+    return {
+        'from_year': this_year,
+        'start_total': start,
+        'years': years.tolist(),
+        'goal': goals.tolist(),
+        'p10': np.round(p10).tolist(),
+        'p50': np.round(p50).tolist(),
+        'p90': np.round(p90).tolist(),
+        'goal_probability': np.round(hit, 1).tolist(),
+    }
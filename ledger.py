@@ -0,0 +1,89 @@
+# Append-only event log behind the transactions table.
+# transactions stays the current-state projection every view reads; triggers
+# record each create/amend/void as an event, and every SNAPSHOT_INTERVAL
+# events a cumulative balance snapshot is materialized so any past balance is
+# rebuilt from the nearest snapshot plus a bounded tail of events.
+import archive
+
+SNAPSHOT_INTERVAL = 256  # baked into the balance_snapshots_periodic trigger (migrations.py)
+
+
+def latest_event_id(conn):
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM transaction_events').fetchone()[0]
+
+
+def event_at(conn, timestamp):
+    # Last event recorded on or before the timestamp (a bare date means end of that day)
+    if len(timestamp) == 10:
+        timestamp += ' 23:59:59.999'
+    row = conn.execute('SELECT MAX(id) FROM transaction_events WHERE recorded_at <= ?',
+                       (timestamp.replace('T', ' '),)).fetchone()
+    return row[0] or 0
+
+
+def balances(conn, event_id=None):
+    # Nearest snapshot at or before event_id plus the (at most SNAPSHOT_INTERVAL) events after it
+    latest = latest_event_id(conn)
+    event_id = latest if event_id is None else max(0, min(event_id, latest))
+    row = conn.execute('''
+        SELECT COALESCE(s.event_id, 0) AS snapshot_id,
+               COALESCE(s.pension, 0) + COALESCE(SUM(e.d_pension), 0) AS pension,
+               COALESCE(s.isa, 0) + COALESCE(SUM(e.d_isa), 0) AS isa,
+               COALESCE(s.general, 0) + COALESCE(SUM(e.d_general), 0) AS general
+        FROM (SELECT * FROM balance_snapshots WHERE event_id <= :event ORDER BY event_id DESC LIMIT 1) AS s
+        LEFT JOIN transaction_events AS e ON e.id > s.event_id AND e.id <= :event
+    ''', {'event': event_id}).fetchone()
+    result = dict(row)
+    result['event_id'] = event_id
+    return result
+
+
+def state_at(conn, event_id):
+    # The transactions table as it looked right after event_id: each row's latest event, voids dropped
+    return conn.execute('''
+        SELECT txn_id AS id, date, pension, isa, general, memo
+        FROM transaction_events
+        WHERE id IN (SELECT MAX(id) FROM transaction_events WHERE id <= ? GROUP BY txn_id)
+          AND event_type != 'void'
+        ORDER BY date DESC
+    ''', (event_id,)).fetchall()
+
+
+def list_events(conn, limit=100, before=None):
+    if before is None:
+        before = latest_event_id(conn) + 1
+    return conn.execute('SELECT * FROM transaction_events WHERE id < ? ORDER BY id DESC LIMIT ?',
+                        (before, limit)).fetchall()
+
+
+def undo(conn, event_id):
+    # Undo appends the compensating event (via the projection triggers) instead of erasing history
+    event = conn.execute('SELECT * FROM transaction_events WHERE id = ?', (event_id,)).fetchone()
+    if event is None:
+        raise ValueError(f"Event {event_id} does not exist.")
+    latest = conn.execute('SELECT MAX(id) FROM transaction_events WHERE txn_id = ?', (event['txn_id'],)).fetchone()[0]
+    if latest != event_id:
+        raise ValueError(f"Event {event_id} is not the latest change to transaction {event['txn_id']}.")
+    if conn.execute('SELECT 1 FROM transactions_archive WHERE id = ?', (event['txn_id'],)).fetchone():
+        raise ValueError(f"Transaction {event['txn_id']} is in a closed year. Reopen the year to undo it.")
+
+    def check_open(day):
+        # The closed-year triggers would refuse the write; say so instead
+        errors = archive.check_open(conn, int(day[:4]))
+        if errors:
+            raise ValueError(errors[0])
+
+    if event['event_type'] == 'create':
+        conn.execute('DELETE FROM transactions WHERE id = ?', (event['txn_id'],))
+    elif event['event_type'] == 'void':
+        check_open(event['date'])
+        conn.execute('INSERT INTO transactions (id, date, pension, isa, general, memo) VALUES (?, ?, ?, ?, ?, ?)',
+                     (event['txn_id'], event['date'], event['pension'], event['isa'], event['general'], event['memo']))
+    else:
+        previous = conn.execute('''
+            SELECT * FROM transaction_events WHERE txn_id = ? AND id < ? ORDER BY id DESC LIMIT 1
+        ''', (event['txn_id'], event_id)).fetchone()
+        check_open(previous['date'])
+        conn.execute('UPDATE transactions SET date = ?, pension = ?, isa = ?, general = ?, memo = ? WHERE id = ?',
+                     (previous['date'], previous['pension'], previous['isa'], previous['general'], previous['memo'],
+                      event['txn_id']))
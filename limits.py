@@ -0,0 +1,63 @@
+ACCOUNTS = ('pension', 'isa', 'general')
+
+# Annual contribution limit and tax-credit limit per account, in 만원.
+# 연금저축+IRP: 1,800 납입 / 900 세액공제, ISA: 2,000 납입. General has no limit.
+DEFAULT_LIMITS = {
+    'pension': (1800, 900),
+    'isa': (2000, None),
+}
+
+
+def get_limits(conn, account, year):
+    row = conn.execute('SELECT annual_limit, tax_credit_limit FROM contribution_limits WHERE account = ? AND year = ?',
+                       (account, year)).fetchone()
+    if row:
+        return row['annual_limit'], row['tax_credit_limit']
+    return DEFAULT_LIMITS.get(account, (None, None))
+
+
+def set_limits(conn, account, year, annual_limit, tax_credit_limit):
+    conn.execute('''
+        INSERT OR REPLACE INTO contribution_limits (account, year, annual_limit, tax_credit_limit)
+        VALUES (?, ?, ?, ?)
+    ''', (account, year, annual_limit, tax_credit_limit))
+
+
+def contributed(conn, account, year):
+    row = conn.execute('SELECT amount FROM contribution_totals WHERE account = ? AND year = ?',
+                       (account, year)).fetchone()
+    return row['amount'] if row else 0
+
+
+def check_contribution(conn, year, amounts, replacing=None):
+    # Constant time per account: one counter lookup plus one limit lookup.
+    # `replacing` is the transaction being edited, whose deposits no longer count.
+    errors = []
+    for account, amount in amounts.items():
+        annual_limit, _ = get_limits(conn, account, year)
+        if annual_limit is None or amount <= 0:
+            continue
+        used = contributed(conn, account, year)
+        if replacing is not None and int(replacing['date'][:4]) == year:
+            used -= max(replacing[account], 0)
+        if used + amount > annual_limit:
+            errors.append(f"{account.upper()} deposit of {amount:,} exceeds the {year} limit of "
+                          f"{annual_limit:,} ({used:,} already contributed).")
+    return errors
+
+
+def headroom(conn, year):
+    rows = []
+    for account in DEFAULT_LIMITS:
+        annual_limit, tax_credit_limit = get_limits(conn, account, year)
+        used = contributed(conn, account, year)
+        rows.append({
+            'account': account,
+            'year': year,
+            'contributed': used,
+            'annual_limit': annual_limit,
+            'remaining': None if annual_limit is None else max(annual_limit - used, 0),
+            'tax_credit_limit': tax_credit_limit,
+            'tax_credit_remaining': None if tax_credit_limit is None else max(tax_credit_limit - used, 0),
+        })
+    return rows
@@ -0,0 +1,193 @@
+# Live dashboard updates over Server-Sent Events.
+# One watcher thread per process reads the data version (a one-row lookup) and,
+# when it moves, rebuilds the dashboard view once per subscribed (scenario, mode)
+# and hands only the changed years to every subscriber's queue. Idle clients cost
+# a queue and a periodic keep-alive comment, never a query of their own.
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from datetime import date
+
+import data_cache
+import inflation
+import summary
+
+POLL_INTERVAL = 1.0  # seconds between version checks while anyone is subscribed
+HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+QUEUE_SIZE = 32  # a client this far behind is dropped; it reconnects with a full snapshot
+
+SUMMARY_FIELDS = ('pension', 'isa', 'general', 'total', 'market_total', 'goal_total', 'gap_total', 'gap_pct')
+PLAN_FIELDS = ('pension_savings', 'isa_account', 'general_account')
+
+logger = logging.getLogger('live')
+
+
+def dashboard_view(conn, scenario_id, real, starts, today=None):
+    # {year: row} with the yearly summary (balances, gap) and the plan values the charts draw
+    this_year = (today or date.today()).year
+    if real:
+        columns = summary.real_summary(conn, scenario_id, starts)
+    else:
+        columns = summary.scenario_summary(conn, scenario_id, starts)
+    plans = conn.execute('''
+        SELECT year, pension_savings, isa_account, general_account, total FROM plan
+        WHERE scenario_id = ? ORDER BY year
+    ''', (scenario_id,)).fetchall()
+    if real:
+        plans = inflation.deflate_plans(conn, plans)
+
+    view = {}
+    for row in summary.rows(columns):
+        view[row['year']] = {f: round(row[f]) if f != 'gap_pct' else row[f] for f in SUMMARY_FIELDS}
+        view[row['year']]['year'] = row['year']
+    for plan in plans:
+        row = view.setdefault(plan['year'], {'year': plan['year']})
+        row.update({f: round(plan[f] or 0) for f in PLAN_FIELDS})
+        row['plan_total'] = round(plan['total'] or 0)
+        # The total chart only marks years that have started to market
+        row['market'] = row.get('market_total') if plan['year'] <= this_year else None
+    return view
+
+
+def delta(old, new):
+    changed = [new[year] for year in sorted(new) if old.get(year) != new[year]]
+    removed = sorted(set(old) - set(new))
+    return changed, removed
+
+
+def sse(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class Broadcaster:
+    def __init__(self, db_path, starts, poll=POLL_INTERVAL):
+        self.db_path = db_path
+        self.starts = starts
+        self.poll = poll
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = {}  # (scenario_id, real) -> set of queues
+        self._views = {}  # (scenario_id, real) -> (version, view)
+        self._thread = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def subscribe(self, scenario_id, real, since=None):
+        # Queue of SSE payloads for one client. A client whose page predates the
+        # current view (or that reconnects) first gets every year as one delta.
+        key = (scenario_id, bool(real))
+        q = queue.Queue(QUEUE_SIZE)
+        conn = self._connect()
+        try:
+            with self._lock:
+                version, view = self._views.get(key, (None, None))
+            current = data_cache.current_version(conn)
+            if version != current:
+                view = dashboard_view(conn, scenario_id, real, self.starts)
+                version = current
+                with self._lock:
+                    self._views[key] = (version, view)
+        finally:
+            conn.close()
+        if since is None or since != version:
+            q.put(sse('delta', {'years': [view[y] for y in sorted(view)], 'removed': []}, version))
+
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-broadcaster', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, scenario_id, real, q):
+        key = (scenario_id, bool(real))
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[key]
+                    self._views.pop(key, None)
+
+    def notify(self):
+        # Called after a write in this process so the change goes out without waiting a poll
+        self._wake.set()
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                self._wake.wait(self.poll)
+                self._wake.clear()
+                with self._lock:
+                    keys = list(self._subscribers)
+                if not keys:
+                    continue
+                try:
+                    self._publish(conn, keys)
+                except sqlite3.Error:
+                    continue  # locked or mid-migration; the next pass retries
+                except Exception:
+                    # This thread feeds every stream in the process: log the pass and keep watching
+                    logger.exception('Live update pass failed')
+        finally:
+            conn.close()
+
+    def _publish(self, conn, keys):
+        version = data_cache.current_version(conn)
+        for key in keys:
+            with self._lock:
+                old_version, old = self._views.get(key, (None, {}))
+            if old_version == version:
+                continue
+            view = dashboard_view(conn, key[0], key[1], self.starts)
+            changed, removed = delta(old, view)
+            message = sse('delta', {'years': changed, 'removed': removed}, version)
+            with self._lock:
+                self._views[key] = (version, view)
+                subscribers = list(self._subscribers.get(key, ()))
+            if not changed and not removed:
+                continue
+            for q in subscribers:
+                try:
+                    q.put_nowait(message)
+                except queue.Full:
+                    # Too far behind: end its stream; the browser reconnects and resyncs
+                    self.unsubscribe(key[0], key[1], q)
+                    _close(q)
+
+
+def _close(q):
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            break
+    q.put_nowait(None)
+
+
+def stream(broadcaster, scenario_id, real, since=None, heartbeat=HEARTBEAT):
+    # Generator of SSE text for one client; unsubscribes when the client goes away
+    q = broadcaster.subscribe(scenario_id, real, since)
+    try:
+        yield f'retry: {int(POLL_INTERVAL * 3000)}\n\n'
+        while True:
+            try:
+                message = q.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        broadcaster.unsubscribe(scenario_id, real, q)
@@ -0,0 +1,710 @@
+# Versioned schema migrations keyed on PRAGMA user_version.
+# Each step runs once, in its own transaction, together with its version bump.
+# Append new steps to MIGRATIONS; never edit or reorder released ones. Steps are
+# frozen SQL: they must not call into the app modules, whose code keeps changing
+# after a step ships (tests/fixtures holds the schema every released version wrote).
+import sqlite3
+
+# Per-account contribution counter statements shared by the contribution_totals triggers
+_ADD_TOTALS = '''
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('pension', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.pension, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount;
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('isa', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.isa, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount;
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('general', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.general, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount;'''
+_SUBTRACT_TOTALS = '''
+            UPDATE contribution_totals SET amount = amount - max(OLD.pension, 0)
+            WHERE account = 'pension' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER);
+            UPDATE contribution_totals SET amount = amount - max(OLD.isa, 0)
+            WHERE account = 'isa' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER);
+            UPDATE contribution_totals SET amount = amount - max(OLD.general, 0)
+            WHERE account = 'general' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER);'''
+
+
+def _track(cursor, table):
+    # data_version bump on any write to table, so every process sees the change
+    for op in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS data_version_{table}_{op.lower()} AFTER {op} ON {table} BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END
+        ''')
+
+
+def baseline(cursor):
+    # Schema as of the first versioned release. Idempotent, so databases created
+    # before user_version was used (still at 0) pass through it unchanged.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scenarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO scenarios (id, name) VALUES (1, 'Base')")
+
+    # Databases created before scenarios existed key plan on year alone
+    plan_columns = [row[1] for row in cursor.execute('PRAGMA table_info(plan)')]
+    legacy_plan = bool(plan_columns) and 'scenario_id' not in plan_columns
+    if legacy_plan:
+        cursor.execute('ALTER TABLE plan RENAME TO plan_legacy')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scenario_id INTEGER NOT NULL DEFAULT 1 REFERENCES scenarios(id),
+            year INTEGER NOT NULL,
+            age INTEGER NOT NULL,
+            pension_savings INTEGER DEFAULT 0,
+            isa_account INTEGER DEFAULT 0,
+            general_account INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            health_insurance TEXT,
+            tax TEXT,
+            withdrawal_strategy TEXT
+        )
+    ''')
+    # One plan row per (scenario, year); also serves every per-scenario lookup
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_plan_scenario_year ON plan (scenario_id, year)')
+
+    if legacy_plan:
+        cursor.execute('''
+            INSERT INTO plan (id, scenario_id, year, age, pension_savings, isa_account, general_account,
+                              total, health_insurance, tax, withdrawal_strategy)
+            SELECT id, 1, year, age, pension_savings, isa_account, general_account,
+                   total, health_insurance, tax, withdrawal_strategy
+            FROM plan_legacy
+        ''')
+        cursor.execute('DROP TABLE plan_legacy')
+
+    # Plan history (plan_history.py): every insert/update/delete on plan adds one version row
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS plan_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan_id INTEGER NOT NULL,
+            scenario_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            age INTEGER,
+            pension_savings INTEGER DEFAULT 0,
+            isa_account INTEGER DEFAULT 0,
+            general_account INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            health_insurance TEXT,
+            tax TEXT,
+            withdrawal_strategy TEXT,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            valid_from TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_plan_versions_year_valid_from
+        ON plan_versions (scenario_id, year, valid_from)
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS plan_versions_insert AFTER INSERT ON plan BEGIN
+            INSERT INTO plan_versions (plan_id, scenario_id, year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy, valid_from)
+            VALUES (NEW.id, NEW.scenario_id, NEW.year, NEW.age, NEW.pension_savings, NEW.isa_account, NEW.general_account, NEW.total, NEW.health_insurance, NEW.tax, NEW.withdrawal_strategy, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS plan_versions_update AFTER UPDATE ON plan BEGIN
+            INSERT INTO plan_versions (plan_id, scenario_id, year, deleted, valid_from)
+            SELECT OLD.id, OLD.scenario_id, OLD.year, 1, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE OLD.year != NEW.year OR OLD.scenario_id != NEW.scenario_id;
+            INSERT INTO plan_versions (plan_id, scenario_id, year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy, valid_from)
+            VALUES (NEW.id, NEW.scenario_id, NEW.year, NEW.age, NEW.pension_savings, NEW.isa_account, NEW.general_account, NEW.total, NEW.health_insurance, NEW.tax, NEW.withdrawal_strategy, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS plan_versions_delete AFTER DELETE ON plan BEGIN
+            INSERT INTO plan_versions (plan_id, scenario_id, year, deleted, valid_from)
+            VALUES (OLD.id, OLD.scenario_id, OLD.year, 1, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+        END
+    ''')
+    # Rows that predate the history are dated to the epoch
+    if not cursor.execute('SELECT 1 FROM plan_versions LIMIT 1').fetchone():
+        cursor.execute('''
+            INSERT INTO plan_versions (plan_id, scenario_id, year, age, pension_savings, isa_account, general_account,
+                                       total, health_insurance, tax, withdrawal_strategy, valid_from)
+            SELECT id, scenario_id, year, age, pension_savings, isa_account, general_account,
+                   total, health_insurance, tax, withdrawal_strategy, '1970-01-01 00:00:00.000' FROM plan
+        ''')
+
+    # Actual inputs/transactions
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            pension INTEGER DEFAULT 0,
+            isa INTEGER DEFAULT 0,
+            general INTEGER DEFAULT 0
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    ''')
+
+    # Shared change counter (data_cache.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+    _track(cursor, 'plan')
+    _track(cursor, 'transactions')
+
+    # Market value of each account as observed on a date (end of day, after that day's deposits)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS valuations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account TEXT NOT NULL CHECK (account IN ('pension', 'isa', 'general')),
+            date TEXT NOT NULL,
+            market_value INTEGER NOT NULL,
+            UNIQUE (account, date)
+        )
+    ''')
+    _track(cursor, 'valuations')
+
+    # Annual inflation (actual CPI change or assumption) in percent
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cpi (
+            year INTEGER PRIMARY KEY,
+            inflation_rate REAL NOT NULL
+        )
+    ''')
+    _track(cursor, 'cpi')
+
+    # Contribution limits (limits.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contribution_limits (
+            account TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            annual_limit INTEGER,
+            tax_credit_limit INTEGER,
+            PRIMARY KEY (account, year)
+        )
+    ''')
+    # Running per-year deposit counters, kept in step with transactions by triggers
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contribution_totals (
+            account TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            amount INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (account, year)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contribution_totals_insert AFTER INSERT ON transactions BEGIN
+            {_ADD_TOTALS}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contribution_totals_update AFTER UPDATE ON transactions BEGIN
+            {_SUBTRACT_TOTALS}
+            {_ADD_TOTALS}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contribution_totals_delete AFTER DELETE ON transactions BEGIN
+            {_SUBTRACT_TOTALS}
+        END
+    ''')
+    # One-time backfill for ledgers recorded before the counters existed
+    if not cursor.execute('SELECT 1 FROM contribution_totals LIMIT 1').fetchone():
+        for account in ('pension', 'isa', 'general'):
+            cursor.execute(f'''
+                INSERT INTO contribution_totals (account, year, amount)
+                SELECT '{account}', CAST(substr(date, 1, 4) AS INTEGER), SUM(max({account}, 0))
+                FROM transactions GROUP BY 2
+            ''')
+
+    # Transaction event log (ledger.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transaction_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            txn_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL CHECK (event_type IN ('create', 'amend', 'void')),
+            date TEXT NOT NULL,
+            pension INTEGER DEFAULT 0,
+            isa INTEGER DEFAULT 0,
+            general INTEGER DEFAULT 0,
+            d_pension INTEGER DEFAULT 0,
+            d_isa INTEGER DEFAULT 0,
+            d_general INTEGER DEFAULT 0,
+            recorded_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transaction_events_txn ON transaction_events (txn_id, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transaction_events_recorded_at ON transaction_events (recorded_at)')
+
+    # Cumulative deposit sums (START_* balances excluded) as of event_id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS balance_snapshots (
+            event_id INTEGER PRIMARY KEY,
+            pension INTEGER NOT NULL,
+            isa INTEGER NOT NULL,
+            general INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO balance_snapshots (event_id, pension, isa, general) VALUES (0, 0, 0, 0)')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_create AFTER INSERT ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'create', NEW.date, NEW.pension, NEW.isa, NEW.general, NEW.pension, NEW.isa, NEW.general);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_amend AFTER UPDATE ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'amend', NEW.date, NEW.pension, NEW.isa, NEW.general,
+                    NEW.pension - OLD.pension, NEW.isa - OLD.isa, NEW.general - OLD.general);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_void AFTER DELETE ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (OLD.id, 'void', OLD.date, OLD.pension, OLD.isa, OLD.general, -OLD.pension, -OLD.isa, -OLD.general);
+        END
+    ''')
+    # Every 256th event (ledger.SNAPSHOT_INTERVAL) materializes a snapshot
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS balance_snapshots_periodic AFTER INSERT ON transaction_events
+        WHEN NEW.id % 256 = 0 BEGIN
+            INSERT OR REPLACE INTO balance_snapshots (event_id, pension, isa, general)
+            SELECT NEW.id,
+                   s.pension + COALESCE(SUM(e.d_pension), 0),
+                   s.isa + COALESCE(SUM(e.d_isa), 0),
+                   s.general + COALESCE(SUM(e.d_general), 0)
+            FROM (SELECT * FROM balance_snapshots WHERE event_id < NEW.id ORDER BY event_id DESC LIMIT 1) AS s
+            LEFT JOIN transaction_events AS e ON e.id > s.event_id AND e.id <= NEW.id;
+        END
+    ''')
+    # Ledgers recorded before the event log existed start with one create event per row
+    if not cursor.execute('SELECT 1 FROM transaction_events LIMIT 1').fetchone():
+        cursor.execute('''
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            SELECT id, 'create', date, pension, isa, general, pension, isa, general FROM transactions ORDER BY id
+        ''')
+
+    # Background jobs (jobs.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_input_hash ON jobs (input_hash, status)')
+
+
+def job_owner(cursor):
+    # Lets a booting worker tell its siblings' live jobs from orphaned ones
+    cursor.execute('ALTER TABLE jobs ADD COLUMN owner_pid INTEGER')
+
+
+def holdings_and_prices(cursor):
+    # Position of a ticker in an account, effective from `date` until the next row
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS holdings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account TEXT NOT NULL CHECK (account IN ('pension', 'isa', 'general')),
+            ticker TEXT NOT NULL,
+            date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            UNIQUE (account, ticker, date)
+        )
+    ''')
+    # Daily closes; the primary key is the (ticker, date) index every as-of lookup uses
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prices (
+            ticker TEXT NOT NULL,
+            date TEXT NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (ticker, date)
+        ) WITHOUT ROWID
+    ''')
+    _track(cursor, 'holdings')
+    _track(cursor, 'prices')
+
+
+def goal_curves(cursor):
+    # Month-end targets per scenario; month 0 is January of goal_curve.FIRST_YEAR and
+    # month -1 holds the starting total the curve grows from
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goal_curve (
+            scenario_id INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            linear REAL NOT NULL,
+            compound REAL NOT NULL,
+            PRIMARY KEY (scenario_id, month)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS goal_curve_meta (
+            scenario_id INTEGER PRIMARY KEY,
+            start_total INTEGER NOT NULL
+        )
+    ''')
+    # Any plan change marks that scenario's curve stale
+    for op, row in (('INSERT', 'NEW'), ('UPDATE', 'OLD'), ('DELETE', 'OLD')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS goal_curve_plan_{op.lower()} AFTER {op} ON plan BEGIN
+                DELETE FROM goal_curve_meta WHERE scenario_id = {row}.scenario_id;
+            END
+        ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS goal_curve_plan_move AFTER UPDATE OF scenario_id ON plan BEGIN
+            DELETE FROM goal_curve_meta WHERE scenario_id = NEW.scenario_id;
+        END
+    ''')
+
+
+_PLAN_ENTRY = '''
+        INSERT INTO search_index (rowid, kind, ref_id, scenario_id, title, body)
+        VALUES (NEW.id * 2, 'plan', NEW.id, NEW.scenario_id, NEW.year || ' (' || NEW.age || ')',
+                COALESCE(NEW.withdrawal_strategy, ''));'''
+_TXN_ENTRY = '''
+        INSERT INTO search_index (rowid, kind, ref_id, scenario_id, title, body)
+        SELECT NEW.id * 2 + 1, 'transaction', NEW.id, NULL, NEW.date, NEW.memo
+        WHERE COALESCE(NEW.memo, '') != '';'''
+
+
+def search_index(cursor):
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(transactions)')]
+    if 'memo' not in columns:
+        cursor.execute('ALTER TABLE transactions ADD COLUMN memo TEXT')
+
+    # Memo edits move no money, so contribution totals ignore them for good; the ledger amend
+    # trigger is narrowed here too, until event_memos starts recording memo-only edits
+    cursor.execute('DROP TRIGGER IF EXISTS transaction_events_amend')
+    cursor.execute('DROP TRIGGER IF EXISTS contribution_totals_update')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_amend AFTER UPDATE OF date, pension, isa, general ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'amend', NEW.date, NEW.pension, NEW.isa, NEW.general,
+                    NEW.pension - OLD.pension, NEW.isa - OLD.isa, NEW.general - OLD.general);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS contribution_totals_update AFTER UPDATE OF date, pension, isa ON transactions BEGIN
+            {_SUBTRACT_TOTALS}
+            {_ADD_TOTALS}
+        END
+    ''')
+
+    # One index over plan strategies and transaction memos. rowid = id * 2 for plan
+    # rows and id * 2 + 1 for transactions, so triggers update entries by rowid.
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            kind UNINDEXED, ref_id UNINDEXED, scenario_id UNINDEXED, title, body,
+            tokenize = 'trigram'
+        )
+    ''')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS search_plan_insert AFTER INSERT ON plan BEGIN {_PLAN_ENTRY} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS search_plan_update
+        AFTER UPDATE OF scenario_id, year, age, withdrawal_strategy ON plan BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 2;
+            {_PLAN_ENTRY}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS search_plan_delete AFTER DELETE ON plan BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 2;
+        END
+    ''')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS search_txn_insert AFTER INSERT ON transactions BEGIN {_TXN_ENTRY} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS search_txn_update AFTER UPDATE OF date, memo ON transactions BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+            {_TXN_ENTRY}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS search_txn_delete AFTER DELETE ON transactions BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+        END
+    ''')
+
+    # Index what already exists
+    cursor.execute('DELETE FROM search_index')
+    cursor.execute('''
+        INSERT INTO search_index (rowid, kind, ref_id, scenario_id, title, body)
+        SELECT id * 2, 'plan', id, scenario_id, year || ' (' || age || ')', COALESCE(withdrawal_strategy, '')
+        FROM plan
+    ''')
+    cursor.execute('''
+        INSERT INTO search_index (rowid, kind, ref_id, scenario_id, title, body)
+        SELECT id * 2 + 1, 'transaction', id, NULL, date, memo FROM transactions WHERE COALESCE(memo, '') != ''
+    ''')
+
+
+def _mark_txn(row):
+    return f"INSERT OR IGNORE INTO alert_dirty VALUES ('txn', 0, CAST(substr({row}.date, 1, 4) AS INTEGER));"
+
+
+def _mark_plan(row):
+    return f"INSERT OR IGNORE INTO alert_dirty VALUES ('plan', {row}.scenario_id, {row}.year);"
+
+
+def alerting(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alert_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL CHECK (kind IN ('achievement_below', 'depletion_earlier', 'limit_near')),
+            scenario_id INTEGER NOT NULL DEFAULT 1,
+            account TEXT,
+            threshold REAL,
+            sink TEXT NOT NULL DEFAULT 'log',
+            enabled INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Last evaluated condition per rule and year, so an alert fires once when a
+    # condition starts to hold rather than on every write while it holds
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alert_state (
+            rule_id INTEGER NOT NULL REFERENCES alert_rules(id) ON DELETE CASCADE,
+            year INTEGER NOT NULL,
+            active INTEGER NOT NULL,
+            value REAL,
+            PRIMARY KEY (rule_id, year)
+        ) WITHOUT ROWID
+    ''')
+    # Years touched by writes since the last evaluation; triggers fill it, the dispatcher drains it.
+    # scenario_id is 0 for transaction-side changes, which affect every scenario.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alert_dirty (
+            source TEXT NOT NULL,
+            scenario_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            PRIMARY KEY (source, scenario_id, year)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alert_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rule_id INTEGER,
+            sink TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            sent_at TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_alert_outbox_status ON alert_outbox (status, id)')
+
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS alert_dirty_txn_insert AFTER INSERT ON transactions BEGIN {_mark_txn("NEW")} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS alert_dirty_txn_update AFTER UPDATE OF date, pension, isa, general ON transactions
+        BEGIN {_mark_txn("OLD")} {_mark_txn("NEW")} END
+    ''')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS alert_dirty_txn_delete AFTER DELETE ON transactions BEGIN {_mark_txn("OLD")} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS alert_dirty_plan_insert AFTER INSERT ON plan BEGIN {_mark_plan("NEW")} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS alert_dirty_plan_update AFTER UPDATE ON plan BEGIN {_mark_plan("OLD")} {_mark_plan("NEW")} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS alert_dirty_plan_delete AFTER DELETE ON plan BEGIN {_mark_plan("OLD")} END')
+    for op, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS alert_dirty_limits_{op.lower()} AFTER {op} ON contribution_limits BEGIN
+                INSERT OR IGNORE INTO alert_dirty VALUES ('txn', 0, {row}.year);
+            END
+        ''')
+
+
+def year_close(cursor):
+    # Holds a row only inside a close/reopen transaction (archive.py); per-row bookkeeping
+    # triggers (ledger events, contribution counters, search, alerts) skip rows while it does
+    cursor.execute('CREATE TABLE IF NOT EXISTS archive_guard (id INTEGER PRIMARY KEY CHECK (id = 1))')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions_archive (
+            id INTEGER PRIMARY KEY,
+            date TEXT NOT NULL,
+            pension INTEGER DEFAULT 0,
+            isa INTEGER DEFAULT 0,
+            general INTEGER DEFAULT 0,
+            memo TEXT,
+            year INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_archive_date ON transactions_archive (date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS closing_balances (
+            year INTEGER NOT NULL,
+            account TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            balance INTEGER NOT NULL,
+            txn_count INTEGER NOT NULL,
+            closed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (year, account)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS transactions_all AS
+        SELECT id, date, pension, isa, general, memo FROM transactions
+        UNION ALL
+        SELECT id, date, pension, isa, general, memo FROM transactions_archive
+    ''')
+    _track(cursor, 'closing_balances')
+
+    # Closed years are read-only until reopened
+    for op, columns in (('INSERT', ''), ('UPDATE', ' OF date')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS closed_year_{op.lower()} BEFORE {op}{columns} ON transactions
+            WHEN NOT EXISTS (SELECT 1 FROM archive_guard)
+             AND CAST(substr(NEW.date, 1, 4) AS INTEGER) <= (SELECT MAX(year) FROM closing_balances)
+            BEGIN
+                SELECT RAISE(ABORT, 'year is closed');
+            END
+        ''')
+
+    # Recreate the per-row bookkeeping triggers with their archive_guard condition:
+    # rows moving to or from the archive are not money movements, keep their closed
+    # year's counters, stay searchable and change no balance
+    for name in ('transaction_events_create', 'transaction_events_void',
+                 'contribution_totals_insert', 'contribution_totals_delete',
+                 'search_txn_insert', 'search_txn_delete',
+                 'alert_dirty_txn_insert', 'alert_dirty_txn_delete'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    archiving = 'WHEN NOT EXISTS (SELECT 1 FROM archive_guard)'
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_create AFTER INSERT ON transactions
+        {archiving} BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'create', NEW.date, NEW.pension, NEW.isa, NEW.general, NEW.pension, NEW.isa, NEW.general);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_void AFTER DELETE ON transactions
+        {archiving} BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (OLD.id, 'void', OLD.date, OLD.pension, OLD.isa, OLD.general, -OLD.pension, -OLD.isa, -OLD.general);
+        END
+    ''')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS contribution_totals_insert AFTER INSERT ON transactions {archiving} BEGIN {_ADD_TOTALS} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS contribution_totals_delete AFTER DELETE ON transactions {archiving} BEGIN {_SUBTRACT_TOTALS} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS search_txn_insert AFTER INSERT ON transactions {archiving} BEGIN {_TXN_ENTRY} END')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS search_txn_delete AFTER DELETE ON transactions {archiving} BEGIN
+            DELETE FROM search_index WHERE rowid = OLD.id * 2 + 1;
+        END
+    ''')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS alert_dirty_txn_insert AFTER INSERT ON transactions {archiving} BEGIN {_mark_txn("NEW")} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS alert_dirty_txn_delete AFTER DELETE ON transactions {archiving} BEGIN {_mark_txn("OLD")} END')
+
+
+def event_memos(cursor):
+    # Events carry the memo (transactions gained it after the log existed), so undo and
+    # state_at restore it along with the amounts; memo-only edits are recorded as amends
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(transaction_events)')]
+    if 'memo' not in columns:
+        cursor.execute('ALTER TABLE transaction_events ADD COLUMN memo TEXT')
+    for name in ('transaction_events_create', 'transaction_events_amend', 'transaction_events_void'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_create AFTER INSERT ON transactions
+        WHEN NOT EXISTS (SELECT 1 FROM archive_guard) BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, memo, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'create', NEW.date, NEW.pension, NEW.isa, NEW.general, NEW.memo, NEW.pension, NEW.isa, NEW.general);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_amend AFTER UPDATE OF date, pension, isa, general, memo ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, memo, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'amend', NEW.date, NEW.pension, NEW.isa, NEW.general, NEW.memo,
+                    NEW.pension - OLD.pension, NEW.isa - OLD.isa, NEW.general - OLD.general);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS transaction_events_void AFTER DELETE ON transactions
+        WHEN NOT EXISTS (SELECT 1 FROM archive_guard) BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, memo, d_pension, d_isa, d_general)
+            VALUES (OLD.id, 'void', OLD.date, OLD.pension, OLD.isa, OLD.general, OLD.memo, -OLD.pension, -OLD.isa, -OLD.general);
+        END
+    ''')
+    # Rows keep their current memo on their latest event
+    cursor.execute('''
+        UPDATE transaction_events
+        SET memo = (SELECT memo FROM transactions WHERE transactions.id = transaction_events.txn_id
+                    UNION ALL
+                    SELECT memo FROM transactions_archive WHERE transactions_archive.id = transaction_events.txn_id)
+        WHERE id IN (SELECT MAX(id) FROM transaction_events GROUP BY txn_id) AND event_type != 'void'
+    ''')
+
+
+def outbox_claims(cursor):
+    # When a dispatcher claimed each message, so claims of a process that died can be released
+    cursor.execute('ALTER TABLE alert_outbox ADD COLUMN claimed_at TEXT')
+
+
+MIGRATIONS = [
+    baseline,
+    job_owner,
+    holdings_and_prices,
+    goal_curves,
+    search_index,
+    alerting,
+    year_close,
+    event_memos,
+    outbox_claims,
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(db_path):
+    # Returns the list of versions applied; safe to call from every worker at boot
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    applied = []
+    try:
+        if schema_version(conn) >= LATEST_VERSION:
+            return applied
+        # WAL lets backups and other readers run alongside writes (setting persists in the file)
+        conn.execute('PRAGMA journal_mode=WAL')
+        while True:
+            # The write lock serializes workers racing to migrate; re-read the version under it
+            conn.execute('BEGIN IMMEDIATE')
+            version = schema_version(conn)
+            if version >= LATEST_VERSION:
+                conn.execute('COMMIT')
+                return applied
+            try:
+                MIGRATIONS[version](conn.cursor())
+                conn.execute(f'PRAGMA user_version = {version + 1}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(version + 1)
+    finally:
+        conn.close()
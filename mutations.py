@@ -0,0 +1,154 @@
+import datetime
+
+import archive
+import goal_curve
+import limits
+
+TRANSACTION_FIELDS = ('date', 'pension', 'isa', 'general')
+PLAN_FIELDS = ('year', 'age', 'pension_savings', 'isa_account', 'general_account',
+               'health_insurance', 'tax', 'withdrawal_strategy')
+PLAN_MONEY_FIELDS = ('pension_savings', 'isa_account', 'general_account')
+
+
+def clean_currency(val):
+    if not val: return 0
+    try:
+        return int(float(str(val).replace(',', '').strip() or 0))
+    except (OverflowError, ValueError):
+        raise ValueError(f"Invalid amount: {val!r}") from None
+
+
+def clean_memo(val):
+    return str(val or '').strip() or None
+
+
+def parse_date(date):
+    # YYYY-MM-DD that names a real day (anything after the day is dropped)
+    try:
+        if date[4] != '-' or date[7] != '-':
+            raise ValueError
+        return datetime.date.fromisoformat(date[:10]).isoformat()
+    except (TypeError, IndexError, KeyError, ValueError):
+        raise ValueError(f"Invalid date: {date!r}") from None
+
+
+def _year(date):
+    return int(parse_date(date)[:4])
+
+
+def _entries(batch, key, shape):
+    # batch[key] as a list of rows (dicts) or ids (ints)
+    items = batch.get(key, [])
+    if not isinstance(items, list) or not all(isinstance(i, shape) and not isinstance(i, bool) for i in items):
+        raise ValueError(f"'{key}' must be a list of {'objects' if shape is dict else 'ids'}.")
+    return items
+
+
+# Both batch functions run inside the caller's transaction and raise ValueError
+# on the first bad entry so the caller can roll the whole batch back.
+
+def apply_transaction_batch(conn, batch):
+    changed_ids, deleted, years = [], [], set()
+
+    for item in _entries(batch, 'create', dict):
+        values = {f: clean_currency(item.get(f)) for f in TRANSACTION_FIELDS if f != 'date'}
+        date = parse_date(item.get('date'))
+        year = int(date[:4])
+        errors = archive.check_open(conn, year) or \
+            limits.check_contribution(conn, year, {'pension': values['pension'], 'isa': values['isa']})
+        if errors:
+            raise ValueError(errors[0])
+        cur = conn.execute('INSERT INTO transactions (date, pension, isa, general, memo) VALUES (?, ?, ?, ?, ?)',
+                           (date, values['pension'], values['isa'], values['general'],
+                            clean_memo(item.get('memo'))))
+        changed_ids.append(cur.lastrowid)
+        years.add(year)
+
+    for item in _entries(batch, 'update', dict):
+        current = conn.execute('SELECT * FROM transactions WHERE id = ?', (item.get('id'),)).fetchone()
+        if current is None:
+            raise ValueError(f"Transaction {item.get('id')} does not exist.")
+        date = parse_date(item['date']) if 'date' in item else current['date']
+        values = {f: clean_currency(item[f]) if f in item else current[f] for f in TRANSACTION_FIELDS if f != 'date'}
+        year = int(date[:4])
+        errors = archive.check_open(conn, year) or \
+            limits.check_contribution(conn, year, {'pension': values['pension'], 'isa': values['isa']},
+                                      replacing=current)
+        if errors:
+            raise ValueError(errors[0])
+        memo = clean_memo(item['memo']) if 'memo' in item else current['memo']
+        conn.execute('UPDATE transactions SET date = ?, pension = ?, isa = ?, general = ?, memo = ? WHERE id = ?',
+                     (date, values['pension'], values['isa'], values['general'], memo, current['id']))
+        changed_ids.append(current['id'])
+        years.update((year, _year(current['date'])))
+
+    for txn_id in _entries(batch, 'delete', int):
+        current = conn.execute('SELECT date FROM transactions WHERE id = ?', (txn_id,)).fetchone()
+        if current is None:
+            raise ValueError(f"Transaction {txn_id} does not exist.")
+        conn.execute('DELETE FROM transactions WHERE id = ?', (txn_id,))
+        deleted.append(txn_id)
+        years.add(_year(current['date']))
+
+    rows = _fetch(conn, 'transactions', changed_ids)
+    # Running balances carry forward, so every year from the earliest change onward moves
+    return rows, deleted, (min(years) if years else None)
+
+
+def plan_values(item, current=None):
+    # A plan row from submitted fields (missing ones taken from current), with the total
+    # recomputed; raises ValueError for bad amounts or a missing/non-numeric year or age
+    values = {f: item[f] if f in item else (current[f] if current else None) for f in PLAN_FIELDS}
+    for f in PLAN_MONEY_FIELDS:
+        values[f] = clean_currency(values[f])
+    if values['year'] in (None, '') or values['age'] in (None, ''):
+        raise ValueError("Plan rows need a year and an age.")
+    try:
+        values['year'], values['age'] = int(values['year']), int(values['age'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid year or age: {values['year']!r}, {values['age']!r}") from None
+    values['total'] = sum(values[f] for f in PLAN_MONEY_FIELDS)
+    return values
+
+
+def apply_plan_batch(conn, batch, scenario_id):
+    changed_ids, deleted, years = [], [], set()
+
+    for item in _entries(batch, 'create', dict):
+        values = plan_values(item)
+        cur = conn.execute(f'''
+            INSERT INTO plan (scenario_id, {', '.join(values)}) VALUES (?, {', '.join('?' * len(values))})
+        ''', (scenario_id, *values.values()))
+        changed_ids.append(cur.lastrowid)
+        years.add(values['year'])
+
+    for item in _entries(batch, 'update', dict):
+        current = conn.execute('SELECT * FROM plan WHERE id = ? AND scenario_id = ?',
+                               (item.get('id'), scenario_id)).fetchone()
+        if current is None:
+            raise ValueError(f"Plan row {item.get('id')} does not exist.")
+        values = plan_values(item, current)
+        conn.execute(f'''
+            UPDATE plan SET {', '.join(f + ' = ?' for f in values)} WHERE id = ?
+        ''', (*values.values(), current['id']))
+        changed_ids.append(current['id'])
+        years.update((values['year'], current['year']))
+
+    for plan_id in _entries(batch, 'delete', int):
+        current = conn.execute('SELECT year FROM plan WHERE id = ? AND scenario_id = ?', (plan_id, scenario_id)).fetchone()
+        if current is None:
+            raise ValueError(f"Plan row {plan_id} does not exist.")
+        conn.execute('DELETE FROM plan WHERE id = ?', (plan_id,))
+        deleted.append(plan_id)
+        years.add(current['year'])
+
+    goal_curve.build(conn, scenario_id)
+    # A plan edit only moves the goal (and gap) of its own year(s)
+    return _fetch(conn, 'plan', changed_ids), deleted, sorted(years)
+
+
+def _fetch(conn, table, ids):
+    if not ids:
+        return []
+    rows = conn.execute(f'SELECT * FROM {table} WHERE id IN ({",".join("?" * len(ids))})', ids).fetchall()
+    return [dict(row) for row in rows]
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+PLAN_FIELDS = ('age', 'pension_savings', 'isa_account', 'general_account', 'total',
+               'health_insurance', 'tax', 'withdrawal_strategy')
+
+
+# Accepted as_of forms, each read as the end of the day, minute or second it names
+AS_OF_FORMATS = (('%Y-%m-%d', ' 23:59:59.999'), ('%Y-%m-%d %H:%M', ':59.999'), ('%Y-%m-%d %H:%M:%S', '.999'),
+                 ('%Y-%m-%d %H:%M:%S.%f', ''))
+
+
+def normalize_as_of(value):
+    # YYYY-MM-DD[ HH:MM[:SS[.fff]]] (or with a T) as the valid_from it compares against;
+    # raises ValueError for anything else
+    text = str(value or '').strip().replace('T', ' ', 1)
+    for fmt, end in AS_OF_FORMATS:
+        try:
+            moment = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if end:
+            return moment.strftime(fmt) + end
+        return moment.isoformat(sep=' ', timespec='milliseconds')
+    raise ValueError(f"Invalid date: {value!r}")
+
+
+def plan_as_of(conn, scenario_id, as_of):
+    # One index seek on (scenario_id, year, valid_from) per year, no replaying of edits
+    return conn.execute(f'''
+        SELECT v.plan_id AS id, v.scenario_id, v.year, {', '.join('v.' + f for f in PLAN_FIELDS)}, v.valid_from
+        FROM (SELECT DISTINCT year FROM plan_versions WHERE scenario_id = :scenario) AS y
+        JOIN plan_versions AS v ON v.id = (
+            SELECT id FROM plan_versions
+            WHERE scenario_id = :scenario AND year = y.year AND valid_from <= :as_of
+            ORDER BY valid_from DESC, id DESC
+            LIMIT 1
+        )
+        WHERE v.deleted = 0
+        ORDER BY v.year ASC
+    ''', {'scenario': scenario_id, 'as_of': normalize_as_of(as_of)}).fetchall()
+
+
+def list_versions(conn, scenario_id, limit=100):
+    return conn.execute('''
+        SELECT valid_from, COUNT(*) AS changes, MIN(year) AS first_year, MAX(year) AS last_year
+        FROM plan_versions
+        WHERE scenario_id = ?
+        GROUP BY valid_from
+        ORDER BY valid_from DESC
+        LIMIT ?
+    ''', (scenario_id, limit)).fetchall()
+
+
+def diff_plans(conn, scenario_id, from_ts, to_ts):
+    before = {row['year']: row for row in plan_as_of(conn, scenario_id, from_ts)}
+    after = {row['year']: row for row in plan_as_of(conn, scenario_id, to_ts)}
+
+    changes = []
+    for year in sorted(before.keys() | after.keys()):
+        old, new = before.get(year), after.get(year)
+        if old is None:
+            changes.append({'year': year, 'change': 'added',
+                            'fields': {f: [None, new[f]] for f in PLAN_FIELDS}})
+        elif new is None:
+            changes.append({'year': year, 'change': 'removed',
+                            'fields': {f: [old[f], None] for f in PLAN_FIELDS}})
+        else:
+            fields = {f: [old[f], new[f]] for f in PLAN_FIELDS if old[f] != new[f]}
+            if fields:
+                changes.append({'year': year, 'change': 'changed', 'fields': fields})
+    return changes
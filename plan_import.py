@@ -0,0 +1,260 @@
+# Bulk plan import from CSV/TSV or XLSX. The whole file is parsed into a TEMP staging
+# table and validated there (one row per year, consecutive years and ages, total equal
+# to the sum of the accounts); only a clean file is swapped in, with one set-based statement
+# per step (delete, update, insert) inside a single transaction, so readers see either the old plan or the new one.
+import argparse
+import csv
+import io
+import math
+import re
+import sqlite3
+
+import goal_curve
+import scenarios
+
+COLUMNS = ('year', 'age', 'pension_savings', 'isa_account', 'general_account', 'total',
+           'health_insurance', 'tax', 'withdrawal_strategy')
+MONEY_COLUMNS = ('pension_savings', 'isa_account', 'general_account', 'total')
+TEXT_COLUMNS = ('health_insurance', 'tax', 'withdrawal_strategy')
+
+# Header cells (lower-cased) that name a column; 'year_age' is the "2026(50)" form
+HEADERS = {
+    'year': 'year', '연도': 'year', 'age': 'age', '나이': 'age', '세': 'age',
+    'year(age)': 'year_age', '연도(세)': 'year_age',
+    'pension_savings': 'pension_savings', 'pension': 'pension_savings', '연금저축/irp': 'pension_savings', '연금저축': 'pension_savings',
+    'isa_account': 'isa_account', 'isa': 'isa_account', 'isa 계좌': 'isa_account',
+    'general_account': 'general_account', 'general': 'general_account', '일반계좌': 'general_account',
+    'total': 'total', '합계(잔액)': 'total', '합계': 'total',
+    'health_insurance': 'health_insurance', '예상건보료': 'health_insurance',
+    'tax': 'tax', '예상세금': 'tax',
+    'withdrawal_strategy': 'withdrawal_strategy', 'strategy': 'withdrawal_strategy', '주요 인출 및 운용 전략': 'withdrawal_strategy',
+}
+# Files without a header use the layout of the original planning sheet
+DEFAULT_LAYOUT = ('year_age', 'pension_savings', 'isa_account', 'general_account', 'total',
+                  'health_insurance', 'tax', 'withdrawal_strategy')
+YEAR_AGE = re.compile(r'^\s*(\d{4})\s*\(\s*(\d+)\s*\)\s*$')
+MAX_ERRORS = 20
+
+
+class InvalidPlan(ValueError):
+    def __init__(self, errors):
+        super().__init__(errors[0] if len(errors) == 1 else f"{len(errors)} problems in the plan file.")
+        self.errors = errors
+
+
+def read_table(data, filename=''):
+    # Raw cell rows from file bytes: XLSX by extension (first sheet), otherwise delimited text
+    if filename.lower().endswith('.xlsx'):
+        # Imported here: openpyxl pulls in numpy, which app start-up must not pay for
+        try:
+            import openpyxl
+        except ImportError:
+            raise InvalidPlan(["Reading .xlsx files needs openpyxl (pip install openpyxl); upload a CSV instead."]) from None
+        # A damaged file can fail in zipfile, the XML parser or openpyxl itself, on open or mid-sheet
+        try:
+            book = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+            try:
+                return [['' if v is None else v for v in row] for row in book.worksheets[0].iter_rows(values_only=True)]
+            finally:
+                book.close()
+        except Exception as e:
+            raise InvalidPlan([f"Could not read the spreadsheet: {e}"]) from None
+    text = data
+    if isinstance(data, bytes):
+        try:
+            text = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            # Excel on Korean Windows saves CSV as cp949
+            try:
+                text = data.decode('cp949')
+            except UnicodeDecodeError:
+                raise InvalidPlan(["The file is not UTF-8 or CP949 text."]) from None
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    delimiter = '\t' if '\t' in lines[0] else ','
+    try:
+        return list(csv.reader(lines, delimiter=delimiter))
+    except csv.Error as e:
+        raise InvalidPlan([f"Could not read the file: {e}"]) from None
+
+
+def _layout(row):
+    names = [HEADERS.get(str(cell).strip().lower()) for cell in row]
+    return names if any(names) else None
+
+
+def _integer(value):
+    # Number cells and text alike: '1.5' is refused just as 1.5 is, and so are inf/nan and
+    # anything SQLite cannot store as an INTEGER
+    if not isinstance(value, (int, float)):
+        text = str(value).replace(',', '').strip()
+        if not text:
+            return None
+        value = int(text) if text.lstrip('+-').isdigit() else float(text)
+    if isinstance(value, float) and (not math.isfinite(value) or value != int(value)):
+        raise ValueError
+    if abs(value) >= 2 ** 63:
+        raise ValueError
+    return int(value)
+
+
+def _text(value):
+    if isinstance(value, float) and value == int(value):
+        value = int(value)
+    text = str(value).strip()
+    return text or None
+
+
+def parse(table):
+    # -> ([(line, {column: value})], errors). Money cells may use thousands separators.
+    rows, errors = [], []
+    layout = _layout(table[0]) if table else None
+    start = 1 if layout else 0
+    layout = layout or DEFAULT_LAYOUT
+    for line, cells in enumerate(table[start:], start + 1):
+        if not any(str(c).strip() for c in cells):
+            continue
+        values = dict.fromkeys(COLUMNS)
+        try:
+            for name, cell in zip(layout, cells):
+                if name == 'year_age':
+                    match = YEAR_AGE.match(str(cell))
+                    if not match:
+                        raise ValueError(f"expected year(age) like 2026(50), got {cell!r}")
+                    values['year'], values['age'] = int(match.group(1)), int(match.group(2))
+                elif name in TEXT_COLUMNS:
+                    values[name] = _text(cell)
+                elif name:
+                    try:
+                        values[name] = _integer(cell)
+                    except ValueError:
+                        raise ValueError(f"{name} is not a whole number: {cell!r}") from None
+        except ValueError as e:
+            errors.append(f"Line {line}: {e}")
+            continue
+        if values['year'] is None:
+            errors.append(f"Line {line}: missing year")
+            continue
+        for name in MONEY_COLUMNS[:3]:
+            values[name] = values[name] or 0
+        if values['total'] is None:
+            values['total'] = sum(values[name] for name in MONEY_COLUMNS[:3])
+        rows.append((line, values))
+    return rows, errors
+
+
+def stage(conn, rows):
+    conn.execute(f'''
+        CREATE TEMP TABLE IF NOT EXISTS plan_import (
+            line INTEGER NOT NULL,
+            {', '.join(f'{c} {"TEXT" if c in TEXT_COLUMNS else "INTEGER"}' for c in COLUMNS)}
+        )
+    ''')
+    conn.execute('DELETE FROM temp.plan_import')
+    conn.executemany(f'''
+        INSERT INTO temp.plan_import (line, {', '.join(COLUMNS)}) VALUES (?, {', '.join('?' * len(COLUMNS))})
+    ''', [(line, *(values[c] for c in COLUMNS)) for line, values in rows])
+
+
+def validate(conn):
+    # Checks run over the staged file as a whole, in SQL
+    errors = [f"Line {r[0]}: missing {r[1]}" for r in conn.execute('''
+        SELECT line, CASE WHEN year IS NULL THEN 'year' ELSE 'age' END FROM temp.plan_import
+        WHERE year IS NULL OR age IS NULL ORDER BY line
+    ''')]
+    errors += [f"Line {r[0]}: year {r[1]} appears more than once (first on line {r[2]})" for r in conn.execute('''
+        SELECT line, year, first FROM (
+            SELECT line, year, MIN(line) OVER (PARTITION BY year) AS first FROM temp.plan_import
+        ) WHERE line != first ORDER BY line
+    ''')]
+    errors += [f"Line {r[0]}: total {r[1]:,} is not pension + ISA + general ({r[2]:,})" for r in conn.execute('''
+        SELECT line, total, pension_savings + isa_account + general_account FROM temp.plan_import
+        WHERE total != pension_savings + isa_account + general_account ORDER BY line
+    ''')]
+    errors += [f"Line {r[0]}: balances cannot be negative" for r in conn.execute(f'''
+        SELECT line FROM temp.plan_import WHERE MIN({', '.join(MONEY_COLUMNS)}) < 0 ORDER BY line
+    ''')]
+    for line, year, prev_year, age, prev_age in conn.execute('''
+        SELECT line, year, LAG(year) OVER w, age, LAG(age) OVER w FROM temp.plan_import
+        WINDOW w AS (ORDER BY year, line)
+    ''').fetchall():
+        if prev_year is None or prev_year == year:
+            continue
+        if year != prev_year + 1:
+            errors.append(f"Line {line}: years jump from {prev_year} to {year}")
+        elif age is not None and prev_age is not None and age != prev_age + 1:
+            errors.append(f"Line {line}: age {age} in {year} does not follow {prev_age} in {prev_year}")
+    if not conn.execute('SELECT 1 FROM temp.plan_import LIMIT 1').fetchone():
+        errors.append("The file has no plan rows.")
+    return errors
+
+
+def swap(conn, scenario_id):
+    # Years missing from the file are dropped, the rest are upserted in place (ids and
+    # unchanged rows are kept, so plan history only records real edits)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        deleted = conn.execute('''
+            DELETE FROM plan WHERE scenario_id = ? AND year NOT IN (SELECT year FROM temp.plan_import)
+        ''', (scenario_id,)).rowcount
+        # Plain UPDATE and INSERT rather than an UPSERT: an upsert's conflict policy would
+        # override the OR IGNORE in the bookkeeping triggers on plan
+        fields = COLUMNS[1:]
+        changed = conn.execute(f'''
+            UPDATE plan SET {', '.join(f'{c} = s.{c}' for c in fields)}
+            FROM temp.plan_import AS s
+            WHERE plan.scenario_id = ? AND plan.year = s.year
+              AND ({', '.join(f'plan.{c}' for c in fields)}) IS NOT ({', '.join(f's.{c}' for c in fields)})
+        ''', (scenario_id,)).rowcount
+        changed += conn.execute(f'''
+            INSERT INTO plan (scenario_id, {', '.join(COLUMNS)})
+            SELECT ?, {', '.join(COLUMNS)} FROM temp.plan_import AS s
+            WHERE NOT EXISTS (SELECT 1 FROM plan WHERE scenario_id = ? AND year = s.year)
+        ''', (scenario_id, scenario_id)).rowcount
+        goal_curve.build(conn, scenario_id)
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return changed, deleted
+
+
+def import_plan(conn, data, filename='', scenario_id=scenarios.DEFAULT_SCENARIO_ID, dry_run=False):
+    # Replaces the scenario's plan with the file's rows, or raises InvalidPlan and changes nothing.
+    # Runs its own transactions, so call it on a connection with nothing pending. Returns {'rows', 'changed', 'deleted'}.
+    rows, errors = parse(read_table(data, filename))
+    stage(conn, rows)
+    errors += validate(conn)
+    conn.commit()  # staging only touches the connection's temp schema
+    if errors:
+        raise InvalidPlan(errors[:MAX_ERRORS] + ([f"... and {len(errors) - MAX_ERRORS} more"]
+                                                   if len(errors) > MAX_ERRORS else []))
+    changed, deleted = (0, 0) if dry_run else swap(conn, scenario_id)
+    return {'rows': len(rows), 'changed': changed, 'deleted': deleted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replace a scenario's plan with the rows of a CSV/TSV/XLSX file.")
+    parser.add_argument('--db', default='financial_plan.db')
+    parser.add_argument('--scenario', type=int, default=scenarios.DEFAULT_SCENARIO_ID)
+    parser.add_argument('--check', action='store_true', help="validate only")
+    parser.add_argument('file')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        with open(args.file, 'rb') as f:
+            result = import_plan(conn, f.read(), args.file, args.scenario, dry_run=args.check)
+    except InvalidPlan as e:
+        for error in e.errors:
+            print(error)
+        raise SystemExit(1)
+    finally:
+        conn.close()
+    print(f"{args.file}: {result['rows']} rows" + ('' if args.check else
+          f", {result['changed']} inserted or changed, {result['deleted']} removed"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+# Read replicas fed by WAL shipping. The primary stays the only writer; a shipper
+# copies the page images of newly committed WAL frames into a plain (rollback
+# journal) copy of the database in each replica directory, and records when that
+# copy was last confirmed current. Requests that only read go to the nearest replica
+# whose confirmation is recent enough; everything else uses the primary.
+#
+# Frames are read while holding the primary's write lock, so the WAL cannot grow or
+# restart mid-read. Between passes the shipper keeps a read transaction open whose
+# snapshot ends at the last shipped frame: a checkpoint cannot move past it, so the
+# WAL never restarts over frames that were not shipped yet. Anything the shipper
+# cannot account for (first contact, page size change, restart while it was not
+# running) is repaired with a full copy through the backup API.
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import data_cache
+
+SHIP_INTERVAL = 1.0  # seconds between shipping passes
+MAX_STALENESS = 5.0  # seconds; older replicas are skipped and reads fall back to the primary
+CHECKPOINT_FRAMES = 1000  # shipped WAL frames before the shipper checkpoints (SQLite's own default)
+REPLICA_DB = 'financial_plan.db'
+META_FILE = 'replica.json'
+
+WAL_MAGIC = (0x377f0682, 0x377f0683)
+WAL_HEADER = struct.Struct('>8I')  # magic, version, page size, checkpoint seq, salt-1, salt-2, checksum x2
+FRAME_HEADER = struct.Struct('>6I')  # page number, db size (commit frames only), salt-1, salt-2, checksum x2
+
+logger = logging.getLogger('replication')
+
+
+def replica_dirs(value=None):
+    # REPLICAS=dir1,dir2 lists replica directories, nearest first
+    value = os.getenv('REPLICAS', '') if value is None else value
+    return [d.strip() for d in value.split(',') if d.strip()]
+
+
+def wal_header(wal_path):
+    # (page_size, salt) of the WAL's current generation, or None without a WAL
+    try:
+        with open(wal_path, 'rb') as f:
+            raw = f.read(WAL_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(raw) < WAL_HEADER.size:
+        return None
+    magic, _, page_size, _, salt1, salt2, _, _ = WAL_HEADER.unpack(raw)
+    if magic not in WAL_MAGIC:
+        return None
+    return page_size, (salt1, salt2)
+
+
+def read_frames(wal_path, page_size, salt, start=0):
+    # Latest image of every page committed in frames [start, end) of this generation.
+    # Returns (pages, db_size, end); frames after the last commit frame are left alone.
+    frame_size = FRAME_HEADER.size + page_size
+    with open(wal_path, 'rb') as f:
+        f.seek(WAL_HEADER.size + start * frame_size)
+        data = f.read()
+    pages, pending = {}, {}
+    db_size, end = None, start
+    for i in range(len(data) // frame_size):
+        offset = i * frame_size
+        pgno, commit, salt1, salt2, _, _ = FRAME_HEADER.unpack_from(data, offset)
+        if (salt1, salt2) != salt:
+            break  # left over from an earlier generation
+        pending[pgno] = data[offset + FRAME_HEADER.size:offset + frame_size]
+        if commit:
+            pages.update(pending)
+            pending = {}
+            db_size, end = commit, start + i + 1
+    return pages, db_size, end
+
+
+def _rollback_header(page, counter, db_size):
+    # Page 1 as a rollback-journal database: legacy read/write versions, a new
+    # change counter (so readers drop cached pages) and a valid in-header size
+    page = bytearray(page)
+    page[18:20] = b'\x01\x01'
+    struct.pack_into('>II', page, 24, counter, db_size)
+    struct.pack_into('>I', page, 92, counter)
+    return bytes(page)
+
+
+class Replica:
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, REPLICA_DB)
+        self.meta_path = os.path.join(directory, META_FILE)
+        self._fd = None
+
+    def meta(self):
+        return read_meta(self.directory)
+
+    def _file(self):
+        # Kept open for good: closing a descriptor drops every POSIX lock this process
+        # holds on the file, including those of SQLite connections reading it
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR)
+        return self._fd
+
+    def snapshot(self, db_path):
+        # Full copy through the backup API; readers keep the old file until they reopen
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(suffix='.db', dir=self.directory)
+        os.close(fd)
+        src, dst = sqlite3.connect(db_path), sqlite3.connect(tmp)
+        try:
+            src.backup(dst)
+            dst.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            dst.close()
+            src.close()
+        os.replace(tmp, self.path)
+        if self._fd is not None:
+            os.close(self._fd)  # the replaced file: nobody reads it through this process any more
+            self._fd = None
+        return os.path.getsize(self.path)
+
+    def apply(self, pages, db_size, page_size):
+        # Page images written in place under an exclusive lock taken through SQLite,
+        # so replica readers wait (busy timeout) instead of seeing half a transaction
+        lock = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            lock.execute('BEGIN EXCLUSIVE')
+            fd = self._file()
+            counter = struct.unpack('>I', os.pread(fd, 4, 24))[0] + 1
+            page1 = pages.get(1) or os.pread(fd, page_size, 0)
+            for pgno, data in pages.items():
+                if pgno != 1:
+                    os.pwrite(fd, data, (pgno - 1) * page_size)
+            os.pwrite(fd, _rollback_header(page1, counter, db_size), 0)
+            os.ftruncate(fd, db_size * page_size)
+            lock.execute('COMMIT')
+        finally:
+            lock.close()
+        return len(pages) * page_size
+
+    def write_meta(self, meta):
+        tmp = self.meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Shipper:
+    def __init__(self, db_path, directories):
+        self.db_path = db_path
+        self.replicas = [Replica(d) for d in directories]
+        self._guard = None  # read transaction pinning the WAL at the last shipped frame
+        self._current = set()  # replicas shipped by this shipper under an unbroken guard
+        self.stats = {r.directory: {'passes': 0, 'frames': 0, 'bytes': 0, 'snapshots': 0,
+                                    'last_error': None, 'last_pass_ms': None} for r in self.replicas}
+
+    def ship_once(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = data_cache.current_version(conn)
+                page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+                header = wal_header(self.db_path + '-wal')
+                if header and header[0] != page_size:
+                    header = None  # page size changed by VACUUM: only a full copy is consistent
+                    self._current.clear()
+                end = 0
+                for replica in self.replicas:
+                    t0 = time.perf_counter()
+                    stats = self.stats[replica.directory]
+                    try:
+                        end = max(end, self._ship(replica, header, page_size, version, stats))
+                        stats['last_error'] = None
+                    except (OSError, sqlite3.Error, ValueError) as e:
+                        self._current.discard(replica.directory)
+                        stats['last_error'] = f"{type(e).__name__}: {e}"
+                        logger.error('Shipping to %s failed: %s', replica.directory, e)
+                    stats['passes'] += 1
+                    stats['last_pass_ms'] = round((time.perf_counter() - t0) * 1000, 2)
+                self._hold(end)
+            finally:
+                conn.rollback()  # nothing was written; this only releases the write lock
+        finally:
+            conn.close()
+
+    def _ship(self, replica, header, page_size, version, stats):
+        meta = replica.meta()
+        salt = list(header[1]) if header else []
+        usable = meta is not None and meta.get('page_size') == page_size and os.path.exists(replica.path)
+        if usable and header and meta['salt'] == salt:
+            start = meta['frame']  # same generation: every frame since the last pass is still there
+        elif usable and replica.directory in self._current:
+            start = 0  # the WAL restarted, but only after everything before it was shipped
+        else:
+            start = None
+        if start is None:
+            stats['bytes'] += replica.snapshot(self.db_path)
+            stats['snapshots'] += 1
+            end = read_frames(self.db_path + '-wal', page_size, header[1])[2] if header else 0
+        elif header:
+            pages, db_size, end = read_frames(self.db_path + '-wal', page_size, header[1], start)
+            if pages:
+                stats['bytes'] += replica.apply(pages, db_size, page_size)
+                stats['frames'] += end - start
+        else:
+            end = 0
+        replica.write_meta({'salt': salt, 'page_size': page_size, 'frame': end,
+                            'version': version, 'synced_at': time.time()})
+        self._current.add(replica.directory)
+        return end
+
+    def _hold(self, frames):
+        # Called with the write lock held, so the new snapshot ends exactly where shipping stopped
+        if self._guard is None:
+            self._guard = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        if self._guard.in_transaction:
+            self._guard.execute('COMMIT')
+        if frames >= CHECKPOINT_FRAMES and len(self._current) == len(self.replicas):
+            # Every frame is shipped: fold the WAL into the database so the next writer
+            # can restart it, instead of the guard letting it grow without bound
+            self._guard.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        self._guard.execute('BEGIN')
+        self._guard.execute('SELECT version FROM data_version').fetchone()
+
+    def close(self):
+        if self._guard is not None:
+            self._guard.close()
+            self._guard = None
+        self._current.clear()
+
+    def run(self, interval=SHIP_INTERVAL, stop=None):
+        stop = stop or threading.Event()
+        try:
+            while not stop.is_set():
+                try:
+                    self.ship_once()
+                except sqlite3.Error as e:
+                    logger.error('Shipping pass failed: %s', e)
+                stop.wait(interval)
+        finally:
+            self.close()
+
+    def start(self, interval=SHIP_INTERVAL):
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(interval, self.stop), name='wal-shipper', daemon=True)
+        self.thread.start()
+        return self
+
+
+def start_shipper(db_path, directories, interval=SHIP_INTERVAL):
+    return Shipper(db_path, directories).start(interval)
+
+
+def staleness(meta, now=None):
+    return (now or time.time()) - meta['synced_at']
+
+
+def nearest(directories, max_staleness=MAX_STALENESS, now=None):
+    # Database path of the first replica confirmed current within the bound, else None
+    now = now or time.time()
+    for directory in directories:
+        meta = read_meta(directory)
+        if meta is not None and staleness(meta, now) <= max_staleness:
+            return os.path.join(directory, REPLICA_DB)
+    return None
+
+
+def connect_replica(path):
+    uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro"
+    return sqlite3.connect(uri, uri=True, timeout=30)
+
+
+def status(conn, directories, max_staleness=MAX_STALENESS, shipper=None):
+    # Lag per replica: seconds since it was last confirmed current and data versions behind
+    version = data_cache.current_version(conn)
+    now = time.time()
+    replicas = []
+    for directory in directories:
+        meta = read_meta(directory)
+        entry = {'directory': directory, 'synced': meta is not None}
+        if meta is not None:
+            lag = staleness(meta, now)
+            entry.update(lag_seconds=round(lag, 3), version=meta['version'], version_lag=version - meta['version'],
+                         fresh=lag <= max_staleness)
+        if shipper is not None and directory in shipper.stats:
+            entry['shipper'] = dict(shipper.stats[directory])
+        replicas.append(entry)
+    return {'primary_version': version, 'max_staleness': max_staleness, 'replicas': replicas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ship the primary's WAL to read-only replica directories.")
+    parser.add_argument('--db', default='financial_plan.db')
+    parser.add_argument('--interval', type=float, default=0, help='repeat every N seconds (default: ship once)')
+    parser.add_argument('replicas', nargs='*', help='replica directories (default: $REPLICAS)')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    directories = args.replicas or replica_dirs()
+    if not directories:
+        raise SystemExit("No replica directories given (arguments or REPLICAS)")
+    shipper = Shipper(args.db, directories)
+    if args.interval:
+        shipper.run(args.interval)
+    else:
+        shipper.ship_once()
+        shipper.close()
+        for directory, stats in shipper.stats.items():
+            print(f"{directory}: {stats['frames']} frame(s), {stats['bytes']:,} bytes"
+                  + (f", full copy" if stats['snapshots'] else '') + (f", error: {stats['last_error']}" if stats['last_error'] else ''))
+
+
+if __name__ == '__main__':
+    main()
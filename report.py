@@ -0,0 +1,272 @@
+# Headless annual reviews for many households: one database per household, one
+# static HTML and/or CSV report per (database, scenario). Reports are rendered in a
+# process pool; each worker compiles the report template once (through the shared
+# bytecode cache) and writes its files itself, and the index grows as reports finish.
+import argparse
+import concurrent.futures
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import urllib.parse
+from datetime import date
+
+FORMATS = ('html', 'csv')
+TEMPLATE = 'report.html'
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+STYLESHEET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'css', 'style.css')
+PROJECTION_YEARS = 3  # the dashboard's "+3 years" table
+
+CSV_COLUMNS = ('year', 'plan_pension', 'plan_isa', 'plan_general', 'plan_total',
+               'input_p', 'input_i', 'input_g', 'pension', 'isa', 'general',
+               'total', 'market_total', 'goal_total', 'gap_total', 'gap_pct')
+INDEX_COLUMNS = ('name', 'database', 'scenario_id', 'scenario', 'status', 'as_of', 'target', 'actual',
+                 'gap_pct', 'final_year', 'final_goal', 'html', 'csv', 'ms', 'error')
+
+# Per-worker state set up once by `_init_worker`
+_template = None
+_stylesheet = ''
+
+
+def _init_worker(cache_dir):
+    global _template, _stylesheet
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+    os.makedirs(cache_dir, exist_ok=True)
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape(),
+                      bytecode_cache=FileSystemBytecodeCache(cache_dir))
+    _template = env.get_template(TEMPLATE)
+    with open(STYLESHEET, encoding='utf-8') as f:
+        _stylesheet = f.read()
+
+
+def collect(conn, scenario_id, starts, as_of, real=False):
+    # Everything one report shows: yearly summary, achievement to date, projection, chart data
+    import goal_curve
+    import inflation
+    import summary
+
+    plans = conn.execute('''
+        SELECT year, age, pension_savings, isa_account, general_account, total FROM plan
+        WHERE scenario_id = ? ORDER BY year
+    ''', (scenario_id,)).fetchall()
+    start_total = sum(starts.values())
+    if real:
+        columns = summary.real_summary(conn, scenario_id, starts, as_of)
+        plans = inflation.deflate_plans(conn, plans)
+    else:
+        columns = summary.scenario_summary(conn, scenario_id, starts, as_of)
+        plans = [dict(p) for p in plans]
+    rows = summary.rows(columns)
+
+    to_date = None
+    target = goal_curve.target_at(conn, scenario_id, as_of, start_total)
+    if target is not None:
+        actual = goal_curve.actual_at(conn, as_of, start_total)
+        if real:
+            deflator = float(inflation.deflators(conn, [as_of.year])[0])
+            target, actual = target / deflator, actual / deflator
+        to_date = {'date': as_of.isoformat(), 'target': round(target), 'actual': round(actual),
+                   'gap': round(actual - target),
+                   'gap_pct': round(actual / target * 100, 1) if target > 0 else 0.0}
+
+    market = {r['year']: r['market_total'] for r in rows if r['year'] <= as_of.year}
+    chart = {
+        'labels': [p['year'] for p in plans],
+        'market': [market.get(p['year']) for p in plans],
+        'pension': [p['pension_savings'] for p in plans],
+        'isa': [p['isa_account'] for p in plans],
+        'general': [p['general_account'] for p in plans],
+        'total': [p['total'] for p in plans],
+    }
+    return {
+        'plans': plans,
+        'summary': rows,
+        'current': next((r for r in rows if r['year'] == as_of.year), None),
+        'projection': [r for r in rows if as_of.year <= r['year'] <= as_of.year + PROJECTION_YEARS],
+        'to_date': to_date,
+        'chart': chart,
+    }
+
+
+def csv_text(report):
+    plans = {p['year']: p for p in report['plans']}
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    for row in report['summary']:
+        plan = plans.get(row['year'], {})
+        writer.writerow([row['year'], round(plan.get('pension_savings') or 0), round(plan.get('isa_account') or 0),
+                         round(plan.get('general_account') or 0), round(plan.get('total') or 0)]
+                        + [round(row[c]) for c in CSV_COLUMNS[5:-1]] + [row['gap_pct']])
+    return out.getvalue()
+
+
+def _write(path, text):
+    # Written beside the target and renamed, so a reader never sees half a report
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _connect(db_path):
+    # Household files are opened read-only and never migrated here
+    import migrations
+
+    conn = sqlite3.connect(f"file:{urllib.parse.quote(os.path.abspath(db_path))}?mode=ro", uri=True, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        version = migrations.schema_version(conn)
+        if version < migrations.LATEST_VERSION:
+            raise ValueError(f"Schema version {version} is older than {migrations.LATEST_VERSION}; "
+                             "open it with the app (or run migrations) first")
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def render(task):
+    # Worker entry point: one (database, scenario) -> files on disk, returns its index row
+    import data_cache
+
+    t0 = time.perf_counter()
+    entry = {'name': task['name'], 'database': task['db'], 'scenario_id': task['scenario_id'],
+             'status': 'ok', 'as_of': task['as_of']}
+    # Cached results are keyed by data version only, which repeats across databases
+    data_cache.clear()
+    try:
+        conn = _connect(task['db'])
+        try:
+            row = conn.execute('SELECT name FROM scenarios WHERE id = ?', (task['scenario_id'],)).fetchone()
+            if row is None:
+                raise ValueError(f"No scenario {task['scenario_id']}")
+            entry['scenario'] = row['name']
+            report = collect(conn, task['scenario_id'], task['starts'],
+                             date.fromisoformat(task['as_of']), task['real'])
+        finally:
+            conn.close()
+
+        base = os.path.join(task['out'], task['name'])
+        if 'html' in task['formats']:
+            entry['html'] = base + '.html'
+            _write(entry['html'], _template.render(
+                name=task['name'], scenario=entry['scenario'], as_of=task['as_of'], real=task['real'],
+                generated=date.today().isoformat(), stylesheet=_stylesheet,
+                chart_json=json.dumps(report['chart'], separators=(',', ':')), **report))
+        if 'csv' in task['formats']:
+            entry['csv'] = base + '.csv'
+            _write(entry['csv'], csv_text(report))
+        if report['to_date']:
+            entry.update({k: report['to_date'][k] for k in ('target', 'actual', 'gap_pct')})
+        if report['summary']:
+            last = report['summary'][-1]
+            entry.update(final_year=last['year'], final_goal=round(last['goal_total']))
+    except Exception as e:
+        # One broken household is an error row, never the end of the run
+        entry.update(status='error', error=str(e) or type(e).__name__)
+    entry['ms'] = round((time.perf_counter() - t0) * 1000, 1)
+    return entry
+
+
+def report_names(db_paths):
+    # File stem per database; households kept as <dir>/financial_plan.db get their directory name
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in db_paths]
+    if len(set(stems)) == len(stems):
+        return stems
+    names = [os.path.basename(os.path.dirname(os.path.abspath(p))) if stems.count(s) > 1 else s
+             for p, s in zip(db_paths, stems)]
+    if len(set(names)) == len(names):
+        return names
+    return [os.path.splitext(os.path.relpath(p))[0].replace(os.sep, '-').lstrip('.-') for p in db_paths]
+
+
+def scenario_ids(db_path, all_scenarios, scenario_id):
+    if not all_scenarios:
+        return [scenario_id]
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        return [r[0] for r in conn.execute('SELECT id FROM scenarios ORDER BY id')]
+    except sqlite3.Error:
+        return [scenario_id]  # not a plan database; the worker reports it as an error
+    finally:
+        conn.close()
+
+
+def tasks(db_paths, out_dir, formats, starts, as_of, real=False, scenario_id=1, all_scenarios=False):
+    for db_path, name in zip(db_paths, report_names(db_paths)):
+        ids = scenario_ids(db_path, all_scenarios, scenario_id)
+        for sid in ids:
+            yield {'db': db_path, 'name': name if len(ids) == 1 else f'{name}-s{sid}', 'scenario_id': sid,
+                   'out': out_dir, 'formats': formats, 'starts': starts, 'as_of': as_of.isoformat(),
+                   'real': real}
+
+
+def run(task_list, out_dir, workers=None, cache_dir='.jinja_cache', progress=print):
+    # Returns (ok, failed); index.csv gets one flushed line per finished report
+    os.makedirs(out_dir, exist_ok=True)
+    ok = failed = 0
+    with open(os.path.join(out_dir, 'index.csv'), 'w', encoding='utf-8', newline='') as index, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                                   initializer=_init_worker, initargs=(cache_dir,)) as pool:
+        writer = csv.DictWriter(index, INDEX_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        futures = {pool.submit(render, task): task for task in task_list}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            try:
+                entry = future.result()
+            except Exception as e:
+                # The worker process died or its result could not be sent back
+                task = futures[future]
+                entry = {'name': task['name'], 'database': task['db'], 'scenario_id': task['scenario_id'],
+                         'as_of': task['as_of'], 'status': 'error', 'error': str(e) or type(e).__name__}
+            writer.writerow(entry)
+            index.flush()
+            if entry['status'] == 'ok':
+                ok += 1
+            else:
+                failed += 1
+            progress(f"[{done}/{len(futures)}] {entry['name']}: {entry['status']}"
+                     + (f" ({entry['error']})" if entry.get('error') else f" in {entry['ms']} ms"))
+    return ok, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render static annual review reports for many household databases.")
+    parser.add_argument('databases', nargs='+', help='one SQLite database per household')
+    parser.add_argument('--out', default='reports')
+    parser.add_argument('--format', default='html,csv', help='comma-separated: html, csv')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: one per core)')
+    parser.add_argument('--scenario', type=int, default=1)
+    parser.add_argument('--all-scenarios', action='store_true', help='one report per scenario')
+    parser.add_argument('--as-of', default=None, help='YYYY-MM-DD (default: today)')
+    parser.add_argument('--real', action='store_true', help='inflation-adjusted figures')
+    args = parser.parse_args()
+
+    formats = tuple(f.strip() for f in args.format.split(',') if f.strip())
+    if not formats or any(f not in FORMATS for f in formats):
+        raise SystemExit(f"--format must be a subset of: {', '.join(FORMATS)}")
+    try:
+        as_of = date.fromisoformat(args.as_of) if args.as_of else date.today()
+    except ValueError:
+        raise SystemExit("--as-of must be YYYY-MM-DD")
+    missing = [p for p in args.databases if not os.path.exists(p)]
+    if missing:
+        raise SystemExit(f"No such database: {', '.join(missing)}")
+
+    import balances
+    task_list = list(tasks(args.databases, args.out, formats, balances.start_balances(), as_of,
+                           args.real, args.scenario, args.all_scenarios))
+    t0 = time.perf_counter()
+    ok, failed = run(task_list, args.out, args.workers)
+    print(f"{ok} report(s) written to {args.out} in {time.perf_counter() - t0:.1f} s"
+          + (f", {failed} failed" if failed else ''))
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+# Storage for plans, transactions and users behind one small interface, with two
+# backends: SQLite (what the app runs on) and plain memory (sorted lists and dicts),
+# so the computation core can be exercised and profiled without disk I/O.
+# Rows come back as mappings (sqlite3.Row or dict); both support row['column'].
+import bisect
+import sqlite3
+
+import archive
+
+PLAN_COLUMNS = ('year', 'age', 'pension_savings', 'isa_account', 'general_account', 'total',
+                'health_insurance', 'tax', 'withdrawal_strategy')
+TRANSACTION_COLUMNS = ('date', 'pension', 'isa', 'general', 'memo')
+
+
+class DuplicateKey(ValueError):
+    pass
+
+
+def _plan_values(values):
+    return tuple(values.get(c) for c in PLAN_COLUMNS)
+
+
+# SQLite backend
+
+class SqlitePlans:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def list(self, scenario_id):
+        return self.conn.execute('SELECT * FROM plan WHERE scenario_id = ? ORDER BY year ASC', (scenario_id,)).fetchall()
+
+    def get(self, plan_id):
+        return self.conn.execute('SELECT * FROM plan WHERE id = ?', (plan_id,)).fetchone()
+
+    def upsert(self, scenario_id, values):
+        # One row per (scenario, year): an existing year is updated in place. Not INSERT OR
+        # REPLACE, whose implicit delete skips the plan delete triggers (search index, history)
+        existing = self.conn.execute('SELECT id FROM plan WHERE scenario_id = ? AND year = ?',
+                                     (scenario_id, values.get('year'))).fetchone()
+        if existing is not None:
+            self.update(existing[0], values)
+            return existing[0]
+        return self.conn.execute(f'''
+            INSERT INTO plan (scenario_id, {', '.join(PLAN_COLUMNS)})
+            VALUES (?, {', '.join('?' * len(PLAN_COLUMNS))})
+        ''', (scenario_id,) + _plan_values(values)).lastrowid
+
+    def update(self, plan_id, values):
+        try:
+            self.conn.execute(f'''
+                UPDATE plan SET {', '.join(f'{c} = ?' for c in PLAN_COLUMNS)} WHERE id = ?
+            ''', _plan_values(values) + (plan_id,))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKey(f"Year {values.get('year')} is already planned.") from e
+
+    def delete(self, plan_id):
+        self.conn.execute('DELETE FROM plan WHERE id = ?', (plan_id,))
+
+
+class SqliteTransactions:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def list(self):
+        return self.conn.execute('SELECT * FROM transactions ORDER BY date DESC').fetchall()
+
+    def get(self, txn_id):
+        return self.conn.execute('SELECT * FROM transactions WHERE id = ?', (txn_id,)).fetchone()
+
+    def add(self, date, pension, isa, general, memo=None):
+        return self.conn.execute('INSERT INTO transactions (date, pension, isa, general, memo) VALUES (?, ?, ?, ?, ?)',
+                                 (date, pension, isa, general, memo)).lastrowid
+
+    def update(self, txn_id, date, pension, isa, general, memo=None):
+        self.conn.execute('UPDATE transactions SET date = ?, pension = ?, isa = ?, general = ?, memo = ? WHERE id = ?',
+                          (date, pension, isa, general, memo, txn_id))
+
+    def delete(self, txn_id):
+        self.conn.execute('DELETE FROM transactions WHERE id = ?', (txn_id,))
+
+    def yearly_deposits(self, first_year):
+        # Closed years come from their closing rows
+        return [tuple(row) for row in archive.yearly_deposits(self.conn, first_year)]
+
+
+class SqliteUsers:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def list(self):
+        return self.conn.execute('SELECT * FROM users').fetchall()
+
+    def get(self, user_id):
+        return self.conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+
+    def by_username(self, username):
+        return self.conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+
+    def add(self, username, password_hash):
+        try:
+            return self.conn.execute('INSERT INTO users (username, password) VALUES (?, ?)',
+                                     (username, password_hash)).lastrowid
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKey(f"User {username} already exists.") from e
+
+    def delete(self, user_id):
+        self.conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+
+
+class SqliteStore:
+    def __init__(self, conn):
+        self.conn = conn
+        self.plans = SqlitePlans(conn)
+        self.transactions = SqliteTransactions(conn)
+        self.users = SqliteUsers(conn)
+
+    def commit(self):
+        self.conn.commit()
+
+
+# In-memory backend: rows in dicts by id, ordering kept in sorted key lists (bisect)
+
+class MemoryPlans:
+    def __init__(self):
+        self._rows = {}
+        self._years = {}  # scenario_id -> sorted [(year, id)]
+        self._next_id = 1
+
+    def list(self, scenario_id):
+        return [dict(self._rows[i]) for _, i in self._years.get(scenario_id, ())]
+
+    def get(self, plan_id):
+        row = self._rows.get(plan_id)
+        return dict(row) if row else None
+
+    def _find(self, scenario_id, year):
+        keys = self._years.get(scenario_id, [])
+        i = bisect.bisect_left(keys, (year,))
+        return keys[i][1] if i < len(keys) and keys[i][0] == year else None
+
+    def _insert(self, plan_id, scenario_id, values):
+        row = dict(zip(PLAN_COLUMNS, _plan_values(values)), id=plan_id, scenario_id=scenario_id)
+        self._rows[plan_id] = row
+        bisect.insort(self._years.setdefault(scenario_id, []), (row['year'], plan_id))
+
+    def _remove(self, plan_id):
+        row = self._rows.pop(plan_id)
+        self._years[row['scenario_id']].remove((row['year'], plan_id))
+        return row
+
+    def upsert(self, scenario_id, values):
+        existing = self._find(scenario_id, values.get('year'))
+        if existing is not None:
+            self.update(existing, values)
+            return existing
+        plan_id, self._next_id = self._next_id, self._next_id + 1
+        self._insert(plan_id, scenario_id, values)
+        return plan_id
+
+    def update(self, plan_id, values):
+        if plan_id not in self._rows:
+            return
+        scenario_id = self._rows[plan_id]['scenario_id']
+        if self._find(scenario_id, values.get('year')) not in (None, plan_id):
+            raise DuplicateKey(f"Year {values.get('year')} is already planned.")
+        self._remove(plan_id)
+        self._insert(plan_id, scenario_id, values)
+
+    def delete(self, plan_id):
+        if plan_id in self._rows:
+            self._remove(plan_id)
+
+
+class MemoryTransactions:
+    def __init__(self):
+        self._rows = {}
+        self._dates = []  # sorted [(date, id)]
+        self._years = {}  # year -> [pension, isa, general, count], kept current on every write
+        self._next_id = 1
+
+    def list(self):
+        return [dict(self._rows[i]) for _, i in reversed(self._dates)]
+
+    def get(self, txn_id):
+        row = self._rows.get(txn_id)
+        return dict(row) if row else None
+
+    def _count(self, row, sign):
+        year = int(row['date'][:4])
+        sums = self._years.setdefault(year, [0, 0, 0, 0])
+        sums[0] += sign * (row['pension'] or 0)
+        sums[1] += sign * (row['isa'] or 0)
+        sums[2] += sign * (row['general'] or 0)
+        sums[3] += sign
+        if not sums[3]:
+            del self._years[year]  # no transactions left, as GROUP BY would have it
+
+    def _insert(self, txn_id, date, pension, isa, general, memo):
+        row = {'id': txn_id, 'date': date, 'pension': pension, 'isa': isa, 'general': general, 'memo': memo}
+        self._rows[txn_id] = row
+        bisect.insort(self._dates, (date, txn_id))
+        self._count(row, 1)
+
+    def add(self, date, pension, isa, general, memo=None):
+        txn_id, self._next_id = self._next_id, self._next_id + 1
+        self._insert(txn_id, date, pension, isa, general, memo)
+        return txn_id
+
+    def update(self, txn_id, date, pension, isa, general, memo=None):
+        if txn_id in self._rows:
+            self.delete(txn_id)
+            self._insert(txn_id, date, pension, isa, general, memo)
+
+    def delete(self, txn_id):
+        row = self._rows.pop(txn_id, None)
+        if row is not None:
+            del self._dates[bisect.bisect_left(self._dates, (row['date'], txn_id))]
+            self._count(row, -1)
+
+    def yearly_deposits(self, first_year):
+        # [(year, pension, isa, general)] from first_year on, in year order
+        return [(year, *self._years[year][:3]) for year in sorted(self._years) if year >= first_year]
+
+
+class MemoryUsers:
+    def __init__(self):
+        self._rows = {}
+        self._names = {}
+        self._next_id = 1
+
+    def list(self):
+        return [dict(self._rows[i]) for i in sorted(self._rows)]
+
+    def get(self, user_id):
+        row = self._rows.get(user_id)
+        return dict(row) if row else None
+
+    def by_username(self, username):
+        user_id = self._names.get(username)
+        return self.get(user_id) if user_id is not None else None
+
+    def add(self, username, password_hash):
+        if username in self._names:
+            raise DuplicateKey(f"User {username} already exists.")
+        user_id, self._next_id = self._next_id, self._next_id + 1
+        self._rows[user_id] = {'id': user_id, 'username': username, 'password': password_hash}
+        self._names[username] = user_id
+        return user_id
+
+    def delete(self, user_id):
+        row = self._rows.pop(user_id, None)
+        if row is not None:
+            del self._names[row['username']]
+
+
+class MemoryStore:
+    def __init__(self):
+        self.plans = MemoryPlans()
+        self.transactions = MemoryTransactions()
+        self.users = MemoryUsers()
+
+    def commit(self):
+        pass
+
+    @classmethod
+    def load(cls, conn):
+        # Copy of a SQLite database's plans, transactions (archived ones included) and users,
+        # under the ids the database gave them
+        store = cls()
+        for row in conn.execute('SELECT * FROM plan ORDER BY id'):
+            store.plans._insert(row['id'], row['scenario_id'], dict(row))
+        for row in conn.execute(f"SELECT id, {', '.join(TRANSACTION_COLUMNS)} FROM transactions_all"):
+            store.transactions._insert(*row)
+        for row in conn.execute('SELECT id, username, password FROM users ORDER BY id'):
+            store.users._rows[row['id']] = dict(row)
+            store.users._names[row['username']] = row['id']
+        for table in (store.plans, store.transactions, store.users):
+            table._next_id = max(table._rows, default=0) + 1
+        return store
@@ -0,0 +1,190 @@
+from datetime import date
+
+import data_cache
+import lazy
+
+np = lazy.module('numpy')
+
+ACCOUNTS = ('pension', 'isa', 'general')
+FIRST_YEAR = 2026
+
+
+def set_valuation(conn, account, day, market_value):
+    # Raises ValueError for a date that is not YYYY-MM-DD; every returns read parses the stored dates
+    day = date.fromisoformat(str(day).strip()).isoformat()
+    conn.execute('INSERT OR REPLACE INTO valuations (account, date, market_value) VALUES (?, ?, ?)',
+                 (account, day, market_value))
+
+
+def list_valuations(conn):
+    return conn.execute('SELECT * FROM valuations ORDER BY date DESC, account').fetchall()
+
+
+def delete_valuation(conn, valuation_id):
+    conn.execute('DELETE FROM valuations WHERE id = ?', (valuation_id,))
+
+
+# Annual rate r with sum(amounts * (1 + r) ** -times) == 0, one problem per row.
+# Rows are padded with zero amounts; Newton steps run on all rows at once and
+# rows that fail to converge fall back to a vectorized bisection.
+def solve_irr(amounts, times, tol=1e-9, max_iter=50):
+    amounts = np.asarray(amounts, dtype=float)
+    times = np.asarray(times, dtype=float)
+    rate = np.full(len(amounts), 0.1)
+    done = np.zeros(len(amounts), dtype=bool)
+
+    with np.errstate(all='ignore'):
+        for _ in range(max_iter):
+            base = 1.0 + rate[:, np.newaxis]
+            disc = base ** -times
+            npv = (amounts * disc).sum(axis=1)
+            slope = (-times * amounts * disc / base).sum(axis=1)
+            step = np.where(done, 0.0, npv / slope)
+            rate = np.clip(rate - step, -0.9999, 1e6)
+            done |= np.abs(step) < tol
+            if done.all():
+                break
+
+        def npv_at(r):
+            return (amounts * (1.0 + r[:, np.newaxis]) ** -times).sum(axis=1)
+
+        retry = ~done | ~np.isfinite(rate)
+        if retry.any():
+            lo = np.full(len(amounts), -0.99)
+            hi = np.full(len(amounts), 10.0)
+            f_lo = npv_at(lo)
+            bracketed = np.sign(f_lo) != np.sign(npv_at(hi))
+            for _ in range(200):
+                mid = (lo + hi) / 2
+                f_mid = npv_at(mid)
+                same = np.sign(f_mid) == np.sign(f_lo)
+                lo = np.where(same, mid, lo)
+                f_lo = np.where(same, f_mid, f_lo)
+                hi = np.where(same, hi, mid)
+            rate = np.where(retry, np.where(bracketed, (lo + hi) / 2, np.nan), rate)
+    return rate
+
+
+def _day(value):
+    # Stored date as a date, or None for legacy free-form text that names no day
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _load(conn):
+    # Rows whose date cannot be read are left out rather than failing every returns view
+    flows = {a: [] for a in ACCOUNTS}
+    for row in conn.execute('SELECT date, pension, isa, general FROM transactions_all WHERE date >= ? ORDER BY date',
+                            (f'{FIRST_YEAR}-01-01',)):
+        day = _day(row['date'])
+        if day is None:
+            continue
+        for account in ACCOUNTS:
+            if row[account]:
+                flows[account].append((day, row[account]))
+
+    valuations = {a: [] for a in ACCOUNTS}
+    for row in conn.execute('SELECT account, date, market_value FROM valuations ORDER BY date'):
+        day = _day(row['date'])
+        if day is not None:
+            valuations[row['account']].append((day, row['market_value']))
+    return flows, valuations
+
+
+def _value_at(day, start, flows, valuations):
+    # Last observed market value on or before `day`, carried forward with later deposits
+    base_day, value = None, start
+    for d, v in valuations:
+        if d > day:
+            break
+        base_day, value = d, v
+    return value + sum(amt for d, amt in flows if (base_day is None or d > base_day) and d <= day)
+
+
+def _periods(account, start, flows, valuations):
+    # One period per calendar year that has a valuation, plus one since inception
+    inception = date(FIRST_YEAR - 1, 12, 31)
+    years = sorted({d.year for d, _ in valuations if d.year >= FIRST_YEAR})
+    periods = [(y, date(y - 1, 12, 31)) for y in years]
+    if valuations and valuations[-1][0] > inception:
+        periods.append(('all', inception))
+
+    for label, d0 in periods:
+        if label == 'all':
+            points = [p for p in valuations if p[0] > d0]
+            v0 = start
+        else:
+            points = [p for p in valuations if d0 < p[0] <= date(label, 12, 31)]
+            v0 = _value_at(d0, start, flows, valuations)
+        d1, v1 = points[-1]
+        yield {
+            'account': account,
+            'year': label,
+            'start_date': d0,
+            'end_date': d1,
+            'start_value': v0,
+            'end_value': v1,
+            'flows': [(d, amt) for d, amt in flows if d0 < d <= d1],
+            'points': [(d0, v0)] + points,
+        }
+
+
+def _twr(period):
+    # Modified Dietz return per sub-period between valuations, geometrically linked
+    growth = 1.0
+    for (a, va), (b, vb) in zip(period['points'], period['points'][1:]):
+        length = (b - a).days
+        sub_flows = [(d, amt) for d, amt in period['flows'] if a < d <= b]
+        net = sum(amt for _, amt in sub_flows)
+        weighted = sum(amt * (b - d).days / length for d, amt in sub_flows)
+        denominator = va + weighted
+        if length <= 0 or denominator <= 0:
+            return None
+        growth *= 1 + (vb - va - net) / denominator
+    return growth - 1
+
+
+def compute_returns(conn, starts):
+    flows, valuations = _load(conn)
+    periods = [p for account in ACCOUNTS
+               for p in _periods(account, starts[account], flows[account], valuations[account])]
+    if not periods:
+        return []
+
+    # Investor's view: money in is negative, the closing value is a positive inflow
+    width = max(len(p['flows']) for p in periods) + 2
+    amounts = np.zeros((len(periods), width))
+    times = np.zeros((len(periods), width))
+    for i, p in enumerate(periods):
+        amounts[i, 0] = -p['start_value']
+        for j, (d, amt) in enumerate(p['flows'], start=1):
+            amounts[i, j] = -amt
+            times[i, j] = (d - p['start_date']).days / 365.0
+        amounts[i, -1] = p['end_value']
+        times[i, -1] = (p['end_date'] - p['start_date']).days / 365.0
+    rates = solve_irr(amounts, times)
+
+    results = []
+    for p, rate in zip(periods, rates):
+        contributions = sum(amt for _, amt in p['flows'])
+        twr = _twr(p)
+        results.append({
+            'account': p['account'],
+            'year': p['year'],
+            'start_date': p['start_date'].isoformat(),
+            'end_date': p['end_date'].isoformat(),
+            'start_value': p['start_value'],
+            'contributions': contributions,
+            'end_value': p['end_value'],
+            'growth': p['end_value'] - p['start_value'] - contributions,
+            'xirr': round(float(rate) * 100, 2) if np.isfinite(rate) else None,
+            'twr': round(twr * 100, 2) if twr is not None else None,
+        })
+    return results
+
+
+def account_returns(conn, starts):
+    return data_cache.cached(conn, ('returns', tuple(sorted(starts.items()))),
+                             lambda: compute_returns(conn, starts))
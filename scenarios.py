@@ -0,0 +1,91 @@
+import archive
+import goal_curve
+import lazy
+
+np = lazy.module('numpy')
+
+DEFAULT_SCENARIO_ID = 1  # Base scenario
+
+PLAN_COPY_COLUMNS = ('year, age, pension_savings, isa_account, general_account, '
+                     'total, health_insurance, tax, withdrawal_strategy')
+
+
+def list_scenarios(conn):
+    return conn.execute('''
+        SELECT s.id, s.name, s.created_at, COUNT(p.id) AS years
+        FROM scenarios s
+        LEFT JOIN plan p ON p.scenario_id = s.id
+        GROUP BY s.id
+        ORDER BY s.id
+    ''').fetchall()
+
+
+def scenario_exists(conn, scenario_id):
+    return conn.execute('SELECT 1 FROM scenarios WHERE id = ?', (scenario_id,)).fetchone() is not None
+
+
+def clone_scenario(conn, source_id, name):
+    new_id = conn.execute('INSERT INTO scenarios (name) VALUES (?)', (name,)).lastrowid
+    # Copy every plan year in one statement instead of a Python row loop
+    conn.execute(f'''
+        INSERT INTO plan (scenario_id, {PLAN_COPY_COLUMNS})
+        SELECT ?, {PLAN_COPY_COLUMNS} FROM plan WHERE scenario_id = ?
+    ''', (new_id, source_id))
+    goal_curve.build(conn, new_id)
+    return new_id
+
+
+def delete_scenario(conn, scenario_id):
+    conn.execute('DELETE FROM plan WHERE scenario_id = ?', (scenario_id,))
+    conn.execute('DELETE FROM scenarios WHERE id = ?', (scenario_id,))
+
+
+# Actual vs. goal for several scenarios at once, as (scenario x year) matrices
+def compare_scenarios(conn, scenario_ids, start_total, first_year=2026):
+    ids = np.asarray(scenario_ids, dtype=np.int64)
+    placeholders = ','.join('?' * len(ids))
+    names = dict(conn.execute(f'SELECT id, name FROM scenarios WHERE id IN ({placeholders})',
+                              ids.tolist()).fetchall())
+
+    plan = np.array(conn.execute(f'''
+        SELECT scenario_id, year, total FROM plan
+        WHERE scenario_id IN ({placeholders}) AND year >= ?
+    ''', ids.tolist() + [first_year]).fetchall(), dtype=np.int64).reshape(-1, 3)
+    deposits = np.array([(y, p + i + g) for y, p, i, g in archive.yearly_deposits(conn, first_year)],
+                        dtype=np.int64).reshape(-1, 2)
+
+    last_year = first_year
+    if len(plan):
+        last_year = max(last_year, int(plan[:, 1].max()))
+    if len(deposits):
+        last_year = max(last_year, int(deposits[:, 0].max()))
+    years = np.arange(first_year, last_year + 1)
+
+    yearly = np.zeros(len(years), dtype=np.int64)
+    yearly[deposits[:, 0] - first_year] = deposits[:, 1]
+    actual = start_total + np.cumsum(yearly)
+
+    # Scatter plan totals into the goal matrix, rows following the requested order
+    order = np.argsort(ids, kind='stable')
+    rows = order[np.searchsorted(ids[order], plan[:, 0])]
+    goals = np.zeros((len(ids), len(years)), dtype=np.int64)
+    goals[rows, plan[:, 1] - first_year] = plan[:, 2]
+
+    gap = actual[np.newaxis, :] - goals
+    ratio = np.divide(gap, goals, out=np.zeros(goals.shape), where=goals > 0)
+    gap_pct = np.where(goals > 0, np.round((1 + ratio) * 100, 1), 0.0)
+
+    return {
+        'years': years.tolist(),
+        'actual': actual.tolist(),
+        'scenarios': [
+            {
+                'id': int(sid),
+                'name': names.get(int(sid), ''),
+                'goal': goals[i].tolist(),
+                'gap': gap[i].tolist(),
+                'gap_pct': gap_pct[i].tolist(),
+            }
+            for i, sid in enumerate(ids)
+        ],
+    }
@@ -0,0 +1,68 @@
+import re
+
+from markupsafe import Markup, escape
+
+# Highlight markers that cannot occur in user text; swapped for <mark> after escaping
+_OPEN, _CLOSE = '\x02', '\x03'
+TRIGRAM = 3  # the trigram tokenizer can only match terms of at least 3 characters
+
+
+def _phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _highlight(text, terms):
+    # Mark with sentinels, escape, then swap in <mark>: user text never reaches the page unescaped
+    if terms:
+        pattern = '|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+        text = re.sub(pattern, lambda m: _OPEN + m.group(0) + _CLOSE, text, flags=re.IGNORECASE)
+    return Markup(str(escape(text)).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>'))
+
+
+def search(conn, query, kind=None, scenario_id=None, limit=50):
+    # Terms of 3+ characters go through the trigram index and are ranked by bm25;
+    # shorter ones (most two-syllable Korean words) fall back to LIKE on the indexed text
+    terms = query.split()
+    if not terms:
+        return []
+    indexed = [t for t in terms if len(t) >= TRIGRAM]
+    short = [t for t in terms if len(t) < TRIGRAM]
+
+    where, params = [], []
+    if indexed:
+        where.append('search_index MATCH ?')
+        params.append(' AND '.join(_phrase(t) for t in indexed))
+    for term in short:
+        where.append("(body LIKE ? ESCAPE '\\' OR title LIKE ? ESCAPE '\\')")
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params += [pattern, pattern]
+    if kind:
+        where.append('kind = ?')
+        params.append(kind)
+    if scenario_id is not None:
+        where.append("(kind != 'plan' OR scenario_id = ?)")
+        params.append(scenario_id)
+
+    if indexed:
+        snippet = f"snippet(search_index, 4, '{_OPEN}', '{_CLOSE}', '…', 16)"
+        order = 'rank'
+    else:
+        snippet = 'body'
+        order = "kind, title DESC"
+    rows = conn.execute(f'''
+        SELECT kind, ref_id, search_index.scenario_id, s.name AS scenario, title, {snippet} AS snippet
+        FROM search_index
+        LEFT JOIN scenarios s ON s.id = search_index.scenario_id
+        WHERE {' AND '.join(where)}
+        ORDER BY {order}
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+
+    return [{
+        'kind': row['kind'],
+        'id': row['ref_id'],
+        'scenario_id': row['scenario_id'],
+        'scenario': row['scenario'],
+        'title': row['title'],
+        'snippet': _highlight(row['snippet'], short),
+    } for row in rows]
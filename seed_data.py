@@ -1,5 +1,7 @@
 import sqlite3
-import re
+import migrations
+import plan_import
+import scenarios
 
 DB_NAME = "financial_plan.db"
 
@@ -48,89 +50,15 @@ data = """
 2066(90)	0	0	2,193,564	2,193,564	820	750	최종 21.9억 상속 자산 달성
 """
 
-def clean_money(val):
-    if not val:
-        return 0
-    # Remove commas and convert to int
-    val = val.replace(',', '')
-    try:
-        return int(val)
-    except ValueError:
-        return 0
+# Create or upgrade the schema (in case app.py hasn't run yet)
+migrations.migrate(DB_NAME)
 
-conn = sqlite3.connect(DB_NAME)
-cursor = conn.cursor()
-
-# Create table if not exists (in case app.py hasn't run yet)
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS plan (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        year INTEGER NOT NULL UNIQUE,
-        age INTEGER NOT NULL,
-        pension_savings INTEGER DEFAULT 0,
-        isa_account INTEGER DEFAULT 0,
-        general_account INTEGER DEFAULT 0,
-        total INTEGER DEFAULT 0,
-        health_insurance TEXT,
-        tax TEXT,
-        withdrawal_strategy TEXT
-    )
-''')
-
-# Parse and insert data
-lines = data.strip().split('\n')
-for line in lines:
-    if not line.strip(): continue
-    
-    # Try tab split first
-    parts = line.strip().split('\t')
-    if len(parts) < 3:
-         # formatted with multiple spaces?
-         parts = re.split(r'\s{2,}', line.strip())
-
-    if len(parts) < 2: continue
-
-    # Map parts to columns
-    # 0: Year(Age)
-    # 1: Pension
-    # 2: ISA
-    # 3: General
-    # 4: Total
-    # 5: Health
-    # 6: Tax
-    # 7: Strategy
-    
-    # Ensure minimum length
-    while len(parts) < 8:
-        parts.append('')
-
-    year_age = parts[0]
-    
-    # Parse Year(Age) like 2026(50)
-    match = re.match(r'(\d+)\((\d+)\)', year_age)
-    if not match:
-        continue
-        
-    year = int(match.group(1))
-    age = int(match.group(2))
-
-    pension_val = clean_money(parts[1])
-    isa_val = clean_money(parts[2])
-    general_val = clean_money(parts[3])
-    total_val = clean_money(parts[4])
-    
-    health = parts[5]
-    tax = parts[6]
-    strategy = parts[7]
-
-    try:
-        cursor.execute('''
-            INSERT OR REPLACE INTO plan (year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (year, age, pension_val, isa_val, general_val, total_val, health, tax, strategy))
-    except Exception as e:
-        print(f"Error inserting {year}: {e}")
-
-conn.commit()
-conn.close()
+# Validated as a whole and swapped in atomically; a bad row aborts the seed with every problem listed
+conn = sqlite3.connect(DB_NAME, timeout=30)
+try:
+    plan_import.import_plan(conn, data, 'seed.tsv', scenarios.DEFAULT_SCENARIO_ID)
+except plan_import.InvalidPlan as e:
+    raise SystemExit('\n'.join(e.errors))
+finally:
+    conn.close()
 print("Database seeded successfully.")
@@ -0,0 +1,201 @@
+# Columnar, memory-mapped snapshot of the ledger and plans for analytics workers.
+# One directory of .npy files per data version: int64 day numbers and amounts sorted
+# by date, plan rows sorted by (scenario, year), and offset indexes that turn "one
+# year" or "one scenario" into a slice. Workers np.load them with mmap_mode='r', so
+# every process reads the same page-cache pages instead of building its own rows.
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import data_cache
+import lazy
+
+np = lazy.module('numpy')
+
+SNAPSHOT_DIR = 'snapshots'
+KEEP_VERSIONS = 2  # older versions are removed; processes that still map them keep reading
+FIRST_YEAR = 2026
+
+TXN_ACCOUNTS = ('pension', 'isa', 'general')
+PLAN_COLUMNS = ('pension_savings', 'isa_account', 'general_account', 'total')
+
+_lock = threading.Lock()
+_open = {}  # path -> Snapshot, so repeated jobs in one worker reuse the mapping
+
+
+def snapshot_dir(db_path, directory=None):
+    # Beside the database by default, so workers find it whatever their working directory
+    return directory or os.path.join(os.path.dirname(os.path.abspath(db_path)), SNAPSHOT_DIR)
+
+
+def snapshot_path(db_path, version, directory=None):
+    directory = snapshot_dir(db_path, directory)
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return os.path.join(directory, f'{stem}-v{version}')
+
+
+def export(conn, path):
+    # Reads everything inside one read transaction, so the arrays match the version they are named after
+    conn.execute('BEGIN')
+    try:
+        version = data_cache.current_version(conn)
+        txns = conn.execute(f'''
+            SELECT CAST(julianday(substr(date, 1, 10)) - 2440587.5 AS INTEGER), id, {', '.join(TXN_ACCOUNTS)}
+            FROM transactions_all ORDER BY date, id
+        ''').fetchall()
+        plans = conn.execute(f'''
+            SELECT scenario_id, year, {', '.join(f'COALESCE({c}, 0)' for c in PLAN_COLUMNS)}
+            FROM plan ORDER BY scenario_id, year
+        ''').fetchall()
+    finally:
+        conn.execute('COMMIT')
+
+    txn = np.array(txns, dtype=np.int64).reshape(-1, 2 + len(TXN_ACCOUNTS))
+    plan = np.array(plans, dtype=np.int64).reshape(-1, 2 + len(PLAN_COLUMNS))
+    days = txn[:, 0]
+    years = days.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    last_year = int(max(years.max(initial=FIRST_YEAR), plan[:, 1].max(initial=FIRST_YEAR)))
+    scenarios, plan_starts = np.unique(plan[:, 0], return_index=True)
+    arrays = {
+        'txn_day': days,
+        'txn_id': txn[:, 1],
+        'txn_amount': np.ascontiguousarray(txn[:, 2:]),
+        # Rows of year y are txn_year_offsets[y - first_year]:txn_year_offsets[y - first_year + 1];
+        # years before first_year sit ahead of the first offset
+        'txn_year_offsets': np.searchsorted(years, np.arange(FIRST_YEAR, last_year + 2)).astype(np.int64),
+        'plan_scenario': plan[:, 0],
+        'plan_year': plan[:, 1],
+        'plan_amount': np.ascontiguousarray(plan[:, 2:]),
+        'plan_scenarios': scenarios.astype(np.int64),
+        'plan_offsets': np.append(plan_starts, len(plan)).astype(np.int64),
+    }
+
+    # Built beside the target and renamed into place, so readers never see a partial snapshot
+    parent = os.path.dirname(path) or '.'
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f'{name}.npy'), array)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'version': version, 'first_year': FIRST_YEAR, 'last_year': last_year,
+                       'transactions': len(txn), 'plans': len(plan), 'created_at': time.time()}, f)
+        os.rename(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.isdir(path):  # losing the race to another exporter is fine
+            raise
+    return path
+
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.version = self.meta['version']
+        self.first_year = self.meta['first_year']
+        self.last_year = self.meta['last_year']
+        for name in os.listdir(path):
+            if name.endswith('.npy'):
+                setattr(self, name[:-4], np.load(os.path.join(path, name), mmap_mode='r'))
+
+    def year_slice(self, year):
+        if self.first_year <= year <= self.last_year:
+            i = year - self.first_year
+            return slice(int(self.txn_year_offsets[i]), int(self.txn_year_offsets[i + 1]))
+        bounds = np.array([f'{year}-01-01', f'{year + 1}-01-01'], dtype='datetime64[D]').astype(np.int64)
+        start, end = np.searchsorted(self.txn_day, bounds)
+        return slice(int(start), int(end))
+
+    def transactions(self, year=None):
+        # (days, amounts) views for one year, or the whole ledger
+        rows = self.year_slice(year) if year is not None else slice(None)
+        return self.txn_day[rows], self.txn_amount[rows]
+
+    def yearly_deposits(self, first_year=FIRST_YEAR):
+        # [(year, pension, isa, general)] for years with transactions, like archive.yearly_deposits
+        offsets = np.asarray(self.txn_year_offsets)
+        years = np.arange(self.first_year, self.last_year + 1)
+        counts = np.diff(offsets)
+        keep = (counts > 0) & (years >= first_year)
+        sums = np.add.reduceat(np.asarray(self.txn_amount), offsets[:-1][keep], axis=0) if keep.any() else np.zeros((0, 3))
+        return [(int(y), *map(int, s)) for y, s in zip(years[keep], sums)]
+
+    def plan_slice(self, scenario_id):
+        i = int(np.searchsorted(self.plan_scenarios, scenario_id))
+        if i == len(self.plan_scenarios) or self.plan_scenarios[i] != scenario_id:
+            return slice(0, 0)
+        return slice(int(self.plan_offsets[i]), int(self.plan_offsets[i + 1]))
+
+    def plans(self, scenario_id):
+        # Plan rows as mappings with year and the money columns (what summary.build_columns reads)
+        rows = self.plan_slice(scenario_id)
+        return [dict(zip(('year',) + PLAN_COLUMNS, (int(y), *map(int, a))))
+                for y, a in zip(self.plan_year[rows], self.plan_amount[rows])]
+
+
+def current(db_path, directory=None):
+    # Snapshot of the database's current data version, exported on first use after a change
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        path = snapshot_path(db_path, data_cache.current_version(conn), directory)
+        with _lock:
+            if path in _open:
+                return _open[path]
+        if not os.path.isdir(path):
+            export(conn, path)
+            prune(db_path, directory)
+    finally:
+        conn.close()
+    snapshot = Snapshot(path)
+    with _lock:
+        for old in [p for p in _open if p != path and os.path.dirname(p) == os.path.dirname(path)]:
+            del _open[old]  # unmapped once the last array view is gone
+        _open[path] = snapshot
+    return snapshot
+
+
+def versions(db_path, directory=None):
+    directory = snapshot_dir(db_path, directory)
+    prefix = os.path.splitext(os.path.basename(db_path))[0] + '-v'
+    if not os.path.isdir(directory):
+        return []
+    found = [(int(n[len(prefix):]), os.path.join(directory, n)) for n in os.listdir(directory)
+             if n.startswith(prefix) and n[len(prefix):].isdigit()]
+    return sorted(found)
+
+
+def prune(db_path, directory=None, keep=KEEP_VERSIONS):
+    removed = []
+    for _, path in versions(db_path, directory)[:-keep]:
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or inspect the columnar ledger/plan snapshot.")
+    parser.add_argument('--db', default='financial_plan.db')
+    parser.add_argument('--dir', help="default: snapshots/ beside the database")
+    parser.add_argument('action', choices=('export', 'info'))
+    args = parser.parse_args()
+
+    if args.action == 'export':
+        t0 = time.perf_counter()
+        snapshot = current(args.db, args.dir)
+        print(f"{snapshot.path}: {snapshot.meta['transactions']:,} transactions, {snapshot.meta['plans']:,} plan rows "
+              f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+    else:
+        for version, path in versions(args.db, args.dir):
+            size = sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path))
+            print(f"v{version}\t{size:,} bytes\t{path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Milliseconds allowed for a cold worker: import + create_app + its first request
+DEFAULT_BUDGET_MS = 1500
+
+STAGES = ('import', 'create_app', 'first_request', 'first_dashboard')
+
+
+def measure_once(db_path):
+    # Runs in a fresh interpreter so every import is cold
+    t0 = time.perf_counter()
+    import app
+    t1 = time.perf_counter()
+    flask_app = app.create_app(db_path)
+    t2 = time.perf_counter()
+    client = flask_app.test_client()
+    client.get('/login')
+    t3 = time.perf_counter()
+    client.post('/login', data={'username': os.environ['ADMIN_USERNAME'],
+                                'password': os.environ['ADMIN_PASSWORD']})
+    t4 = time.perf_counter()
+    client.get('/')
+    t5 = time.perf_counter()
+    times = (t1 - t0, t2 - t1, t3 - t2, t5 - t4)
+    return {stage: round(seconds * 1000, 1) for stage, seconds in zip(STAGES, times)}
+
+
+def run(runs, db_path):
+    env = dict(os.environ, FLASK_SECRET_KEY=os.getenv('FLASK_SECRET_KEY', 'bench'),
+               ADMIN_USERNAME='bench', ADMIN_PASSWORD='bench')
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, __file__, '--child', db_path], env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {stage: round(statistics.median(s[stage] for s in samples), 1) for stage in STAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold worker boot and first-request latency.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='fail when import + create_app + first request exceeds this')
+    parser.add_argument('--child', metavar='DB', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once(args.child)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The first run also migrates the scratch database and fills the Jinja cache
+        result = run(args.runs, os.path.join(tmp, 'bench.db'))
+    boot = result['import'] + result['create_app'] + result['first_request']
+    for stage in STAGES:
+        print(f"{stage:>16}: {result[stage]:8.1f} ms")
+    print(f"{'boot total':>16}: {boot:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if boot > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import migrations
+import repository
+import summary
+
+STARTS = {'pension': 7000, 'isa': 0, 'general': 20000}
+
+
+def fill(store, plans, transactions):
+    for values in plans:
+        store.plans.upsert(1, values)
+    for row in transactions:
+        store.transactions.add(*row)
+    store.commit()
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def operations(store):
+    return {
+        'list plans': lambda: store.plans.list(1),
+        'list transactions': lambda: store.transactions.list(),
+        'yearly deposits': lambda: store.transactions.yearly_deposits(summary.FIRST_YEAR),
+        'summary columns': lambda: summary.build_columns(store.transactions.yearly_deposits(summary.FIRST_YEAR),
+                                                         store.plans.list(1), STARTS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Same operations on the SQLite and in-memory storage backends.")
+    parser.add_argument('--transactions', type=int, default=20000)
+    parser.add_argument('--years', type=int, default=41)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    plans = [{'year': summary.FIRST_YEAR + i, 'age': 50 + i, 'pension_savings': 1000 * i, 'isa_account': 500 * i,
+              'general_account': 2000 * i, 'total': 3500 * i} for i in range(args.years)]
+    transactions = [(f'{summary.FIRST_YEAR + rng.randrange(args.years)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                     rng.randrange(100), rng.randrange(100), rng.randrange(100), None)
+                    for _ in range(args.transactions)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        migrations.migrate(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        stores = {'sqlite': repository.SqliteStore(conn), 'memory': repository.MemoryStore()}
+        fill_ms = {}
+        for name, store in stores.items():
+            t0 = time.perf_counter()
+            fill(store, plans, transactions)
+            fill_ms[name] = (time.perf_counter() - t0) * 1000
+
+        print(f"{args.transactions:,} transactions, {args.years} plan years; median of {args.repeat} runs (ms)")
+        print(f"{'operation':<24}" + ''.join(f"{name:>12}" for name in stores))
+        print(f"{'fill (once)':<24}" + ''.join(f"{fill_ms[name]:>12.2f}" for name in stores))
+        timings = {name: {op: median_ms(fn, args.repeat) for op, fn in operations(store).items()}
+                   for name, store in stores.items()}
+        for op in timings['sqlite']:
+            print(f"{op:<24}" + ''.join(f"{timings[name][op]:>12.2f}" for name in stores))
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
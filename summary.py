@@ -0,0 +1,94 @@
+import archive
+import data_cache
+import holdings
+import inflation
+import lazy
+
+np = lazy.module('numpy')
+
+FIRST_YEAR = 2026
+
+# Money columns of the yearly summary (everything except year and gap_pct)
+MONEY_COLUMNS = ('input_p', 'input_i', 'input_g', 'pension', 'isa', 'general',
+                 'total', 'market_total', 'goal_total', 'gap_total')
+
+
+def compute_columns(conn, plans, starts, first_year=FIRST_YEAR, as_of=None):
+    # Closed years contribute their closing rows, so only open years are read row by row.
+    # Holdings are valued as of `as_of` (default today) for its year, at year end before it
+    return build_columns(archive.yearly_deposits(conn, first_year), plans, starts, first_year,
+                         lambda years, book: holdings.year_end_totals(conn, years, book, as_of))
+
+
+def build_columns(deposits, plans, starts, first_year=FIRST_YEAR, mark_to_market=None):
+    # Yearly deposits [(year, pension, isa, general)] -> running balances -> gap against
+    # the plan, one numpy array per column. No storage access unless mark_to_market reads prices.
+    deposits = np.array(deposits, dtype=np.int64).reshape(-1, 4)
+    plan_years = np.array([p['year'] for p in plans], dtype=np.int64)
+    plan_totals = np.array([p['total'] for p in plans], dtype=np.int64)
+
+    last_year = max([first_year] + plan_years.tolist() + deposits[:, 0].tolist())
+    years = np.arange(first_year, last_year + 1)
+
+    inputs = np.zeros((len(years), 3), dtype=np.int64)
+    inputs[deposits[:, 0] - first_year] = deposits[:, 1:]
+    balances = np.cumsum(inputs, axis=0) + np.array([starts['pension'], starts['isa'], starts['general']])
+    total = balances.sum(axis=1)
+    # Same total with accounts that hold securities marked to market at year end
+    market_total = total if mark_to_market is None else mark_to_market(years, {
+        'pension': balances[:, 0], 'isa': balances[:, 1], 'general': balances[:, 2]})
+
+    goal_total = np.zeros(len(years), dtype=np.int64)
+    in_range = plan_years >= first_year
+    goal_total[plan_years[in_range] - first_year] = plan_totals[in_range]
+
+    gap_total = total - goal_total
+    ratio = np.divide(gap_total, goal_total, out=np.zeros(len(years)), where=goal_total > 0)
+    # GAP Calculation: 1 + (Actual - Target) / Target (Achievement Rate)
+    gap_pct = np.where(goal_total > 0, np.round((1 + ratio) * 100, 1), 0.0)
+
+    return {
+        'year': years,
+        'input_p': inputs[:, 0],
+        'input_i': inputs[:, 1],
+        'input_g': inputs[:, 2],
+        'pension': balances[:, 0],
+        'isa': balances[:, 1],
+        'general': balances[:, 2],
+        'total': total,
+        'market_total': np.round(market_total),
+        'goal_total': goal_total,
+        'gap_total': gap_total,
+        'gap_pct': gap_pct,
+    }
+
+
+def scenario_summary(conn, scenario_id, starts, as_of=None):
+    def compute():
+        plans = conn.execute('SELECT year, total FROM plan WHERE scenario_id = ? ORDER BY year ASC',
+                             (scenario_id,)).fetchall()
+        return compute_columns(conn, plans, starts, as_of=as_of)
+
+    return data_cache.cached(conn, ('summary', scenario_id, tuple(sorted(starts.items())), as_of), compute)
+
+
+def real_summary(conn, scenario_id, starts, as_of=None):
+    # Cached separately so toggling nominal/real reuses both results
+    def compute():
+        columns = scenario_summary(conn, scenario_id, starts, as_of)
+        return deflate(columns, inflation.deflators(conn, columns['year']))
+
+    return data_cache.cached(conn, ('summary-real', scenario_id, tuple(sorted(starts.items())), as_of), compute)
+
+
+def deflate(columns, deflators):
+    # Whole columns divided by the per-year price level in one vector operation each
+    real = dict(columns)
+    for key in MONEY_COLUMNS:
+        real[key] = columns[key] / deflators
+    return real
+
+
+def rows(columns):
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*(columns[k].tolist() for k in keys))]
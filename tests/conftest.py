@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The app is a flat set of top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_cache  # noqa: E402
+import migrations  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    # Cached results carry no database identity and every test gets a new database
+    data_cache.clear()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'plan.db')
+    migrations.migrate(path)
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def flask_app(tmp_path, monkeypatch):
+    monkeypatch.setenv('FLASK_SECRET_KEY', 'test')
+    monkeypatch.setenv('ADMIN_USERNAME', 'admin')
+    monkeypatch.setenv('ADMIN_PASSWORD', 'pw')
+    monkeypatch.setenv('ALERT_DISPATCHER', 'off')
+    monkeypatch.setenv('REPLICAS', '')
+    monkeypatch.chdir(tmp_path)  # template bytecode cache
+    import app
+    return app.create_app(str(tmp_path / 'app.db'))
+
+
+@pytest.fixture
+def client(flask_app):
+    client = flask_app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'pw'})
+    return client
+
+
+def flashes(client):
+    with client.session_transaction() as session:
+        return [message for _, message in session.pop('_flashes', [])]
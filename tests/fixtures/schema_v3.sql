@@ -0,0 +1,271 @@
+-- Schema and sample rows as written by the released migrations up to version 3
+-- (each version applied by the code of the commit that released it, last: a922a9d).
+-- Loaded by tests/test_migrations.py; regenerate only by replaying those commits.
+PRAGMA user_version = 3;
+CREATE TABLE scenarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+CREATE TABLE plan (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scenario_id INTEGER NOT NULL DEFAULT 1 REFERENCES scenarios(id),
+            year INTEGER NOT NULL,
+            age INTEGER NOT NULL,
+            pension_savings INTEGER DEFAULT 0,
+            isa_account INTEGER DEFAULT 0,
+            general_account INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            health_insurance TEXT,
+            tax TEXT,
+            withdrawal_strategy TEXT
+        );
+CREATE TABLE plan_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plan_id INTEGER NOT NULL,
+            scenario_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            age INTEGER,
+            pension_savings INTEGER DEFAULT 0,
+            isa_account INTEGER DEFAULT 0,
+            general_account INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            health_insurance TEXT,
+            tax TEXT,
+            withdrawal_strategy TEXT,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            valid_from TEXT NOT NULL
+        );
+CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            pension INTEGER DEFAULT 0,
+            isa INTEGER DEFAULT 0,
+            general INTEGER DEFAULT 0
+        );
+CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        );
+CREATE TABLE data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        );
+CREATE TABLE valuations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account TEXT NOT NULL CHECK (account IN ('pension', 'isa', 'general')),
+            date TEXT NOT NULL,
+            market_value INTEGER NOT NULL,
+            UNIQUE (account, date)
+        );
+CREATE TABLE cpi (
+            year INTEGER PRIMARY KEY,
+            inflation_rate REAL NOT NULL
+        );
+CREATE TABLE contribution_limits (
+            account TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            annual_limit INTEGER,
+            tax_credit_limit INTEGER,
+            PRIMARY KEY (account, year)
+        );
+CREATE TABLE contribution_totals (
+            account TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            amount INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (account, year)
+        );
+CREATE TABLE transaction_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            txn_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL CHECK (event_type IN ('create', 'amend', 'void')),
+            date TEXT NOT NULL,
+            pension INTEGER DEFAULT 0,
+            isa INTEGER DEFAULT 0,
+            general INTEGER DEFAULT 0,
+            d_pension INTEGER DEFAULT 0,
+            d_isa INTEGER DEFAULT 0,
+            d_general INTEGER DEFAULT 0,
+            recorded_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+        );
+CREATE TABLE balance_snapshots (
+            event_id INTEGER PRIMARY KEY,
+            pension INTEGER NOT NULL,
+            isa INTEGER NOT NULL,
+            general INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+        );
+CREATE TABLE jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+            started_at TEXT,
+            finished_at TEXT
+        , owner_pid INTEGER);
+CREATE TABLE holdings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account TEXT NOT NULL CHECK (account IN ('pension', 'isa', 'general')),
+            ticker TEXT NOT NULL,
+            date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            UNIQUE (account, ticker, date)
+        );
+CREATE TABLE prices (
+            ticker TEXT NOT NULL,
+            date TEXT NOT NULL,
+            close REAL NOT NULL,
+            PRIMARY KEY (ticker, date)
+        ) WITHOUT ROWID
+    ;
+INSERT INTO scenarios (id, name, created_at) VALUES (1, 'Base', '2026-10-19 02:43:14');
+INSERT INTO plan (id, scenario_id, year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy) VALUES (1, 1, 2026, 50, 100, 0, 0, 100, NULL, NULL, '연금 개시');
+INSERT INTO plan_versions (id, plan_id, scenario_id, year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy, deleted, valid_from) VALUES (1, 1, 1, 2026, 50, 100, 0, 0, 100, NULL, NULL, '연금 개시', 0, '2026-10-19 02:43:14.428');
+INSERT INTO transactions (id, date, pension, isa, general) VALUES (1, '2026-03-01', 40, 10, 0);
+INSERT INTO users (id, username, password) VALUES (1, 'admin', 'hash');
+INSERT INTO data_version (id, version) VALUES (1, 2);
+INSERT INTO contribution_totals (account, year, amount) VALUES ('pension', 2026, 40);
+INSERT INTO contribution_totals (account, year, amount) VALUES ('isa', 2026, 10);
+INSERT INTO contribution_totals (account, year, amount) VALUES ('general', 2026, 0);
+INSERT INTO transaction_events (id, txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general, recorded_at) VALUES (1, 1, 'create', '2026-03-01', 40, 10, 0, 40, 10, 0, '2026-10-19 02:43:14.430');
+INSERT INTO balance_snapshots (event_id, pension, isa, general, created_at) VALUES (0, 0, 0, 0, '2026-10-19 02:43:14.426');
+CREATE UNIQUE INDEX idx_plan_scenario_year ON plan (scenario_id, year);
+CREATE INDEX idx_plan_versions_year_valid_from
+        ON plan_versions (scenario_id, year, valid_from)
+    ;
+CREATE TRIGGER plan_versions_insert AFTER INSERT ON plan BEGIN
+            INSERT INTO plan_versions (plan_id, scenario_id, year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy, valid_from)
+            VALUES (NEW.id, NEW.scenario_id, NEW.year, NEW.age, NEW.pension_savings, NEW.isa_account, NEW.general_account, NEW.total, NEW.health_insurance, NEW.tax, NEW.withdrawal_strategy, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+        END;
+CREATE TRIGGER plan_versions_update AFTER UPDATE ON plan BEGIN
+            INSERT INTO plan_versions (plan_id, scenario_id, year, deleted, valid_from)
+            SELECT OLD.id, OLD.scenario_id, OLD.year, 1, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+            WHERE OLD.year != NEW.year OR OLD.scenario_id != NEW.scenario_id;
+            INSERT INTO plan_versions (plan_id, scenario_id, year, age, pension_savings, isa_account, general_account, total, health_insurance, tax, withdrawal_strategy, valid_from)
+            VALUES (NEW.id, NEW.scenario_id, NEW.year, NEW.age, NEW.pension_savings, NEW.isa_account, NEW.general_account, NEW.total, NEW.health_insurance, NEW.tax, NEW.withdrawal_strategy, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+        END;
+CREATE TRIGGER plan_versions_delete AFTER DELETE ON plan BEGIN
+            INSERT INTO plan_versions (plan_id, scenario_id, year, deleted, valid_from)
+            VALUES (OLD.id, OLD.scenario_id, OLD.year, 1, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'));
+        END;
+CREATE TRIGGER data_version_plan_insert AFTER INSERT ON plan BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_plan_update AFTER UPDATE ON plan BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_plan_delete AFTER DELETE ON plan BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_transactions_insert AFTER INSERT ON transactions BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_transactions_update AFTER UPDATE ON transactions BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_transactions_delete AFTER DELETE ON transactions BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_valuations_insert AFTER INSERT ON valuations BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_valuations_update AFTER UPDATE ON valuations BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_valuations_delete AFTER DELETE ON valuations BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_cpi_insert AFTER INSERT ON cpi BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_cpi_update AFTER UPDATE ON cpi BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_cpi_delete AFTER DELETE ON cpi BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER contribution_totals_insert AFTER INSERT ON transactions BEGIN 
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('pension', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.pension, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount;
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('isa', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.isa, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount;
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('general', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.general, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount; END;
+CREATE TRIGGER contribution_totals_update AFTER UPDATE ON transactions BEGIN 
+            UPDATE contribution_totals SET amount = amount - max(OLD.pension, 0)
+            WHERE account = 'pension' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER);
+            UPDATE contribution_totals SET amount = amount - max(OLD.isa, 0)
+            WHERE account = 'isa' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER);
+            UPDATE contribution_totals SET amount = amount - max(OLD.general, 0)
+            WHERE account = 'general' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER); 
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('pension', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.pension, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount;
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('isa', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.isa, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount;
+            INSERT INTO contribution_totals (account, year, amount)
+            VALUES ('general', CAST(substr(NEW.date, 1, 4) AS INTEGER), max(NEW.general, 0))
+            ON CONFLICT (account, year) DO UPDATE SET amount = amount + excluded.amount; END;
+CREATE TRIGGER contribution_totals_delete AFTER DELETE ON transactions BEGIN 
+            UPDATE contribution_totals SET amount = amount - max(OLD.pension, 0)
+            WHERE account = 'pension' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER);
+            UPDATE contribution_totals SET amount = amount - max(OLD.isa, 0)
+            WHERE account = 'isa' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER);
+            UPDATE contribution_totals SET amount = amount - max(OLD.general, 0)
+            WHERE account = 'general' AND year = CAST(substr(OLD.date, 1, 4) AS INTEGER); END;
+CREATE INDEX idx_transaction_events_txn ON transaction_events (txn_id, id);
+CREATE INDEX idx_transaction_events_recorded_at ON transaction_events (recorded_at);
+CREATE TRIGGER transaction_events_create AFTER INSERT ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'create', NEW.date, NEW.pension, NEW.isa, NEW.general, NEW.pension, NEW.isa, NEW.general);
+        END;
+CREATE TRIGGER transaction_events_amend AFTER UPDATE ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (NEW.id, 'amend', NEW.date, NEW.pension, NEW.isa, NEW.general,
+                    NEW.pension - OLD.pension, NEW.isa - OLD.isa, NEW.general - OLD.general);
+        END;
+CREATE TRIGGER transaction_events_void AFTER DELETE ON transactions BEGIN
+            INSERT INTO transaction_events (txn_id, event_type, date, pension, isa, general, d_pension, d_isa, d_general)
+            VALUES (OLD.id, 'void', OLD.date, OLD.pension, OLD.isa, OLD.general, -OLD.pension, -OLD.isa, -OLD.general);
+        END;
+CREATE TRIGGER balance_snapshots_periodic AFTER INSERT ON transaction_events
+        WHEN NEW.id % 256 = 0 BEGIN
+            INSERT OR REPLACE INTO balance_snapshots (event_id, pension, isa, general)
+            SELECT NEW.id,
+                   s.pension + COALESCE(SUM(e.d_pension), 0),
+                   s.isa + COALESCE(SUM(e.d_isa), 0),
+                   s.general + COALESCE(SUM(e.d_general), 0)
+            FROM (SELECT * FROM balance_snapshots WHERE event_id < NEW.id ORDER BY event_id DESC LIMIT 1) AS s
+            LEFT JOIN transaction_events AS e ON e.id > s.event_id AND e.id <= NEW.id;
+        END;
+CREATE INDEX idx_jobs_input_hash ON jobs (input_hash, status);
+CREATE TRIGGER data_version_holdings_insert AFTER INSERT ON holdings BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_holdings_update AFTER UPDATE ON holdings BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_holdings_delete AFTER DELETE ON holdings BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_prices_insert AFTER INSERT ON prices BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_prices_update AFTER UPDATE ON prices BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
+CREATE TRIGGER data_version_prices_delete AFTER DELETE ON prices BEGIN
+                UPDATE data_version SET version = version + 1 WHERE id = 1;
+            END;
@@ -0,0 +1,80 @@
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import alerts
+import limits
+
+
+@pytest.fixture
+def aconn(db_path):
+    conn = alerts.connect(db_path)
+    yield conn
+    conn.close()
+
+
+def test_writes_mark_dirty_years(aconn):
+    aconn.execute("INSERT INTO transactions (date, isa) VALUES ('2027-02-01', 1)")
+    aconn.execute("INSERT INTO plan (scenario_id, year, age) VALUES (1, 2030, 54)")
+    assert {tuple(r) for r in aconn.execute('SELECT * FROM alert_dirty')} == {('txn', 0, 2027), ('plan', 1, 2030)}
+
+
+def test_limit_rule_fires_once_and_is_delivered(aconn, monkeypatch):
+    sent = []
+    monkeypatch.setitem(alerts.SINKS, 'test', sent.append)
+    year = date.today().year
+    annual_limit, _ = limits.get_limits(aconn, 'isa', year)
+    alerts.create_rule(aconn, 'limit_near', 1, 'isa', 50, sink='test')
+    aconn.execute('INSERT INTO transactions (date, isa) VALUES (?, ?)', (f'{year}-01-02', annual_limit * 0.6))
+    assert alerts.evaluate(aconn, {'pension': 0, 'isa': 0, 'general': 0}) == 1
+    # Still above the threshold: no second alert
+    aconn.execute('INSERT INTO transactions (date, isa) VALUES (?, 1)', (f'{year}-01-03',))
+    assert alerts.evaluate(aconn, {'pension': 0, 'isa': 0, 'general': 0}) == 0
+    assert alerts.drain(aconn) == 1
+    assert [m['subject'] for m in sent] == [f"ISA {year} contributions at 60.0% of the limit"]
+    assert tuple(aconn.execute("SELECT status, claimed_at IS NOT NULL FROM alert_outbox").fetchone()) == ('sent', 1)
+
+
+def test_failed_sink_retries(aconn, monkeypatch):
+    def broken(message):
+        raise OSError('down')
+    monkeypatch.setitem(alerts.SINKS, 'test', broken)
+    aconn.execute("INSERT INTO alert_outbox (sink, subject, body) VALUES ('test', 's', 'b')")
+    assert alerts.drain(aconn) == 0
+    assert tuple(aconn.execute('SELECT status, attempts, last_error FROM alert_outbox').fetchone()) == \
+        ('pending', 1, 'OSError: down')
+
+
+def test_requeue_stale_sending(aconn):
+    old = (datetime.now() - timedelta(seconds=alerts.STALE_SENDING + 60)).strftime('%Y-%m-%d %H:%M:%S')
+    new = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for claimed in (old, new, None):
+        aconn.execute("INSERT INTO alert_outbox (sink, subject, body, status, claimed_at) VALUES ('log', 's', 'b', 'sending', ?)",
+                      (claimed,))
+    assert alerts.requeue_stale(aconn) == 2
+    assert [r[0] for r in aconn.execute('SELECT status FROM alert_outbox ORDER BY id')] == ['pending', 'sending', 'pending']
+
+
+def test_dispatcher_survives_a_failing_pass(db_path, monkeypatch):
+    stop, passes = threading.Event(), []
+
+    def run_once(path, starts):
+        passes.append(path)
+        if len(passes) >= 3:
+            stop.set()
+        raise KeyError('boom')
+    monkeypatch.setattr(alerts, 'run_once', run_once)
+    alerts.run(db_path, {}, interval=0, stop=stop)
+    assert len(passes) == 3
+
+
+def test_rule_views_toggle_and_delete(client, flask_app):
+    conn = alerts.connect(flask_app.config['DATABASE'])
+    rule_id = alerts.create_rule(conn, 'limit_near', 1, 'isa', 50)
+    conn.commit()
+    client.post(f'/alerts/toggle/{rule_id}')
+    assert [r['enabled'] for r in alerts.list_rules(conn)] == [0]
+    client.post(f'/alerts/delete/{rule_id}')
+    assert alerts.list_rules(conn) == []
+    conn.close()
@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+PAGES = ('/', '/input', '/manage', '/ledger', '/returns', '/holdings', '/scenarios', '/search?q=x',
+         '/alerts', '/admin/users', '/api/chart-data', '/api/ledger/state', '/api/goal-seek', '/api/what-if')
+
+
+def test_apps_are_independent(tmp_path, flask_app):
+    import app
+    other = app.create_app(str(tmp_path / 'other.db'))
+    assert other is not flask_app
+    assert other.config['DATABASE'] != flask_app.config['DATABASE']
+
+
+def test_import_leaves_heavy_libraries_unloaded():
+    # numpy may only be present as the lazy placeholder: none of its submodules have run
+    code = ("import sys, app; print(sorted(m for m in sys.modules if m == 'openpyxl' or m.startswith(('numpy.', 'pandas', 'openpyxl.'))))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == '[]'
+
+
+def test_module_app_is_configured(tmp_path, monkeypatch, flask_app):
+    # gunicorn app:app
+    import app
+    monkeypatch.setenv('DATABASE', str(tmp_path / 'module.db'))
+    monkeypatch.delitem(vars(app), 'app', raising=False)
+    try:
+        assert app.app.secret_key == 'test'
+        assert app.app.config['DATABASE'] == str(tmp_path / 'module.db')
+    finally:
+        vars(app).pop('app', None)
+
+
+@pytest.mark.parametrize('page', ('/', '/api/chart-data', '/api/chart-data?scenario=2'))
+def test_login_required(flask_app, page):
+    response = flask_app.test_client().get(page)
+    assert response.status_code == 302 and response.headers['Location'].endswith('/login')
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_pages_render(client, page):
+    assert client.get(page).status_code == 200
+
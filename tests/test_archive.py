@@ -0,0 +1,83 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+import archive
+import ledger
+from conftest import flashes
+
+TODAY = date(2028, 6, 1)
+
+
+def bookkeeping(conn):
+    # Everything the per-row triggers maintain, which closing and reopening must leave alone
+    return (conn.execute('SELECT COUNT(*) FROM transaction_events').fetchone()[0],
+            ledger.balances(conn),
+            sorted(tuple(r) for r in conn.execute('SELECT * FROM contribution_totals')),
+            sorted(tuple(r) for r in conn.execute('SELECT kind, ref_id, body FROM search_index')),
+            [tuple(r) for r in archive.yearly_deposits(conn, 2026)],
+            [archive.deposits_through(conn, date(y, 6, 30), 2026) for y in (2026, 2027, 2028)])
+
+
+@pytest.fixture
+def ledger_rows(conn):
+    for day, pension, memo in (('2026-02-01', 100, 'first'), ('2026-09-01', 50, None),
+                               ('2027-03-01', 30, 'second'), ('2028-01-10', 7, None)):
+        conn.execute('INSERT INTO transactions (date, pension, isa, general, memo) VALUES (?, ?, 1, 0, ?)',
+                     (day, pension, memo))
+    return conn
+
+
+def test_close_and_reopen_round_trip(ledger_rows):
+    conn = ledger_rows
+    before = bookkeeping(conn)
+    assert archive.close(conn, 2027, today=TODAY) == [2026, 2027]
+    assert bookkeeping(conn) == before
+    assert [tuple(r) for r in conn.execute("SELECT year, amount, balance, txn_count FROM closing_balances WHERE account = 'pension'")] == \
+        [(2026, 150, 150, 2), (2027, 30, 180, 1)]
+    assert conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM transactions_all').fetchone()[0] == 4
+
+    assert archive.reopen(conn, 2027) == [2027]
+    assert bookkeeping(conn) == before
+    assert archive.closed_through(conn) == 2026
+    assert archive.reopen(conn, 2000) == [2026]
+    assert bookkeeping(conn) == before
+    assert conn.execute('SELECT COUNT(*) FROM transactions_archive').fetchone()[0] == 0
+
+
+def test_closed_years_are_read_only(ledger_rows):
+    conn = ledger_rows
+    archive.close(conn, 2026, today=TODAY)
+    assert archive.check_open(conn, 2026) and not archive.check_open(conn, 2027)
+    with pytest.raises(sqlite3.IntegrityError, match='year is closed'):
+        conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-12-31', 1, 0, 0)")
+    with pytest.raises(sqlite3.IntegrityError, match='year is closed'):
+        conn.execute("UPDATE transactions SET date = '2026-01-01' WHERE date = '2027-03-01'")
+
+
+def test_close_errors(conn):
+    with pytest.raises(ValueError, match='No transactions'):
+        archive.close(conn, 2026, today=TODAY)
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-02-01', 1, 0, 0)")
+    with pytest.raises(ValueError, match='not finished'):
+        archive.close(conn, 2028, today=TODAY)
+    with pytest.raises(ValueError, match='not closed'):
+        archive.reopen(conn, 2026)
+    archive.close(conn, 2026, today=TODAY)
+    with pytest.raises(ValueError, match='already closed'):
+        archive.close(conn, 2026, today=TODAY)
+
+
+def test_routes(client):
+    client.post('/input', data={'date': '2020-01-05', 'pension': '10', 'memo': 'old'})
+    client.post('/ledger/close', data={'year': '2020'})
+    assert flashes(client) == ['Closed 2020.']
+    client.post('/input', data={'date': '2020-02-01', 'pension': '1'})
+    assert flashes(client) == ['2020 is closed (books closed through 2020). Reopen it to make changes.']
+    assert client.post('/api/transactions/batch', json={'update': [{'id': 1, 'pension': 2}]}).status_code == 400
+    assert client.get('/api/archive/2020').get_json()['transactions'][0]['memo'] == 'old'
+    assert client.get('/api/archive/2019').status_code == 404
+    client.post('/ledger/reopen/2020')
+    assert flashes(client) == ['Reopened 2020.']
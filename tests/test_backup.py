@@ -0,0 +1,76 @@
+import gzip
+import sqlite3
+
+import pytest
+
+import backup
+
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def add(path, n=1):
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-01', 1, 0, 0)",
+                     [()] * n)
+    conn.commit()
+    conn.close()
+
+
+def test_backup_and_restore_move_the_version_forward(db_path, tmp_path):
+    add(db_path)
+    archive = backup.create_backup(db_path, str(tmp_path / 'b'))
+    assert backup.list_backups(str(tmp_path / 'b')) == [archive]
+    saved = backup.data_version(db_path)
+
+    add(db_path, 3)
+    live = backup.data_version(db_path)
+    backup.restore(archive, db_path)
+    assert count(db_path) == 1
+    # Never back to a version the live database already handed out
+    assert backup.data_version(db_path) == live + 1 > saved
+
+
+def test_restore_refuses_a_corrupt_archive(db_path, tmp_path):
+    add(db_path)
+    archive = tmp_path / 'broken.db.gz'
+    with gzip.open(archive, 'wb') as f:
+        f.write(b'SQLite format 3\x00' + b'\x00' * 200)
+    with pytest.raises((RuntimeError, sqlite3.DatabaseError)):
+        backup.restore(str(archive), db_path)
+    assert count(db_path) == 1
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == '.db'] == ['plan.db']
+
+
+def test_rotate_keeps_the_newest(db_path, tmp_path):
+    made = [backup.create_backup(db_path, str(tmp_path)) for _ in range(3)]
+    assert backup.rotate(str(tmp_path), keep=2) == made[:1]
+    assert backup.list_backups(str(tmp_path)) == made[1:]
+
+
+@pytest.mark.parametrize('keep', [0, -1])
+def test_rotate_never_removes_every_backup(db_path, tmp_path, monkeypatch, keep):
+    made = [backup.create_backup(db_path, str(tmp_path))]
+    with pytest.raises(ValueError):
+        backup.rotate(str(tmp_path), keep=keep)
+    with pytest.raises(ValueError):
+        backup.run_schedule(db_path, str(tmp_path), keep=keep)
+    for command in ('backup', 'schedule'):
+        monkeypatch.setattr('sys.argv', ['backup.py', '--db', db_path, '--dir', str(tmp_path), command, '--keep', str(keep)])
+        with pytest.raises(SystemExit):
+            backup.main()
+    assert backup.list_backups(str(tmp_path)) == made
+
+
+def test_data_version_of_old_or_missing_files(tmp_path):
+    assert backup.data_version(str(tmp_path / 'missing.db')) is None
+    old = str(tmp_path / 'old.db')
+    sqlite3.connect(old).close()
+    assert backup.data_version(old) is None
+    backup.bump_version(old, None)
+    assert backup.data_version(old) == 1
@@ -0,0 +1,75 @@
+import collections
+import gzip
+import zlib
+
+import pytest
+from flask import Flask, Response, jsonify, request
+
+import compress
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(compress, '_cache', collections.OrderedDict())
+    monkeypatch.setattr(compress, '_cache_size', 0)
+    monkeypatch.setattr(compress, 'brotli', None)
+    app = Flask(__name__)
+    app.after_request(lambda response: compress.compress_response(response, request.accept_encodings))
+
+    @app.route('/big')
+    def big():
+        return jsonify(list(range(2000)))
+
+    @app.route('/small')
+    def small():
+        return jsonify([1])
+
+    @app.route('/tagged')
+    def tagged():
+        response = Response('x' * 5000, mimetype='text/plain')
+        response.set_etag('v1')
+        return response.make_conditional(request)
+
+    @app.route('/png')
+    def png():
+        return Response(b'\x89PNG' * 1000, mimetype='image/png')
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'data: {i}\n\n' for i in range(3)), mimetype='text/event-stream')
+
+    return app
+
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+def test_compresses_large_bodies(app):
+    client = app.test_client()
+    plain = client.get('/big')
+    packed = client.get('/big', headers=GZIP)
+    assert plain.content_encoding is None and 'Accept-Encoding' in plain.vary
+    assert packed.content_encoding == 'gzip'
+    assert gzip.decompress(packed.data) == plain.data
+    assert client.get('/big', headers={'Accept-Encoding': 'gzip;q=0'}).content_encoding is None
+    assert client.get('/small', headers=GZIP).content_encoding is None
+    assert client.get('/png', headers=GZIP).content_encoding is None
+
+
+def test_tagged_bodies_are_compressed_once(app, monkeypatch):
+    client = app.test_client()
+    first = client.get('/tagged', headers=GZIP)
+    assert first.headers['ETag'] == 'W/"v1"' and gzip.decompress(first.data) == b'x' * 5000
+    monkeypatch.setattr(compress, 'compress', lambda data, encoding: pytest.fail('compressed twice'))
+    assert client.get('/tagged', headers=GZIP).data == first.data
+    assert client.get('/tagged', headers={**GZIP, 'If-None-Match': '"v1"'}).status_code == 304
+
+
+def test_streams_flush_every_chunk(app):
+    response = app.test_client().get('/stream', headers=GZIP, buffered=False)
+    assert response.content_encoding == 'gzip' and 'Content-Length' not in response.headers
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = [decoder.decompress(chunk) for chunk in response.response]
+    # Each event is readable as soon as its chunk arrives
+    assert [c for c in chunks if c] == [b'data: 0\n\n', b'data: 1\n\n', b'data: 2\n\n']
+    response.close()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import downsample
+
+
+def test_lttb_keeps_the_ends_and_the_spikes():
+    x = np.arange(10000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50
+    picked = downsample.lttb(x, y, 200)
+    assert len(picked) == 200 and picked[0] == 0 and picked[-1] == 9999
+    assert np.all(np.diff(picked) > 0)
+    assert 4321 in picked
+    assert downsample.lttb(x[:50], y[:50], 200).tolist() == list(range(50))
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    rng = np.random.default_rng(1)
+    y = rng.normal(size=5000)
+    picked = downsample.minmax(y, 100)
+    assert np.all(np.diff(picked) > 0) and len(picked) <= 200
+    for bucket in np.array_split(np.arange(5000), 100):
+        assert bucket[y[bucket].argmin()] in picked and bucket[y[bucket].argmax()] in picked
+
+
+@pytest.mark.parametrize('width, expected', [(0, 100), (799, 700), (800, 800), (10 ** 9, 4000), (-5, 100)])
+def test_quantize_width(width, expected):
+    assert downsample.quantize_width(width) == expected
+
+
+def test_balance_series(conn):
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-10', 10, 0, 0), ('2026-03-01', 0, 5, 0)")
+    data = downsample.series(conn, 'balance', '2026-02-01', '2026-03-31', 800, start_total=100)
+    assert data['points'] == len(data['dates']) == 59
+    values = dict(zip(data['dates'], data['values']))
+    assert (values['2026-02-01'], values['2026-02-28'], values['2026-03-01']) == (110, 110, 115)
+    with pytest.raises(ValueError):
+        downsample.series(conn, 'nope', '2026-01-01', '2026-01-02', 800)
+    with pytest.raises(ValueError):
+        downsample.series(conn, 'balance', '2026-01-01', '2026-01-02', 800, method='nope')
+
+
+@pytest.mark.parametrize('query', ['start=2026-13-01', 'start=2030-01-01&end=2026-01-01', 'end=x',
+                                   'start=1900-01-01&end=2026-01-01', 'method=avg'])
+def test_api_rejects_bad_ranges(client, query):
+    assert client.get(f'/api/series/balance?{query}').status_code == 400
+
+
+def test_api(client):
+    data = client.get('/api/series/balance?start=2026-01-01&end=2036-12-31&width=250').get_json()
+    assert data['points'] == 4018 and len(data['dates']) <= 200
+    assert client.get('/api/series/goal?start=2026-01-01&end=2026-12-31').status_code == 200
@@ -0,0 +1,94 @@
+from datetime import date
+
+import pytest
+
+import balances
+import data_cache
+import goal_curve
+import mutations
+import plan_import
+import scenarios
+
+
+def meta(conn):
+    return [tuple(r) for r in conn.execute('SELECT scenario_id, start_total FROM goal_curve_meta ORDER BY 1')]
+
+
+def test_curve_passes_through_the_plan(conn):
+    conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 1300), (1, 2027, 51, 2600)')
+    goal_curve.build(conn, 1, 100)
+    curve = {m: (lin, comp) for m, lin, comp in conn.execute('SELECT month, linear, compound FROM goal_curve')}
+    assert curve[-1] == (100, 100) and curve[11] == (1300, 1300) and curve[23] == (2600, 2600)
+    assert curve[5][0] == pytest.approx(700)
+    assert curve[5][1] == pytest.approx(100 * 13 ** 0.5)
+    assert curve[17][1] == pytest.approx(1300 * 2 ** 0.5)
+
+    # Mid-month targets interpolate between the two month ends
+    assert goal_curve.target_at(conn, 1, date(2026, 1, 31), 100) == pytest.approx(200)
+    assert goal_curve.target_at(conn, 1, date(2026, 2, 14), 100) == pytest.approx(250)
+    assert goal_curve.target_at(conn, 1, date(2028, 1, 1), 100) is None
+    with pytest.raises(ValueError):
+        goal_curve.target_at(conn, 1, date(2026, 2, 14), 100, mode='nope')
+
+
+def test_plan_edits_drop_the_curve(conn):
+    other = conn.execute("INSERT INTO scenarios (name) VALUES ('Other')").lastrowid
+    plan_id = conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 100)').lastrowid
+    for scenario_id in (1, other):
+        goal_curve.build(conn, scenario_id, 0)
+    assert meta(conn) == [(1, 0), (other, 0)]
+
+    conn.execute('UPDATE plan SET total = 200 WHERE id = ?', (plan_id,))
+    assert meta(conn) == [(other, 0)]
+    goal_curve.build(conn, 1, 0)
+    conn.execute('UPDATE plan SET scenario_id = ? WHERE id = ?', (other, plan_id))
+    assert meta(conn) == []
+    goal_curve.build(conn, other, 0)
+    conn.execute('DELETE FROM plan WHERE id = ?', (plan_id,))
+    assert meta(conn) == []
+
+
+def test_reads_never_write(conn):
+    # A stale or missing curve is computed in memory, with the same result as the stored one
+    conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 1300)')
+    conn.commit()
+    before = conn.total_changes
+    day = date(2026, 2, 14)
+    computed = goal_curve.target_at(conn, 1, day, 100), goal_curve.rows(goal_curve.monthly_gap(conn, 1, 100, until=day))
+    assert conn.total_changes == before and not conn.in_transaction and meta(conn) == []
+
+    goal_curve.build(conn, 1, 100)
+    data_cache.clear()
+    assert (goal_curve.target_at(conn, 1, day, 100), goal_curve.rows(goal_curve.monthly_gap(conn, 1, 100, until=day))) == computed
+    # Other opening balances than the stored ones are computed too, not rebuilt
+    assert goal_curve.target_at(conn, 1, day, 0) != computed[0] and meta(conn) == [(1, 100)]
+
+
+def test_plan_writers_store_the_curve(conn):
+    start_total = sum(balances.start_balances().values())
+    mutations.apply_plan_batch(conn, {'create': [{'year': 2026, 'age': 50, 'pension_savings': 1000}]}, 1)
+    assert meta(conn) == [(1, start_total)]
+
+    conn.commit()
+    plan_import.import_plan(conn, 'year,age,pension_savings\n2026,50,2000\n2027,51,3000\n'.encode(), 'plan.csv')
+    assert meta(conn) == [(1, start_total)]
+    assert conn.execute('SELECT linear FROM goal_curve WHERE scenario_id = 1 AND month = 23').fetchone()[0] == 3000
+
+    clone = scenarios.clone_scenario(conn, 1, 'Copy')
+    assert meta(conn) == [(1, start_total), (clone, start_total)]
+
+
+def test_monthly_gap_accumulates_deposits(conn):
+    conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 1200)')
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-15', 100, 0, 0), ('2026-03-01', 0, 50, 0)")
+    series = goal_curve.monthly_gap(conn, 1, 0, until=date(2026, 3, 31))
+    rows = goal_curve.rows(series)
+    assert [r['month'] for r in rows] == ['2026-01', '2026-02', '2026-03']
+    assert [r['target'] for r in rows] == [100, 200, 300]
+    assert [r['actual'] for r in rows] == [100, 100, 150]
+    assert [r['gap_pct'] for r in rows] == [100.0, 50.0, 50.0]
+
+
+def test_api(client):
+    assert client.get('/api/goal-curve?to=2026-13-01').status_code == 400
+    assert client.get('/api/goal-curve?to=2026-03-31&curve=compound').get_json()['mode'] == 'compound'
@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+
+import goal_seek
+
+TODAY = date(2026, 3, 15)
+FLAT = {'pension': 0.0, 'isa': 0.0, 'general': 0.0}
+NO_CAPS = {'pension': None, 'isa': None, 'general': None}
+EMPTY = {'pension': 0, 'isa': 0, 'general': 0}
+
+
+def plan(year, pension=0, isa=0, general=0):
+    return {'year': year, 'pension_savings': pension, 'isa_account': isa, 'general_account': general,
+            'total': pension + isa + general}
+
+
+def test_flat_returns_split_the_gap_evenly_over_the_months():
+    rows = goal_seek.solve([plan(2025, 999), plan(2026, 100, 0, 0), plan(2027, 0, 0, 0), plan(2028, 340, 0, 20)],
+                           {'pension': 10, 'isa': 0, 'general': 0}, NO_CAPS, FLAT, TODAY)
+    # Past years and plans without a total are skipped
+    assert [(r['year'], r['months']) for r in rows] == [(2026, 10), (2028, 34)]
+    assert rows[0]['monthly'] == 9.0 and rows[0]['per_account']['pension'] == 9.0
+    assert rows[1]['monthly'] == 10.3 and rows[1]['split'] == {'pension': 10.3, 'isa': 0.0, 'general': 0.0}
+    assert rows[1]['per_account'] == {'pension': 9.7, 'isa': 0.0, 'general': 0.6}
+    assert rows[1]['projected'] == 10 and rows[1]['projected_pct'] == 2.8
+
+
+def test_money_fills_the_capped_accounts_first():
+    caps = {'pension': 5, 'isa': 3, 'general': None}
+    [row] = goal_seek.solve([plan(2026, general=150)], EMPTY, caps, FLAT, TODAY)
+    assert row['monthly'] == 15.0 and row['split'] == {'pension': 5.0, 'isa': 3.0, 'general': 7.0}
+
+
+def test_growth_lowers_the_contribution():
+    rates = {'pension': 6.0, 'isa': 6.0, 'general': 6.0}
+    [row] = goal_seek.solve([plan(2036, general=10000)], {'pension': 0, 'isa': 0, 'general': 1000},
+                            NO_CAPS, rates, TODAY)
+    growth, annuity = goal_seek.growth_factors([6.0], goal_seek.np.array([row['months']]))
+    assert row['monthly'] == pytest.approx((10000 - 1000 * growth[0][0]) / annuity[0][0], abs=0.05)
+    assert row['projected'] == round(1000 * growth[0][0])
+
+
+def test_unreachable_when_every_account_is_capped():
+    caps = {'pension': 1, 'isa': 1, 'general': 1}
+    [row] = goal_seek.solve([plan(2026, general=1000)], EMPTY, caps, FLAT, TODAY)
+    assert row['monthly'] is None and row['per_account']['general'] == 100.0
+
+
+def test_current_balances_past_the_summary():
+    columns = {'year': goal_seek.np.array([2026, 2027]), 'pension': goal_seek.np.array([1, 2]),
+               'isa': goal_seek.np.array([3, 4]), 'general': goal_seek.np.array([5, 6])}
+    assert goal_seek.current_balances(columns, 2027, EMPTY) == {'pension': 2, 'isa': 4, 'general': 6}
+    assert goal_seek.current_balances(columns, 2040, EMPTY) == {'pension': 2, 'isa': 4, 'general': 6}
+    assert goal_seek.current_balances(columns, 2020, {'pension': 9}) == {'pension': 9}
+
+
+def test_caps_follow_the_limits_table(conn):
+    conn.execute("INSERT INTO contribution_limits (account, year, annual_limit) VALUES ('general', 2026, 1200)")
+    caps = goal_seek.monthly_caps(conn, 2026)
+    assert caps == {'pension': 150, 'isa': 2000 / 12, 'general': 100}
+
+
+@pytest.mark.parametrize('query', ['ret_pension=nan', 'ret_isa=inf', 'ret_general=-100', 'ret_general=1001'])
+def test_api_rejects_bad_returns(client, query):
+    response = client.get(f'/api/goal-seek?{query}')
+    assert response.status_code == 400 and 'invalid return assumption' in response.get_json()['error']
+
+
+def test_api(client):
+    data = client.get('/api/goal-seek?ret_pension=0&ret_isa=-50').get_json()
+    assert data['returns'] == {'pension': 0.0, 'isa': -50.0, 'general': 6.0}
+    assert isinstance(data['rows'], list)
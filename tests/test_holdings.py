@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+import holdings
+from conftest import flashes
+
+
+def test_set_holding_normalizes_and_rejects_dates(conn):
+    holdings.set_holding(conn, 'isa', 'abc', ' 2026-05-01 ', 10)
+    with pytest.raises(ValueError):
+        holdings.set_holding(conn, 'isa', 'ABC', '2026/05/01', 10)
+    assert [tuple(r) for r in conn.execute('SELECT ticker, date FROM holdings')] == [('ABC', '2026-05-01')]
+
+
+def test_values_at_is_as_of(conn):
+    holdings.set_holding(conn, 'isa', 'AAA', '2026-01-10', 2)
+    holdings.set_holding(conn, 'isa', 'AAA', '2026-03-01', 5)
+    holdings.set_holding(conn, 'general', 'BBB', '1950-01-01', 1)  # far from the epoch on either side
+    holdings.ingest_prices(conn, [('AAA', '2026-01-01', 10000), ('AAA', '2026-02-15', 20000),
+                                  ('BBB', '2100-01-01', 50000)])
+    days = holdings._days(['2025-12-31', '2026-01-10', '2026-02-20', '2026-03-02', '2100-06-01'])
+    values, held = holdings.values_at(conn, days)
+    assert values['isa'].tolist() == [0, 2, 4, 10, 10]
+    assert held['isa'].tolist() == [False, True, True, True, True]
+    assert values['general'].tolist() == [0, 0, 0, 0, 5]
+    assert held['general'].all()
+
+
+def test_holding_form_validates(client):
+    for day in ('2026/05/01', 'yesterday'):
+        client.post('/holdings', data={'account': 'isa', 'ticker': 'AAA', 'date': day, 'quantity': '1'})
+        assert flashes(client) == [f"Invalid date: {day!r}"]
+    client.post('/holdings', data={'account': 'isa', 'ticker': 'AAA', 'date': '2026-05-01', 'quantity': 'inf'})
+    assert flashes(client) == ["Ticker and a non-negative quantity are required."]
+    client.post('/holdings', data={'account': 'isa', 'ticker': 'AAA', 'date': '2026-05-01', 'quantity': '1'})
+    assert flashes(client) == []
+    for page in ('/', '/input', '/holdings'):
+        assert client.get(page).status_code == 200
+
+
+def test_market_values_api_validates_the_range(client):
+    for query in ('to=2026-13-45', 'from=2026/01/01', 'from=2026-02-01&to=2026-01-01', 'from=1900-01-01&to=2026-01-01'):
+        assert client.get(f'/api/market-values?{query}').status_code == 400
+    data = client.get('/api/market-values?to=2026-01-03').get_json()
+    assert data['dates'] == ['2026-01-01', '2026-01-02', '2026-01-03']
+
+
+def test_price_upload_rejects_non_utf8(client):
+    upload = {'file': (io.BytesIO(b'\xffticker,date,close\nAAA,2026-01-02,100\n'), 'prices.csv')}
+    assert client.post('/holdings/prices', data=upload).status_code == 302
+    assert flashes(client) == ["The price file is not UTF-8 text; save it as UTF-8 CSV and upload it again."]
+    upload = {'file': (io.BytesIO(b'ticker,date,close\nAAA,2026-01-02,100\n'), 'prices.csv')}
+    client.post('/holdings/prices', data=upload)
+    assert flashes(client) == ["Loaded 1 prices."]
@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+import inflation
+import summary
+from conftest import flashes
+
+
+def test_deflators_compound_the_rates(conn):
+    conn.execute('INSERT INTO cpi (year, inflation_rate) VALUES (2027, 10), (2028, 0)')
+    series = inflation.deflators(conn, [2025, 2026, 2027, 2028, 2029])
+    assert series.tolist() == pytest.approx([1.0, 1.0, 1.1, 1.1, 1.1 * 1.02])
+
+
+def test_cpi_edits_invalidate_cached_deflators(conn):
+    before = inflation.deflators(conn, [2027])[0]
+    conn.execute('INSERT INTO cpi (year, inflation_rate) VALUES (2027, 5)')
+    assert (before, inflation.deflators(conn, [2027])[0]) == pytest.approx((1.02, 1.05))
+
+
+def test_real_summary_divides_money_columns(conn):
+    conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 1000), (1, 2027, 51, 2040)')
+    conn.execute('INSERT INTO cpi (year, inflation_rate) VALUES (2027, 2)')
+    starts = {'pension': 0, 'isa': 0, 'general': 0}
+    nominal = summary.scenario_summary(conn, 1, starts)
+    real = summary.real_summary(conn, 1, starts)
+    assert real['goal_total'].tolist() == pytest.approx([1000, 2000])
+    assert real['year'].tolist() == nominal['year'].tolist()
+    plans = inflation.deflate_plans(conn, conn.execute('SELECT * FROM plan ORDER BY year').fetchall())
+    assert [p['total'] for p in plans] == pytest.approx([1000, 2000])
+
+
+@pytest.mark.parametrize('rate', ['nan', 'inf', '-100', 'abc', ''])
+def test_rejects_unusable_rates(client, rate):
+    client.post('/inflation', data={'year': 2027, 'inflation_rate': rate})
+    assert flashes(client)
+    assert client.get('/manage?mode=real').status_code == 200
+
+
+def test_rate_round_trip(client, flask_app):
+    client.post('/inflation', data={'year': 2027, 'inflation_rate': '3.5'})
+    assert flashes(client) == []
+    client.post('/delete_inflation/2027')
+    conn = sqlite3.connect(flask_app.config['DATABASE'])
+    assert conn.execute('SELECT COUNT(*) FROM cpi').fetchone()[0] == 0
+    conn.close()
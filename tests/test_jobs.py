@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+import jobs
+
+
+class Inline:
+    # Runs each job in the test process instead of a spawned pool
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+@pytest.fixture(autouse=True)
+def inline(monkeypatch):
+    monkeypatch.setattr(jobs, '_executor_instance', Inline)
+
+
+@pytest.fixture
+def kinds(monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_KINDS', dict(jobs.JOB_KINDS))
+
+    @jobs.job('echo')
+    def echo(conn, params, ctx):
+        ctx.progress(1, 'done')
+        return params
+
+    @jobs.job('broken')
+    def broken(conn, params, ctx):
+        raise RuntimeError('boom')
+
+    @jobs.job('stop')
+    def stop(conn, params, ctx):
+        conn.execute('UPDATE jobs SET cancel_requested = 1')
+        conn.commit()
+        ctx.progress(1)
+
+
+def test_results_are_cached_per_data_version(conn, db_path, kinds):
+    job_id, cached = jobs.submit(conn, db_path, 'echo', {'x': 1})
+    assert not cached
+    job = jobs.get(conn, job_id)
+    assert (job['status'], job['progress'], job['message'], job['result']) == ('done', 1, 'done', {'x': 1})
+    assert jobs.submit(conn, db_path, 'echo', {'x': 1}) == (job_id, True)
+    assert jobs.submit(conn, db_path, 'echo', {'x': 2})[1] is False
+
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-01', 1, 0, 0)")
+    conn.commit()
+    assert jobs.submit(conn, db_path, 'echo', {'x': 1})[0] != job_id
+
+
+def test_failures_and_cancellation(conn, db_path, kinds):
+    failed = jobs.get(conn, jobs.submit(conn, db_path, 'broken', {})[0])
+    assert failed['status'] == 'failed' and failed['error'].startswith('boom')
+    assert jobs.get(conn, jobs.submit(conn, db_path, 'stop', {})[0])['status'] == 'cancelled'
+    assert not jobs.cancel(conn, failed['id'])
+    with pytest.raises(ValueError):
+        jobs.submit(conn, db_path, 'nope', {})
+
+
+def test_recover_fails_orphaned_jobs(conn):
+    conn.execute("INSERT INTO jobs (id, kind, params, input_hash, status, owner_pid) VALUES ('a', 'echo', '{}', 'h', 'running', ?)",
+                 (os.getpid(),))
+    conn.execute("INSERT INTO jobs (id, kind, params, input_hash, status, owner_pid) VALUES ('b', 'echo', '{}', 'h', 'queued', NULL)")
+    assert jobs.recover(conn) == 1
+    assert [tuple(r) for r in conn.execute('SELECT id, status FROM jobs ORDER BY id')] == [('a', 'running'), ('b', 'failed')]
+
+
+def test_builtin_compare_job(client):
+    response = client.post('/api/jobs', json={'kind': 'scenario_compare', 'params': {'ids': [1]}})
+    assert response.status_code == 202
+    job = client.get(response.get_json()['url']).get_json()
+    assert job['status'] == 'done' and [s['id'] for s in job['result']['scenarios']] == [1]
+
+
+@pytest.mark.parametrize('body', [[1], 'abc', {'kind': 'nope'}, {'kind': 'projection', 'params': [1]},
+                                  {'kind': 'projection', 'params': {'paths': 'many'}}])
+def test_api_rejects_bad_bodies(client, body):
+    response = client.post('/api/jobs', json=body)
+    assert response.status_code == 400 and 'error' in response.get_json()
+    assert client.get('/api/jobs').get_json() == []
+    assert client.get('/api/jobs/missing').status_code == 404
+
+
+@pytest.mark.parametrize('params, error', [
+    ({'paths': 0}, "paths must be between 1 and 200,000."),
+    ({'paths': -5}, "paths must be between 1 and 200,000."),
+    ({'paths': 10 ** 9}, "paths must be between 1 and 200,000."),
+    ({'paths': 2.5}, "paths must be a finite whole number."),
+    ({'mean_return': 'nan'}, "mean_return must be a finite number."),
+    ({'volatility': 'inf'}, "volatility must be a finite number."),
+    ({'volatility': -1}, "volatility must be at least 0."),
+    ({'annual_contribution': '-inf'}, "annual_contribution must be a finite number."),
+    ({'annual_contribution': [1]}, "annual_contribution must be a finite number."),
+    ({'seed': 'x'}, "seed must be a finite whole number."),
+])
+def test_api_rejects_bad_projection_params(client, params, error):
+    response = client.post('/api/jobs', json={'kind': 'projection', 'params': params})
+    assert response.status_code == 400 and response.get_json() == {'error': error}
+    assert client.get('/api/jobs').get_json() == []
+
+
+@pytest.mark.parametrize('ids', [1, 'abc', [[1]], [True]])
+def test_api_rejects_bad_compare_ids(client, ids):
+    response = client.post('/api/jobs', json={'kind': 'scenario_compare', 'params': {'ids': ids}})
+    assert response.status_code == 400 and response.get_json() == {'error': "ids must be a list of scenario ids."}
+    assert client.get('/api/jobs').get_json() == []
+
+
+def test_api_accepts_numeric_strings(client):
+    params = {'paths': '10', 'mean_return': '4.5', 'volatility': 0, 'annual_contribution': '1200', 'seed': 7}
+    assert client.post('/api/jobs', json={'kind': 'projection', 'params': params}).status_code == 202
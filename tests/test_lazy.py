@@ -0,0 +1,19 @@
+import sys
+
+import pytest
+
+import lazy
+
+
+def test_module_loads_on_first_attribute(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    colorsys = lazy.module('colorsys')
+    assert lazy.module('colorsys') is colorsys
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+
+
+def test_missing_module_raises_like_import():
+    with pytest.raises(ModuleNotFoundError) as info:
+        lazy.module('no_such_module_here')
+    assert info.value.name == 'no_such_module_here'
+    assert 'no_such_module_here' not in sys.modules
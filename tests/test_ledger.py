@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+import balances
+import ledger
+import migrations
+from conftest import flashes
+
+
+def rows(conn, event_id=None):
+    event_id = ledger.latest_event_id(conn) if event_id is None else event_id
+    return sorted(tuple(row) for row in ledger.state_at(conn, event_id))
+
+
+def current(conn):
+    return sorted(tuple(row) for row in conn.execute('SELECT id, date, pension, isa, general, memo FROM transactions'))
+
+
+def test_events_follow_every_write(conn):
+    txn = conn.execute("INSERT INTO transactions (date, pension, isa, general, memo) VALUES ('2026-01-05', 10, 20, 30, 'a')").lastrowid
+    conn.execute("UPDATE transactions SET pension = 15, memo = 'b' WHERE id = ?", (txn,))
+    conn.execute('DELETE FROM transactions WHERE id = ?', (txn,))
+    events = [(e['event_type'], e['d_pension'], e['memo']) for e in reversed(ledger.list_events(conn))]
+    assert events == [('create', 10, 'a'), ('amend', 5, 'b'), ('void', -15, 'b')]
+    assert rows(conn, 1) == [(txn, '2026-01-05', 10, 20, 30, 'a')]
+    assert rows(conn) == []
+
+
+def test_balances_match_a_full_replay(conn):
+    rng = random.Random(7)
+    for _ in range(ledger.SNAPSHOT_INTERVAL * 2 + 40):
+        ids = [r[0] for r in conn.execute('SELECT id FROM transactions')]
+        op = rng.random()
+        if ids and op < 0.2:
+            conn.execute('DELETE FROM transactions WHERE id = ?', (rng.choice(ids),))
+        elif ids and op < 0.5:
+            conn.execute('UPDATE transactions SET pension = ?, general = ? WHERE id = ?',
+                         (rng.randint(-50, 50), rng.randint(0, 50), rng.choice(ids)))
+        else:
+            conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-06-01', ?, ?, 0)",
+                         (rng.randint(0, 99), rng.randint(0, 99)))
+    assert conn.execute('SELECT COUNT(*) FROM balance_snapshots').fetchone()[0] == 3
+    for event_id in (1, ledger.SNAPSHOT_INTERVAL, ledger.SNAPSHOT_INTERVAL + 1, ledger.latest_event_id(conn)):
+        state = rows(conn, event_id)
+        balance = ledger.balances(conn, event_id)
+        assert [balance[a] for a in ('pension', 'isa', 'general')] == [sum(r[i] for r in state) for i in (2, 3, 4)]
+    assert rows(conn) == current(conn)
+
+
+def test_undo_appends_compensating_events(conn):
+    txn = conn.execute("INSERT INTO transactions (date, pension, isa, general, memo) VALUES ('2026-01-05', 10, 0, 0, 'a')").lastrowid
+    conn.execute("UPDATE transactions SET date = '2026-02-01', pension = 20, memo = 'b' WHERE id = ?", (txn,))
+    with pytest.raises(ValueError, match='not the latest'):
+        ledger.undo(conn, 1)
+    ledger.undo(conn, 2)
+    assert current(conn) == [(txn, '2026-01-05', 10, 0, 0, 'a')]
+    conn.execute('DELETE FROM transactions WHERE id = ?', (txn,))
+    ledger.undo(conn, ledger.latest_event_id(conn))
+    assert current(conn) == [(txn, '2026-01-05', 10, 0, 0, 'a')]
+    ledger.undo(conn, ledger.latest_event_id(conn))
+    assert current(conn) == []
+    assert ledger.latest_event_id(conn) == 6
+    with pytest.raises(ValueError, match='does not exist'):
+        ledger.undo(conn, 99)
+
+
+def test_backfill_and_memo_migration(conn):
+    conn.execute("INSERT INTO transactions (date, pension, isa, general, memo) VALUES ('2026-01-05', 1, 2, 3, 'kept')")
+    conn.execute('DELETE FROM transaction_events')
+    migrations.baseline(conn.cursor())
+    migrations.event_memos(conn.cursor())
+    assert rows(conn) == current(conn) == [(1, '2026-01-05', 1, 2, 3, 'kept')]
+
+
+def test_routes(client):
+    client.post('/input', data={'date': '2026-01-05', 'pension': '10'})
+    client.post('/ledger/undo/5')
+    assert flashes(client) == ['Event 5 does not exist.']
+    assert client.get('/api/ledger/balances').get_json()['pension'] == 10 + balances.START_PENSION
+    assert client.get('/api/ledger/state?event=0').get_json()['transactions'] == []
+    client.post('/ledger/undo/1')
+    assert client.get('/api/ledger/state').get_json() == {'event_id': 2, 'transactions': []}
+
+
+def test_event_ids_outside_the_log_are_clamped(conn, client):
+    client.post('/input', data={'date': '2026-01-05', 'pension': '10'})
+    assert client.get('/ledger?event=-5').status_code == 200
+    low = client.get('/api/ledger/balances?event=-5').get_json()
+    assert (low['event_id'], low['pension']) == (0, balances.START_PENSION)
+    high = client.get('/api/ledger/balances?event=99').get_json()
+    assert (high['event_id'], high['pension']) == (1, 10 + balances.START_PENSION)
+    assert ledger.balances(conn, -5) == {'snapshot_id': 0, 'pension': 0, 'isa': 0, 'general': 0, 'event_id': 0}
@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+import limits
+import migrations
+from conftest import flashes
+
+
+def totals(conn):
+    rows = conn.execute('SELECT account, year, amount FROM contribution_totals WHERE amount != 0 ORDER BY 1, 2')
+    return [tuple(row) for row in rows]
+
+
+def recount(conn):
+    # What the counters must equal: positive deposits summed per account and year
+    return sorted((a, int(year), amount) for a in limits.ACCOUNTS for year, amount in conn.execute(
+        f'SELECT substr(date, 1, 4), SUM(max({a}, 0)) FROM transactions GROUP BY 1') if amount)
+
+
+def test_triggers_keep_counters_in_step(conn):
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-05', 100, 50, 7)")
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-03-01', -30, 20, 0)")
+    txn = conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2027-02-01', 10, 0, 0)").lastrowid
+    assert totals(conn) == recount(conn) == [('general', 2026, 7), ('isa', 2026, 70), ('pension', 2026, 100),
+                                             ('pension', 2027, 10)]
+    conn.execute("UPDATE transactions SET date = '2026-12-31', pension = 40 WHERE id = ?", (txn,))
+    assert totals(conn) == recount(conn)
+    conn.execute('DELETE FROM transactions WHERE id = 1')
+    assert totals(conn) == recount(conn) == [('isa', 2026, 20), ('pension', 2026, 40)]
+
+
+def test_backfill_counts_an_existing_ledger(conn):
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-05', 100, 50, 7)")
+    conn.execute('DELETE FROM contribution_totals')
+    migrations.baseline(conn.cursor())
+    assert totals(conn) == recount(conn)
+
+
+def test_check_contribution(conn):
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-05', 1500, 0, 0)")
+    assert limits.check_contribution(conn, 2026, {'pension': 300, 'isa': 2000}) == []
+    assert len(limits.check_contribution(conn, 2026, {'pension': 301})) == 1
+    current = conn.execute('SELECT * FROM transactions').fetchone()
+    assert limits.check_contribution(conn, 2026, {'pension': 1800}, replacing=current) == []
+    conn.execute("INSERT INTO contribution_limits (account, year, annual_limit) VALUES ('pension', 2026, 1600)")
+    assert limits.check_contribution(conn, 2026, {'pension': 200}) != []
+    assert [row['remaining'] for row in limits.headroom(conn, 2026)] == [100, 2000]
+
+
+def test_input_form_enforces_the_limit(client):
+    client.post('/input', data={'date': '2026-01-05', 'pension': '1,800'})
+    client.post('/input', data={'date': '2026-02-05', 'pension': '1'})
+    assert flashes(client) == ['PENSION deposit of 1 exceeds the 2026 limit of 1,800 (1,800 already contributed).']
+    client.post('/update_transaction/1', data={'date': '2026-01-05', 'pension': '1700', 'isa': '5'})
+    assert flashes(client) == []
+    client.post('/input', data={'date': '2026-02-05', 'pension': '100'})
+    assert flashes(client) == []
+
+
+@pytest.mark.parametrize('form', [
+    {'date': '2026-02-30', 'pension': '1'}, {'date': 'abc'}, {'date': '2026-01-01', 'pension': 'abc'},
+    {'date': '2026-01-01', 'isa': 'inf'}, {'date': '2026-01-01', 'general': 'nan'},
+])
+def test_input_form_rejects_bad_values(client, flask_app, form):
+    client.post('/input', data={'date': '2026-01-01', 'pension': '1'})
+    assert client.post('/input', data=form).status_code == 302
+    assert client.post('/update_transaction/1', data=form).status_code == 302
+    assert len(flashes(client)) == 2
+    conn = sqlite3.connect(flask_app.config['DATABASE'])
+    assert conn.execute('SELECT date, pension, isa, general FROM transactions').fetchall() == [('2026-01-01', 1, 0, 0)]
+    conn.close()
+
+
+def test_update_of_a_missing_transaction(client):
+    assert client.post('/update_transaction/42', data={'date': '2026-01-01'}).status_code == 302
+    assert flashes(client) == ['Transaction 42 does not exist.']
+
+
+def test_limits_form_overrides_the_defaults(client, flask_app):
+    client.post('/limits', data={'account': 'isa', 'year': '2026', 'annual_limit': '1500', 'tax_credit_limit': '300'})
+    conn = sqlite3.connect(flask_app.config['DATABASE'])
+    conn.row_factory = sqlite3.Row
+    assert limits.get_limits(conn, 'isa', 2026) == (1500, 300)
+    conn.close()
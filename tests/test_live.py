@@ -0,0 +1,68 @@
+import json
+import time
+
+import pytest
+
+import live
+
+STARTS = {'pension': 0, 'isa': 0, 'general': 0}
+
+
+def payload(message):
+    lines = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+    return int(lines['id']), json.loads(lines['data'])
+
+
+@pytest.fixture
+def broadcaster(conn, db_path):
+    for year in (2026, 2027, 2028):
+        conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, ?, ?, 100)', (year, year - 1976))
+    conn.commit()
+    return live.Broadcaster(db_path, STARTS, poll=0.05)
+
+
+def test_subscribers_get_a_snapshot_then_deltas(conn, broadcaster):
+    q = broadcaster.subscribe(1, False)
+    version, data = payload(q.get(timeout=5))
+    assert [row['year'] for row in data['years']] == [2026, 2027, 2028]
+
+    # A client that already has this version gets no snapshot
+    assert broadcaster.subscribe(1, False, since=version).empty()
+
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2027-05-01', 40, 0, 0)")
+    conn.commit()
+    broadcaster.notify()
+    later, data = payload(q.get(timeout=5))
+    assert later > version
+    assert [(row['year'], row['total']) for row in data['years']] == [(2027, 40), (2028, 40)]
+    assert data['removed'] == []
+
+    conn.execute('DELETE FROM plan WHERE year = 2028')
+    conn.commit()
+    broadcaster.notify()
+    assert payload(q.get(timeout=5))[1]['removed'] == [2028]
+
+
+def test_slow_clients_are_dropped(conn, broadcaster):
+    q = broadcaster.subscribe(1, False)
+    for _ in range(live.QUEUE_SIZE - 1):
+        q.put_nowait('unread')
+    conn.execute('UPDATE plan SET total = 200 WHERE year = 2026')
+    conn.commit()
+    broadcaster.notify()
+    deadline = time.monotonic() + 5
+    while broadcaster._subscribers and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert broadcaster._subscribers == {}
+    # The dropped stream is told to end (q.get raises Empty if it never is)
+    while q.get(timeout=5) is not None:
+        pass
+
+
+def test_stream_unsubscribes_on_close(broadcaster):
+    events = live.stream(broadcaster, 1, True, heartbeat=0.01)
+    assert next(events).startswith('retry: ')
+    assert next(events).startswith('event: delta')
+    assert next(events) == ': keep-alive\n\n'
+    events.close()
+    assert broadcaster._subscribers == {}
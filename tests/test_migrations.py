@@ -0,0 +1,132 @@
+import os
+import re
+import sqlite3
+
+import pytest
+
+import migrations
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def normalized(sql):
+    # Recreated objects differ from their originals only in layout and IF NOT EXISTS
+    return re.sub(r'\s+', ' ', sql.replace('IF NOT EXISTS ', '')).replace('( ', '(').replace(' )', ')').strip()
+
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted((kind, name, normalized(sql)) for kind, name, sql in
+                      conn.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' AND sql IS NOT NULL"))
+    finally:
+        conn.close()
+
+
+def load_fixture(path, version):
+    # The schema and rows a released build left behind, not a replay of today's steps
+    with open(os.path.join(FIXTURES, f'schema_v{version}.sql'), encoding='utf-8') as f:
+        script = f.read()
+    conn = sqlite3.connect(path)
+    conn.executescript(script)
+    conn.close()
+
+
+def exercise(path):
+    # Writes that fire every bookkeeping trigger on plan and transactions
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO plan (scenario_id, year, age, total, withdrawal_strategy) VALUES (1, 2031, 55, 9, 'ISA 만기')")
+    txn = conn.execute("INSERT INTO transactions (date, pension, isa, general, memo) VALUES ('2026-04-01', 5, 0, 0, 'bonus')").lastrowid
+    conn.execute('UPDATE transactions SET pension = 6 WHERE id = ?', (txn,))
+    conn.execute('DELETE FROM transactions WHERE id = ?', (txn,))
+    conn.commit()
+    conn.close()
+
+
+def test_pre_scenario_database_is_upgraded(tmp_path):
+    # The schema the app created before versioned migrations existed
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE plan (id INTEGER PRIMARY KEY AUTOINCREMENT, year INTEGER NOT NULL UNIQUE, age INTEGER NOT NULL,
+                           pension_savings INTEGER DEFAULT 0, isa_account INTEGER DEFAULT 0,
+                           general_account INTEGER DEFAULT 0, total INTEGER DEFAULT 0,
+                           health_insurance TEXT, tax TEXT, withdrawal_strategy TEXT)
+    ''')
+    conn.execute('''
+        CREATE TABLE transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL,
+                                   pension INTEGER DEFAULT 0, isa INTEGER DEFAULT 0, general INTEGER DEFAULT 0)
+    ''')
+    conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL, password TEXT NOT NULL)')
+    conn.execute("INSERT INTO plan (year, age, pension_savings, total, withdrawal_strategy) VALUES (2026, 50, 100, 100, '연금 개시')")
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-03-01', 40, 10, 0)")
+    conn.execute("INSERT INTO users (username, password) VALUES ('admin', 'hash')")
+    conn.commit()
+    conn.close()
+
+    assert migrations.migrate(path) == list(range(1, migrations.LATEST_VERSION + 1))
+    assert migrations.migrate(path) == []
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT scenario_id, year, total FROM plan').fetchall() == [(1, 2026, 100)]
+    assert conn.execute('SELECT plan_id, valid_from FROM plan_versions').fetchall() == [(1, '1970-01-01 00:00:00.000')]
+    assert conn.execute('SELECT txn_id, event_type, d_pension, memo FROM transaction_events').fetchall() == [(1, 'create', 40, None)]
+    assert sorted(conn.execute('SELECT account, amount FROM contribution_totals WHERE year = 2026')) == \
+        [('general', 0), ('isa', 10), ('pension', 40)]
+    assert conn.execute("SELECT ref_id FROM search_index WHERE kind = 'plan'").fetchall() == [(1,)]
+    assert conn.execute('SELECT username FROM users').fetchall() == [('admin',)]
+    conn.close()
+    exercise(path)
+
+
+def test_every_released_version_has_a_fixture():
+    assert sorted(os.listdir(FIXTURES)) == sorted(f'schema_v{v}.sql' for v in range(1, migrations.LATEST_VERSION + 1))
+
+
+@pytest.mark.parametrize('version', range(1, migrations.LATEST_VERSION + 1))
+def test_released_steps_still_build_the_released_schema(tmp_path, version):
+    # A step edited after release would make new installs diverge from upgraded ones
+    released, replayed = str(tmp_path / 'released.db'), str(tmp_path / 'replayed.db')
+    load_fixture(released, version)
+    conn = sqlite3.connect(replayed)
+    for step in migrations.MIGRATIONS[:version]:
+        step(conn.cursor())
+    conn.commit()
+    conn.close()
+    assert schema(replayed) == schema(released)
+
+
+@pytest.mark.parametrize('version', range(1, migrations.LATEST_VERSION + 1))
+def test_every_released_version_converges_on_the_latest_schema(tmp_path, version):
+    fresh, old = str(tmp_path / 'fresh.db'), str(tmp_path / 'old.db')
+    migrations.migrate(fresh)
+    load_fixture(old, version)
+    assert migrations.migrate(old) == list(range(version + 1, migrations.LATEST_VERSION + 1))
+    assert schema(old) == schema(fresh)
+
+    conn = sqlite3.connect(old)
+    assert conn.execute('SELECT scenario_id, year, total, withdrawal_strategy FROM plan').fetchall() == \
+        [(1, 2026, 100, '연금 개시')]
+    assert conn.execute('SELECT date, pension, isa FROM transactions').fetchall() == [('2026-03-01', 40, 10)]
+    assert conn.execute("SELECT ref_id FROM search_index WHERE kind = 'plan'").fetchall() == [(1,)]
+    assert conn.execute('SELECT txn_id, event_type, d_pension FROM transaction_events').fetchall() == [(1, 'create', 40)]
+    assert conn.execute("SELECT amount FROM contribution_totals WHERE account = 'pension' AND year = 2026").fetchone() == (40,)
+    conn.close()
+    exercise(old)
+
+
+def test_failed_step_rolls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / 'plan.db')
+
+    def broken(cursor):
+        cursor.execute('CREATE TABLE half_done (id INTEGER)')
+        raise sqlite3.OperationalError('boom')
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS + [broken])
+    monkeypatch.setattr(migrations, 'LATEST_VERSION', len(migrations.MIGRATIONS))
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.migrate(path)
+    conn = sqlite3.connect(path)
+    assert migrations.schema_version(conn) == migrations.LATEST_VERSION - 1
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    conn.close()
@@ -0,0 +1,72 @@
+import pytest
+
+import mutations
+from conftest import flashes
+
+
+@pytest.mark.parametrize('body', [
+    [1], 'abc', {'create': [1]}, {'create': 'abc'}, {'update': [None]}, {'delete': ['1']}, {'delete': [True]},
+    {'create': [{'date': '2026-13-01', 'pension': 1}]}, {'create': [{'date': 20260101}]},
+    {'create': [{'date': '2026-01-01', 'pension': 'inf'}]}, {'create': [{'date': '2026-01-01', 'memo': 5}], 'delete': [99]},
+])
+def test_transaction_batch_rejects_bad_shapes(client, body):
+    response = client.post('/api/transactions/batch', json=body)
+    assert response.status_code == 400 and 'error' in response.get_json()
+    assert client.get('/api/ledger/state').get_json()['transactions'] == []
+
+
+@pytest.mark.parametrize('body', [
+    [1], {'create': [1]}, {'create': 'abc'}, {'create': [{'year': [2026], 'age': 50}]}, {'delete': [{'id': 1}]},
+])
+def test_plan_batch_rejects_bad_shapes(client, body):
+    response = client.post('/api/plans/batch', json=body)
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_transaction_batch_stores_normalized_dates(client):
+    response = client.post('/api/transactions/batch', json={'create': [{'date': '2026-03-01T10:00', 'pension': '1,000'}]})
+    assert response.status_code == 200
+    row = response.get_json()['rows'][0]
+    assert (row['date'], row['pension']) == ('2026-03-01', 1000)
+    response = client.post('/api/transactions/batch', json={'update': [{'id': row['id'], 'date': '2026-04-02 09:00'}]})
+    assert response.get_json()['rows'][0]['date'] == '2026-04-02'
+
+
+def test_plan_batch_is_scoped_to_the_scenario(client, flask_app):
+    import sqlite3
+    conn = sqlite3.connect(flask_app.config['DATABASE'])
+    conn.execute("INSERT INTO scenarios (id, name) VALUES (2, 'Other')")
+    plan_id = conn.execute("INSERT INTO plan (scenario_id, year, age) VALUES (2, 2030, 54)").lastrowid
+    conn.commit()
+    for body in ({'update': [{'id': plan_id, 'age': 1}]}, {'delete': [plan_id]}):
+        assert client.post('/api/plans/batch', json=body).status_code == 400
+    assert conn.execute('SELECT age FROM plan WHERE id = ?', (plan_id,)).fetchone() == (54,)
+    conn.close()
+
+
+def test_batch_rolls_back_as_a_whole(client):
+    body = {'create': [{'date': '2026-01-01', 'pension': 1}, {'date': 'bad'}]}
+    assert client.post('/api/transactions/batch', json=body).status_code == 400
+    assert client.get('/api/ledger/state').get_json()['transactions'] == []
+
+
+def test_date_helpers():
+    assert mutations.parse_date('2026-01-05 10:00') == '2026-01-05'
+    for bad in ('', None, 'abc', '2026-02-30', '2026-W01-1', '20260105xx'):
+        with pytest.raises(ValueError):
+            mutations.parse_date(bad)
+
+
+def test_plan_form_edit_is_validated(client):
+    plan_id = client.post('/api/plans/batch', json={'create': [{'year': 2030, 'age': 54}]}).get_json()['rows'][0]['id']
+    form = {'year': '2030', 'age': '54', 'pension_savings': '1,000', 'isa_account': '', 'general_account': '2'}
+    for field, value, message in (('pension_savings', 'inf', "Invalid amount: 'inf'"),
+                                  ('isa_account', 'nan', "Invalid amount: 'nan'"),
+                                  ('year', '', "Plan rows need a year and an age."),
+                                  ('age', 'x', "Invalid year or age: '2030', 'x'")):
+        assert client.post(f'/update/{plan_id}', data=dict(form, **{field: value})).status_code == 302
+        assert flashes(client) == [message]
+    client.post(f'/update/{plan_id}', data=form)
+    assert flashes(client) == []
+    plan = client.get('/api/chart-data').get_json()
+    assert (plan['labels'], plan['pension'], plan['total']) == ([2030], [1000], [1002])
@@ -0,0 +1,63 @@
+import html
+
+import pytest
+
+import migrations
+import plan_history
+
+
+def edit(conn, when, sql, *params):
+    # Runs one plan statement and dates the versions it wrote at `when` instead of now
+    last = conn.execute('SELECT COALESCE(MAX(id), 0) FROM plan_versions').fetchone()[0]
+    cur = conn.execute(sql, params)
+    conn.execute('UPDATE plan_versions SET valid_from = ? WHERE id > ?', (when, last))
+    return cur.lastrowid
+
+
+def totals(conn, as_of, scenario_id=1):
+    return {row['year']: row['total'] for row in plan_history.plan_as_of(conn, scenario_id, as_of)}
+
+
+def test_triggers_record_every_edit(conn):
+    plan_id = edit(conn, '2026-01-10 09:00:00.000', 'INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 100)')
+    edit(conn, '2026-02-10 09:00:00.000', 'UPDATE plan SET total = 200 WHERE id = ?', plan_id)
+    edit(conn, '2026-03-10 09:00:00.000', 'UPDATE plan SET year = 2027 WHERE id = ?', plan_id)
+    edit(conn, '2026-04-10 09:00:00.000', 'DELETE FROM plan WHERE id = ?', plan_id)
+
+    assert totals(conn, '2026-01-09') == {}
+    assert totals(conn, '2026-01-10') == {2026: 100}
+    assert totals(conn, '2026-02-10 08:59') == {2026: 100}
+    assert totals(conn, '2026-02-10T09:00:00.000') == {2026: 200}
+    assert totals(conn, '2026-03-31') == {2027: 200}
+    assert totals(conn, '2026-04-10') == {}
+    assert [row['changes'] for row in plan_history.list_versions(conn, 1)] == [1, 2, 1, 1]
+
+    changes = plan_history.diff_plans(conn, 1, '2026-01-10', '2026-03-31')
+    assert [(c['year'], c['change']) for c in changes] == [(2026, 'removed'), (2027, 'added')]
+    changes = plan_history.diff_plans(conn, 1, '2026-01-10', '2026-02-10')
+    assert changes == [{'year': 2026, 'change': 'changed', 'fields': {'total': [100, 200]}}]
+
+
+def test_backfill_dates_existing_rows_to_the_epoch(conn):
+    conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2030, 54, 7)')
+    conn.execute('DELETE FROM plan_versions')
+    migrations.baseline(conn.cursor())
+    assert totals(conn, '1970-01-01') == {2030: 7}
+
+
+def test_api_requires_a_date(client):
+    assert client.get('/api/plan/as-of').status_code == 400
+    assert client.get('/api/plan/diff').status_code == 400
+    assert client.get('/api/plan/as-of?date=2026-01-01').get_json() == []
+
+
+@pytest.mark.parametrize('value', ['yesterday', '2026-02-30', '2026-01-01 25:00', "2026-01-01' OR 1=1"])
+def test_malformed_dates_are_rejected(client, value):
+    with pytest.raises(ValueError):
+        plan_history.normalize_as_of(value)
+    response = client.get('/api/plan/as-of', query_string={'date': value})
+    assert response.status_code == 400 and response.get_json()['error'] == f"Invalid date: {value!r}"
+    assert client.get('/api/plan/diff', query_string={'from': value}).status_code == 400
+    page = client.get('/manage', query_string={'as_of': value})
+    assert page.status_code == 200
+    assert f"Invalid date: {value!r}; use YYYY-MM-DD or YYYY-MM-DD HH:MM[:SS]." in html.unescape(page.get_data(as_text=True))
@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+import plan_import
+from conftest import flashes
+
+CSV = '''year,age,pension,isa,general,total,strategy
+2026,50,100,200,300,600,연금 납입
+2027,51,"1,100",200,300,1600,ISA 만기
+'''
+
+
+def plans(conn):
+    return [tuple(r) for r in conn.execute('SELECT year, age, total, withdrawal_strategy FROM plan ORDER BY year')]
+
+
+def test_import_replaces_plan(conn):
+    conn.execute("INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2030, 54, 1)")
+    conn.commit()
+    result = plan_import.import_plan(conn, CSV.encode())
+    assert result == {'rows': 2, 'changed': 2, 'deleted': 1}
+    assert plans(conn) == [(2026, 50, 600, '연금 납입'), (2027, 51, 1600, 'ISA 만기')]
+    # Unchanged rows are left alone
+    assert plan_import.import_plan(conn, CSV.encode())['changed'] == 0
+
+
+def test_cp949_and_default_layout(conn):
+    data = '2026(50),1,2,3,6,,,연금\n2027(51),1,2,3,6,,,ISA\n'.encode('cp949')
+    plan_import.import_plan(conn, data)
+    assert plans(conn) == [(2026, 50, 6, '연금'), (2027, 51, 6, 'ISA')]
+
+
+@pytest.mark.parametrize('data, error', [
+    ('year,total\n2026,5\n', 'Line 2: missing age'),
+    ('year,age,pension\n2026,50,1.5\n', "Line 2: pension_savings is not a whole number: '1.5'"),
+    ('year,age,pension,total\n2026,50,1,2\n', 'Line 2: total 2 is not pension + ISA + general (1)'),
+    ('year,age\n2026,50\n2026,50\n', 'Line 3: year 2026 appears more than once (first on line 2)'),
+    ('year,age\n2026,50\n2028,52\n', 'Line 3: years jump from 2026 to 2028'),
+    ('year,age\n', 'The file has no plan rows.'),
+])
+def test_invalid_files_change_nothing(conn, data, error):
+    plan_import.import_plan(conn, CSV.encode())
+    with pytest.raises(plan_import.InvalidPlan) as raised:
+        plan_import.import_plan(conn, data.encode())
+    assert error in raised.value.errors
+    assert len(plans(conn)) == 2
+
+
+def test_unreadable_files():
+    with pytest.raises(plan_import.InvalidPlan):
+        plan_import.read_table(b'\xff\xfe\x00\x81\x00')
+
+
+def test_upload_reports_errors(client):
+    client.post('/plans/import', data={'file': (io.BytesIO(b'year,pension\n2026,5\n'), 'plan.csv')},
+                content_type='multipart/form-data')
+    assert flashes(client) == ['Line 2: missing age']
@@ -0,0 +1,127 @@
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+from flask import session
+
+import goal_curve
+import replication
+
+
+def dump(conn):
+    return [tuple(r) for r in conn.execute('SELECT * FROM transactions ORDER BY id')] + \
+        [tuple(r) for r in conn.execute('SELECT * FROM data_version')]
+
+
+def add(conn, n, pension=1):
+    conn.executemany("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-01', ?, 0, 0)",
+                     [(pension,)] * n)
+    conn.commit()
+
+
+@pytest.fixture
+def shipper(db_path, tmp_path):
+    shipper = replication.Shipper(db_path, [str(tmp_path / 'r1'), str(tmp_path / 'r2')])
+    yield shipper
+    shipper.close()
+
+
+def replica_dump(shipper, index=0):
+    conn = replication.connect_replica(shipper.replicas[index].path)
+    try:
+        return dump(conn)
+    finally:
+        conn.close()
+
+
+def test_frames_follow_the_primary(conn, shipper):
+    add(conn, 3)
+    shipper.ship_once()
+    assert [s['snapshots'] for s in shipper.stats.values()] == [1, 1]
+    assert replica_dump(shipper) == replica_dump(shipper, 1) == dump(conn)
+
+    # An open reader keeps working across in-place page updates
+    reader = replication.connect_replica(shipper.replicas[0].path)
+    add(conn, 500, pension=2)
+    conn.execute('UPDATE transactions SET general = 9 WHERE id = 1')
+    conn.commit()
+    shipper.ship_once()
+    assert [s['snapshots'] for s in shipper.stats.values()] == [1, 1]
+    assert shipper.stats[shipper.replicas[0].directory]['frames'] > 0
+    assert dump(reader) == dump(conn)
+    reader.close()
+
+    # Goal views only read, so a read-only replica serves them whether or not the curve was stored
+    conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 1200)')
+    conn.commit()
+    shipper.ship_once()
+    ro = replication.connect_replica(shipper.replicas[0].path)
+    assert goal_curve.target_at(ro, 1, date(2026, 1, 31), 0) == pytest.approx(100)
+    ro.close()
+
+
+def test_wal_restart_after_checkpoint(conn, shipper, monkeypatch):
+    monkeypatch.setattr(replication, 'CHECKPOINT_FRAMES', 1)
+    add(conn, 5)
+    shipper.ship_once()
+    add(conn, 5)
+    shipper.ship_once()  # ships, then checkpoints: the next writer restarts the WAL
+    add(conn, 5, pension=3)
+    shipper.ship_once()
+    assert replica_dump(shipper) == dump(conn)
+    assert sum(s['snapshots'] for s in shipper.stats.values()) == 2
+
+
+def test_lost_replica_is_recopied(conn, shipper):
+    add(conn, 2)
+    shipper.ship_once()
+    os.remove(shipper.replicas[1].path)
+    add(conn, 2)
+    shipper.ship_once()
+    assert replica_dump(shipper, 1) == dump(conn)
+    assert shipper.stats[shipper.replicas[1].directory]['snapshots'] == 2
+
+
+def test_nearest_and_status(conn, shipper, tmp_path):
+    dirs = [r.directory for r in shipper.replicas]
+    assert replication.nearest(dirs) is None
+    shipper.ship_once()
+    synced = replication.read_meta(dirs[0])['synced_at']
+    assert replication.nearest(dirs, now=synced + 1) == shipper.replicas[0].path
+    assert replication.nearest(dirs, now=synced + replication.MAX_STALENESS + 1) is None
+
+    add(conn, 1)
+    data = replication.status(conn, dirs + [str(tmp_path / 'never')], shipper=shipper)
+    assert [r['version_lag'] for r in data['replicas'][:2]] == [1, 1]
+    assert data['replicas'][2] == {'directory': str(tmp_path / 'never'), 'synced': False}
+    assert replication.replica_dirs(' a, ,b ') == ['a', 'b']
+
+
+def test_replicas_are_read_only(conn, shipper):
+    shipper.ship_once()
+    ro = replication.connect_replica(shipper.replicas[0].path)
+    with pytest.raises(sqlite3.OperationalError):
+        ro.execute("INSERT INTO transactions (date) VALUES ('2026-01-01')")
+    ro.close()
+
+
+def test_gets_read_the_replica_until_the_session_writes(tmp_path, monkeypatch):
+    monkeypatch.setenv('FLASK_SECRET_KEY', 'test')
+    monkeypatch.setenv('ALERT_DISPATCHER', 'off')
+    monkeypatch.setenv('REPLICAS', str(tmp_path / 'r1'))
+    monkeypatch.setenv('REPLICA_SHIPPER', 'off')
+    monkeypatch.chdir(tmp_path)
+    import app
+    flask_app = app.create_app(str(tmp_path / 'app.db'))
+    shipper = replication.Shipper(flask_app.config['DATABASE'], flask_app.config['REPLICAS'])
+    with flask_app.test_request_context('/'):
+        assert app.read_replica() is None
+        shipper.ship_once()
+        assert app.read_replica() == shipper.replicas[0].path
+    with flask_app.test_request_context('/', method='POST'):
+        assert app.read_replica() is None
+    with flask_app.test_request_context('/'):
+        session['primary_until'] = float('inf')
+        assert app.read_replica() is None
+    shipper.close()
@@ -0,0 +1,92 @@
+import csv
+import hashlib
+import sqlite3
+from datetime import date
+
+import pytest
+
+import balances
+import holdings
+import migrations
+import report
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def task(db, out, name='home', formats=('html', 'csv')):
+    return next(report.tasks([str(db)], str(out), formats, balances.start_balances(), date(2027, 6, 15))) | {'name': name}
+
+
+@pytest.fixture(autouse=True)
+def worker(tmp_path):
+    report._init_worker(str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def household(db_path):
+    conn = sqlite3.connect(db_path)
+    for year in range(2026, 2030):
+        conn.execute('INSERT INTO plan (scenario_id, year, age, pension_savings, total) VALUES (1, ?, ?, ?, ?)',
+                     (year, year - 1976, 1000 * (year - 2025), 1000 * (year - 2025)))
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-05-01', 300, 0, 0)")
+    conn.commit()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    return db_path
+
+
+def test_render_leaves_the_database_untouched(household, tmp_path):
+    before = digest(household)
+    entry = report.render(task(household, tmp_path))
+    assert entry['status'] == 'ok', entry.get('error')
+    assert entry['final_year'] == 2029 and entry['target'] > 0
+    assert digest(household) == before
+    with open(entry['csv'], encoding='utf-8') as f:
+        assert [row['year'] for row in csv.DictReader(f)] == ['2026', '2027', '2028', '2029']
+    with open(entry['html'], encoding='utf-8') as f:
+        assert 'home' in f.read()
+
+
+def test_unmigrated_database_is_an_error_row(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    migrations.MIGRATIONS[0](conn.cursor())
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+    before = digest(path)
+    entry = report.render(task(path, tmp_path))
+    assert entry['status'] == 'error' and 'Schema version 1' in entry['error']
+    assert digest(path) == before
+
+
+def test_unexpected_failure_is_an_error_row(household, tmp_path, monkeypatch):
+    def broken(*args):
+        raise KeyError('total')
+
+    monkeypatch.setattr(report, 'collect', broken)
+    entry = report.render(task(household, tmp_path))
+    assert (entry['status'], entry['error']) == ('error', "'total'")
+
+
+def test_run_keeps_going_past_bad_households(household, tmp_path):
+    bogus = tmp_path / 'bogus.db'
+    bogus.write_bytes(b'not a database')
+    out = tmp_path / 'out'
+    tasks = [task(household, out, 'good', ('csv',)), task(bogus, out, 'bogus', ('csv',))]
+    ok, failed = report.run(tasks, str(out), workers=1, cache_dir=str(tmp_path / 'cache'), progress=lambda line: None)
+    assert (ok, failed) == (1, 1)
+    with open(out / 'index.csv', encoding='utf-8') as f:
+        assert sorted((row['name'], row['status']) for row in csv.DictReader(f)) == [('bogus', 'error'), ('good', 'ok')]
+
+
+def test_collect_marks_holdings_to_market_as_of(conn):
+    conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, 2026, 50, 100)')
+    holdings.set_holding(conn, 'pension', 'AAA', '2026-01-02', 10)
+    holdings.ingest_prices(conn, [('AAA', '2026-06-01', 10000), ('AAA', '2026-09-01', 40000)])
+    starts = {'pension': 0, 'isa': 0, 'general': 0}
+    assert report.collect(conn, 1, starts, date(2026, 6, 15))['current']['market_total'] == 10
+    assert report.collect(conn, 1, starts, date(2026, 12, 31))['current']['market_total'] == 40
@@ -0,0 +1,112 @@
+# The SQLite and memory backends must answer every call the same way
+import pytest
+
+import repository
+
+
+def plan(year, pension=0, isa=0, general=0, strategy=None):
+    return {'year': year, 'age': year - 1976, 'pension_savings': pension, 'isa_account': isa,
+            'general_account': general, 'total': pension + isa + general, 'withdrawal_strategy': strategy}
+
+
+def plain(rows, drop=()):
+    return [{k: v for k, v in dict(row).items() if k not in drop} for row in rows]
+
+
+@pytest.fixture
+def stores(conn):
+    return repository.SqliteStore(conn), repository.MemoryStore()
+
+
+def both(stores, call):
+    results = [call(store) for store in stores]
+    assert results[0] == results[1]
+    return results[0]
+
+
+def test_plans_upsert_update_delete(stores):
+    for store in stores:
+        for year in (2028, 2026, 2027):
+            store.plans.upsert(1, plan(year, pension=year))
+        store.plans.upsert(2, plan(2026, isa=5))
+    both(stores, lambda s: plain(s.plans.list(1)))
+    both(stores, lambda s: plain(s.plans.list(2)))
+
+    # Upserting a planned year changes that row in place
+    ids = both(stores, lambda s: s.plans.upsert(1, plan(2027, general=7, strategy='ISA 만기')))
+    assert both(stores, lambda s: dict(s.plans.get(ids))['general_account']) == 7
+    assert len(both(stores, lambda s: plain(s.plans.list(1)))) == 3
+
+    both(stores, lambda s: s.plans.update(ids, plan(2030, general=8)))
+    assert both(stores, lambda s: [p['year'] for p in s.plans.list(1)]) == [2026, 2028, 2030]
+    both(stores, lambda s: s.plans.delete(ids))
+    assert both(stores, lambda s: s.plans.get(ids)) is None
+    both(stores, lambda s: plain(s.plans.list(1)))
+
+
+def test_plans_duplicate_year(stores):
+    for store in stores:
+        store.plans.upsert(1, plan(2026))
+        plan_id = store.plans.upsert(1, plan(2027))
+        with pytest.raises(repository.DuplicateKey):
+            store.plans.update(plan_id, plan(2026))
+    both(stores, lambda s: plain(s.plans.list(1)))
+
+
+def test_transactions(stores):
+    for store in stores:
+        store.transactions.add('2026-03-01', 10, 20, 30, 'first')
+        store.transactions.add('2027-01-15', 1, 2, 3)
+        store.transactions.add('2026-11-30', 5, 0, 0)
+    both(stores, lambda s: plain(s.transactions.list()))
+    both(stores, lambda s: s.transactions.yearly_deposits(2026))
+
+    both(stores, lambda s: s.transactions.update(2, '2026-12-31', 4, 4, 4, 'moved'))
+    both(stores, lambda s: s.transactions.delete(1))
+    assert both(stores, lambda s: s.transactions.get(1)) is None
+    both(stores, lambda s: dict(s.transactions.get(2)))
+    assert both(stores, lambda s: s.transactions.yearly_deposits(2026)) == [(2026, 9, 4, 4)]
+
+
+def test_users(stores):
+    for store in stores:
+        store.users.add('admin', 'hash')
+        with pytest.raises(repository.DuplicateKey):
+            store.users.add('admin', 'other')
+    both(stores, lambda s: dict(s.users.by_username('admin')))
+    assert both(stores, lambda s: s.users.by_username('nobody')) is None
+    both(stores, lambda s: s.users.delete(1))
+    both(stores, lambda s: plain(s.users.list()))
+
+
+def test_memory_load_matches_database(conn):
+    store = repository.SqliteStore(conn)
+    store.plans.upsert(1, plan(2026, pension=3))
+    store.plans.upsert(1, plan(2027, isa=4))
+    store.transactions.add('2026-05-05', 1, 2, 3, 'memo')
+    store.plans.delete(store.plans.upsert(1, plan(2030)))  # leaves a gap in the ids
+    doomed = store.transactions.add('2026-06-06', 1, 1, 1)
+    store.transactions.delete(doomed)
+    kept = store.transactions.add('2026-07-07', 4, 5, 6)
+    store.commit()
+    loaded = repository.MemoryStore.load(conn)
+    assert plain(loaded.plans.list(1)) == plain(store.plans.list(1))
+    assert plain(loaded.transactions.list()) == plain(store.transactions.list())
+    assert loaded.transactions.get(kept)['pension'] == 4
+    assert loaded.transactions.add('2026-08-08', 0, 0, 0) > kept
+
+
+def test_sqlite_upsert_keeps_derived_rows(conn):
+    # Upserting over a year must go through the update triggers: no search entry or
+    # open history version may outlive the plan row it describes
+    plans = repository.SqlitePlans(conn)
+    plans.upsert(1, plan(2026, strategy='연금 개시'))
+    plan_id = plans.upsert(1, plan(2026, strategy='ISA 만기'))
+    conn.commit()
+    entries = conn.execute("SELECT ref_id, body FROM search_index WHERE kind = 'plan'").fetchall()
+    assert [tuple(row) for row in entries] == [(plan_id, 'ISA 만기')]
+    live = conn.execute('''
+        SELECT plan_id FROM plan_versions AS v
+        WHERE id = (SELECT MAX(id) FROM plan_versions WHERE plan_id = v.plan_id) AND deleted = 0
+    ''').fetchall()
+    assert [row[0] for row in live] == [plan_id]
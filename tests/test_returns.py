@@ -0,0 +1,41 @@
+import pytest
+
+import returns
+from conftest import flashes
+
+
+def test_set_valuation_normalizes_and_rejects_dates(conn):
+    returns.set_valuation(conn, 'isa', ' 2026-12-31', 100)
+    returns.set_valuation(conn, 'isa', '2026-12-31', 120)  # one value per account and day
+    with pytest.raises(ValueError):
+        returns.set_valuation(conn, 'isa', 'yesterday', 100)
+    assert [tuple(r) for r in conn.execute('SELECT account, date, market_value FROM valuations')] == \
+        [('isa', '2026-12-31', 120)]
+
+
+def test_solve_irr():
+    # 100 in, 110 out a year later: 10%; two rows solved together
+    rates = returns.solve_irr([[-100, 110], [-100, 121]], [[0, 1], [0, 2]])
+    assert rates == pytest.approx([0.10, 0.10])
+
+
+def test_valuation_form_validates(client):
+    client.post('/returns', data={'account': 'isa', 'date': 'yesterday', 'market_value': '100'})
+    assert flashes(client) == ["Invalid date: 'yesterday'"]
+    for value in ('abc', 'inf'):
+        client.post('/returns', data={'account': 'isa', 'date': '2026-06-30', 'market_value': value})
+        assert flashes(client) == [f"Invalid market value: {value!r}"]
+    client.post('/returns', data={'account': 'isa', 'date': '2026-06-30', 'market_value': '1,000'})
+    assert flashes(client) == []
+    assert client.get('/returns').status_code == 200
+    assert client.get('/api/returns').status_code == 200
+
+
+def test_legacy_free_form_dates_are_skipped(client, conn):
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-01', 0, 100, 0), ('2026년 3월', 0, 50, 0)")
+    conn.execute("INSERT INTO valuations (account, date, market_value) VALUES ('isa', '2026-12-31', 110), ('isa', '2026.06.30', 999)")
+    conn.commit()
+    isa = [r for r in returns.account_returns(conn, {'pension': 0, 'isa': 0, 'general': 0}) if r['account'] == 'isa']
+    assert isa and all(r['end_value'] == 110 for r in isa)
+    assert client.get('/returns').status_code == 200
+    assert client.get('/api/returns').status_code == 200
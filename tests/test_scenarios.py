@@ -0,0 +1,56 @@
+import scenarios
+from conftest import flashes
+
+
+def add_plans(conn, scenario_id, totals):
+    for year, total in totals.items():
+        conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (?, ?, ?, ?)',
+                     (scenario_id, year, year - 1976, total))
+
+
+def test_clone_copies_every_year(conn):
+    add_plans(conn, 1, {2026: 100, 2027: 200})
+    new_id = scenarios.clone_scenario(conn, 1, 'Early retirement')
+    conn.execute('UPDATE plan SET total = 999 WHERE scenario_id = ? AND year = 2027', (new_id,))
+    rows = {row['name']: row['years'] for row in scenarios.list_scenarios(conn)}
+    assert rows['Early retirement'] == 2
+    assert conn.execute('SELECT total FROM plan WHERE scenario_id = 1 AND year = 2027').fetchone()[0] == 200
+
+    scenarios.delete_scenario(conn, new_id)
+    assert conn.execute('SELECT COUNT(*) FROM plan WHERE scenario_id = ?', (new_id,)).fetchone()[0] == 0
+
+
+def test_compare_matches_a_per_scenario_loop(conn):
+    other = conn.execute("INSERT INTO scenarios (name) VALUES ('Other')").lastrowid
+    add_plans(conn, 1, {2026: 1000, 2028: 3000})
+    add_plans(conn, other, {2027: 500, 2029: 0})
+    for day, amount in (('2026-02-01', 300), ('2027-07-01', 200), ('2029-01-01', 50)):
+        conn.execute('INSERT INTO transactions (date, pension, isa, general) VALUES (?, ?, 0, 0)', (day, amount))
+
+    data = scenarios.compare_scenarios(conn, [other, 1], 10)
+    assert data['years'] == [2026, 2027, 2028, 2029]
+    assert data['actual'] == [310, 510, 510, 560]
+    assert [s['id'] for s in data['scenarios']] == [other, 1]
+    for scenario in data['scenarios']:
+        goals = dict(conn.execute('SELECT year, total FROM plan WHERE scenario_id = ?', (scenario['id'],)).fetchall())
+        for i, year in enumerate(data['years']):
+            goal = goals.get(year, 0)
+            assert scenario['goal'][i] == goal
+            assert scenario['gap'][i] == data['actual'][i] - goal
+            assert scenario['gap_pct'][i] == (round(data['actual'][i] / goal * 100, 1) if goal else 0.0)
+
+
+def test_routes(client):
+    client.post('/scenarios/clone', data={'name': 'Copy'})
+    client.post('/scenarios/clone', data={'name': 'Copy'})
+    assert flashes(client) == ['Scenario Copy already exists.']
+    compared = client.get('/api/scenarios/compare').get_json()
+    assert [s['name'] for s in compared['scenarios']] == ['Base', 'Copy']
+
+    copy_id = compared['scenarios'][1]['id']
+    client.post(f'/scenarios/select/{copy_id}')
+    client.post(f'/scenarios/delete/{copy_id}')
+    with client.session_transaction() as session:
+        assert 'scenario_id' not in session
+    client.post('/scenarios/delete/1')
+    assert flashes(client) == ['Cannot delete the base scenario.']
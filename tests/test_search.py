@@ -0,0 +1,50 @@
+import search
+
+
+def entries(conn):
+    return sorted(tuple(r) for r in conn.execute('SELECT kind, ref_id, title, body FROM search_index'))
+
+
+def test_triggers_keep_the_index_current(conn):
+    plan_id = conn.execute("INSERT INTO plan (scenario_id, year, age, withdrawal_strategy) VALUES (1, 2030, 54, '연금 개시')").lastrowid
+    txn = conn.execute("INSERT INTO transactions (date, pension, isa, general, memo) VALUES ('2026-01-05', 1, 0, 0, '상여금 입금')").lastrowid
+    conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-01-06', 1, 0, 0)")
+    assert entries(conn) == [('plan', plan_id, '2030 (54)', '연금 개시'), ('transaction', txn, '2026-01-05', '상여금 입금')]
+
+    conn.execute("UPDATE plan SET year = 2031, withdrawal_strategy = 'ISA 만기' WHERE id = ?", (plan_id,))
+    conn.execute("UPDATE transactions SET memo = '' WHERE id = ?", (txn,))
+    assert entries(conn) == [('plan', plan_id, '2031 (54)', 'ISA 만기')]
+    conn.execute("UPDATE transactions SET memo = 'bonus' WHERE id = ?", (txn,))
+    conn.execute('DELETE FROM plan WHERE id = ?', (plan_id,))
+    assert entries(conn) == [('transaction', txn, '2026-01-05', 'bonus')]
+    conn.execute('DELETE FROM transactions WHERE id = ?', (txn,))
+    assert entries(conn) == []
+
+
+def test_short_and_long_terms(conn):
+    other = conn.execute("INSERT INTO scenarios (name) VALUES ('Other')").lastrowid
+    conn.execute("INSERT INTO plan (scenario_id, year, age, withdrawal_strategy) VALUES (1, 2030, 54, '연금 개시 후 ISA 만기')")
+    conn.execute("INSERT INTO plan (scenario_id, year, age, withdrawal_strategy) VALUES (?, 2030, 54, '연금 조기 개시')", (other,))
+    conn.execute("INSERT INTO transactions (date, pension, isa, general, memo) VALUES ('2026-01-05', 1, 0, 0, '연금 100% 납입')")
+
+    assert [r['kind'] for r in search.search(conn, '연금', scenario_id=1)] == ['plan', 'transaction']
+    assert len(search.search(conn, '연금')) == 3
+    assert [r['kind'] for r in search.search(conn, '연금', kind='plan')] == ['plan', 'plan']
+    assert [r['title'] for r in search.search(conn, 'ISA 만기', scenario_id=1)] == ['2030 (54)']
+    assert [r['kind'] for r in search.search(conn, '100%')] == ['transaction']
+    assert [r['kind'] for r in search.search(conn, '%')] == ['transaction']
+    assert search.search(conn, '_') == []
+    assert search.search(conn, '   ') == []
+    assert str(search.search(conn, '만기')[0]['snippet']) == '연금 개시 후 ISA <mark>만기</mark>'
+
+
+def test_snippets_are_escaped(conn):
+    conn.execute("INSERT INTO transactions (date, pension, isa, general, memo) VALUES ('2026-01-05', 1, 0, 0, '<script>alert(1)</script>')")
+    snippet = str(search.search(conn, 'script')[0]['snippet'])
+    assert '<script>' not in snippet and '<mark>script</mark>' in snippet
+
+
+def test_routes(client):
+    client.post('/input', data={'date': '2026-01-05', 'pension': '1', 'memo': 'bonus pay'})
+    assert [r['title'] for r in client.get('/api/search?q=bonus&limit=-1').get_json()] == ['2026-01-05']
+    assert b'<mark>bonus</mark>' in client.get('/search?q=bonus').data
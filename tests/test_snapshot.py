@@ -0,0 +1,70 @@
+from datetime import date
+
+import archive
+import jobs
+import snapshot
+import summary
+
+
+def fill(conn):
+    other = conn.execute("INSERT INTO scenarios (name) VALUES ('Other')").lastrowid
+    for scenario_id in (other, 1):
+        for year in (2027, 2026, 2029):
+            conn.execute('INSERT INTO plan (scenario_id, year, age, pension_savings, total) VALUES (?, ?, ?, ?, ?)',
+                         (scenario_id, year, year - 1976, scenario_id * year, scenario_id * year))
+    for day, pension, isa in (('2025-12-31', 5, 0), ('2026-01-01', 1, 2), ('2026-12-31', 3, 0),
+                              ('2028-06-01', 4, 4), ('2027-02-02', -1, 0)):
+        conn.execute('INSERT INTO transactions (date, pension, isa, general) VALUES (?, ?, ?, 0)', (day, pension, isa))
+    conn.commit()
+    return other
+
+
+def test_snapshot_matches_the_database(conn, db_path, tmp_path):
+    other = fill(conn)
+    archive.close(conn, 2026, today=date(2028, 12, 1))
+    conn.commit()
+    snap = snapshot.current(db_path, str(tmp_path / 'snaps'))
+    assert snap.yearly_deposits() == [tuple(r) for r in archive.yearly_deposits(conn, 2026)]
+    for scenario_id in (1, other, 99):
+        rows = conn.execute('SELECT year, pension_savings, isa_account, general_account, total FROM plan '
+                            'WHERE scenario_id = ? ORDER BY year', (scenario_id,)).fetchall()
+        assert snap.plans(scenario_id) == [dict(r) for r in rows]
+
+    days, amounts = snap.transactions(2026)
+    assert days.astype('datetime64[D]').astype(str).tolist() == ['2026-01-01', '2026-12-31']
+    assert amounts[:, 0].tolist() == [1, 3]
+    assert snap.transactions(2025)[1].tolist() == [[5, 0, 0]]
+    assert len(snap.transactions(2031)[0]) == 0
+    assert len(snap.transactions()[0]) == 5
+
+
+def test_new_versions_are_exported_and_old_ones_pruned(conn, db_path, tmp_path):
+    directory = str(tmp_path / 'snaps')
+    first = snapshot.current(db_path, directory)
+    assert snapshot.current(db_path, directory) is first
+    for _ in range(3):
+        conn.execute("INSERT INTO transactions (date, pension, isa, general) VALUES ('2026-05-05', 1, 0, 0)")
+        conn.commit()
+        latest = snapshot.current(db_path, directory)
+    assert latest.version == first.version + 3 and latest.meta['transactions'] == 3
+    assert [v for v, _ in snapshot.versions(db_path, directory)] == [latest.version - 1, latest.version]
+    assert first.txn_day.shape == (0,)  # a mapping of a removed version stays readable
+
+
+class Progress:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def progress(self, fraction, message=None):
+        pass
+
+
+def test_projection_job_reads_the_snapshot(conn, db_path):
+    fill(conn)
+    starts = {'pension': 10, 'isa': 0, 'general': 0}
+    params = {'scenario_id': 1, 'starts': starts, 'from_year': 2026, 'paths': 500, 'seed': 3}
+    result = jobs.run_projection(conn, params, Progress(db_path))
+    columns = summary.scenario_summary(conn, 1, starts)
+    assert result['start_total'] == columns['total'][columns['year'] == 2026][0]
+    assert result['years'] == [2027, 2028, 2029] and result['goal'] == [2027, 0, 2029]
+    assert jobs.run_projection(conn, params, Progress(db_path)) == result
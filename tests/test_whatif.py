@@ -0,0 +1,61 @@
+import pytest
+
+import summary
+import whatif
+
+
+@pytest.fixture
+def planned(client):
+    plans = [{'year': year, 'age': year - 1976, 'pension_savings': 1000} for year in range(2026, 2031)]
+    assert client.post('/api/plans/batch', json={'create': plans}).status_code == 200
+    return client
+
+
+@pytest.mark.parametrize('body', [
+    [1], 'abc', 5, {'date': 20260101, 'pension': 1}, {'date': '2026-01-01', 'pension': 'inf'},
+    {'date': '2026-01-01', 'pension': 10 ** 12}, {'date': '2026-01-01'}, {'date': '2040-01-01', 'isa': 1},
+    {'date': '2026-01-01', 'isa': 1, 'memo': 'x' * (whatif.MAX_MEMO + 1)},
+])
+def test_add_rejects_bad_json(planned, body):
+    response = planned.post('/what-if', json=body)
+    assert response.status_code == 400 and 'error' in response.get_json()
+    assert planned.get('/api/what-if').get_json()['entries'] == []
+
+
+def test_add_from_json_and_form(planned):
+    response = planned.post('/what-if', json={'date': '2028-06-01', 'isa': '1,000', 'memo': ' bonus '})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['entries'] == [{'date': '2028-06-01', 'pension': 0, 'isa': 1000, 'general': 0, 'memo': 'bonus'}]
+    assert [row['year'] for row in data['summary']] == [2028, 2029, 2030]
+
+    assert planned.post('/what-if', data={'date': '2027-01-01', 'general': '5'}).status_code == 302
+    assert [e['date'] for e in planned.get('/api/what-if').get_json()['entries']] == ['2027-01-01', '2028-06-01']
+
+
+def test_session_size_is_capped():
+    entry = {'date': '2026-01-01', 'pension': 1, 'isa': 0, 'general': 0, 'memo': 'x' * whatif.MAX_MEMO}
+    entries = []
+    with pytest.raises(ValueError, match='session'):
+        for _ in range(whatif.MAX_ENTRIES):
+            entries = whatif.add(entries, entry, [2026, 2030])
+
+
+def test_apply_matches_real_entries(conn):
+    # The overlay must give the same summary as writing the entries to the ledger
+    import app
+    for year in range(2026, 2031):
+        conn.execute('INSERT INTO plan (scenario_id, year, age, total) VALUES (1, ?, ?, ?)', (year, year - 1976, 5000))
+    conn.commit()
+    starts = app.start_balances()
+    entries = [whatif.make_entry({'date': '2027-03-01', 'pension': 300, 'general': -50}),
+               whatif.make_entry({'date': '2029-12-31', 'isa': 700})]
+    overlay = whatif.apply(summary.scenario_summary(conn, 1, starts), entries)
+
+    for entry in entries:
+        conn.execute('INSERT INTO transactions (date, pension, isa, general) VALUES (?, ?, ?, ?)',
+                     (entry['date'], entry['pension'], entry['isa'], entry['general']))
+    conn.commit()
+    real = summary.scenario_summary(conn, 1, starts)
+    for key, values in overlay.items():
+        assert list(values) == list(real[key]), key
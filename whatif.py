@@ -0,0 +1,97 @@
+# Session-scoped what-if overlay: hypothetical deposits/transfers that are never written
+# to the ledger. They are folded into the cached yearly summary as per-year deltas, so
+# only the years from the earliest hypothetical entry onward are recomputed, and the
+# real tables (and with them the data version and every cache) are left alone.
+import json
+
+import lazy
+import mutations
+
+np = lazy.module('numpy')
+
+ACCOUNTS = ('pension', 'isa', 'general')
+INPUT_COLUMNS = {'pension': 'input_p', 'isa': 'input_i', 'general': 'input_g'}
+# Entries live in the session cookie, which browsers (and Werkzeug) cap at ~4 KB
+MAX_ENTRIES = 25
+MAX_MEMO = 100
+MAX_AMOUNT = 10 ** 12  # keeps every running sum inside int64
+MAX_SERIALIZED = 2048  # bytes of JSON, leaving room for signing, base64 and the rest of the session
+
+
+def make_entry(form):
+    # {date, pension, isa, general, memo} from a form or JSON body; raises ValueError
+    day = mutations.parse_date(str(form.get('date') or '').strip())
+    amounts = {a: mutations.clean_currency(form.get(a)) for a in ACCOUNTS}
+    if any(abs(v) >= MAX_AMOUNT for v in amounts.values()):
+        raise ValueError("Amount is too large.")
+    if not any(amounts.values()):
+        raise ValueError("Enter an amount for at least one account.")
+    memo = mutations.clean_memo(form.get('memo'))
+    if memo and len(memo) > MAX_MEMO:
+        raise ValueError(f"Memos are limited to {MAX_MEMO} characters.")
+    return {'date': day, **amounts, 'memo': memo}
+
+
+def add(entries, entry, years):
+    # New entry list (the session value is replaced, not mutated); `years` is the summary range
+    if len(entries) >= MAX_ENTRIES:
+        raise ValueError(f"At most {MAX_ENTRIES} what-if entries at a time.")
+    year = int(entry['date'][:4])
+    if not years[0] <= year <= years[-1]:
+        raise ValueError(f"{year} is outside the plan ({years[0]}-{years[-1]}).")
+    entries = sorted(entries + [entry], key=lambda e: e['date'])
+    # Same compact, ASCII-escaped JSON the session serializer writes
+    if len(json.dumps(entries, separators=(',', ':'))) > MAX_SERIALIZED:
+        raise ValueError("Too many what-if entries to keep in the session; remove some first.")
+    return entries
+
+
+def yearly_deltas(entries):
+    # {year: [pension, isa, general]}
+    deltas = {}
+    for entry in entries:
+        sums = deltas.setdefault(int(entry['date'][:4]), [0, 0, 0])
+        for i, account in enumerate(ACCOUNTS):
+            sums[i] += entry[account]
+    return deltas
+
+
+def first_year(entries):
+    return min(int(e['date'][:4]) for e in entries) if entries else None
+
+
+def apply(columns, entries):
+    # Copy of summary columns with the entries applied. Years before the earliest entry
+    # share the cached arrays' values; from there on inputs, balances and gaps are
+    # recomputed from the deltas. The cached columns are never modified.
+    years = columns['year']
+    deltas = {y: sums for y, sums in yearly_deltas(entries).items() if years[0] <= y <= years[-1]}
+    if not deltas:
+        return columns
+    start = int(min(deltas) - years[0])
+
+    delta = np.zeros((len(years) - start, len(ACCOUNTS)), dtype=np.int64)
+    for year, sums in deltas.items():
+        delta[year - years[start]] = sums
+    running = np.cumsum(delta, axis=0)
+
+    result = dict(columns)
+    for i, account in enumerate(ACCOUNTS):
+        for key, values in ((INPUT_COLUMNS[account], delta[:, i]), (account, running[:, i])):
+            column = columns[key].copy()
+            column[start:] = column[start:] + values
+            result[key] = column
+    moved = running.sum(axis=1)
+    for key in ('total', 'market_total'):
+        column = columns[key].copy()
+        column[start:] = column[start:] + moved
+        result[key] = column
+
+    goal = columns['goal_total'][start:]
+    gap = result['total'][start:] - goal
+    ratio = np.divide(gap, goal, out=np.zeros(len(goal)), where=goal > 0)
+    result['gap_total'] = columns['gap_total'].copy()
+    result['gap_total'][start:] = gap
+    result['gap_pct'] = columns['gap_pct'].copy()
+    result['gap_pct'][start:] = np.where(goal > 0, np.round((1 + ratio) * 100, 1), 0.0)
+    return result